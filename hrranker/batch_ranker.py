@@ -0,0 +1,650 @@
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from hrranker.config import cfg
+from hrranker.hr_model import CandidateInfo, JobProfile
+from hrranker.log_init import logger
+from hrranker.metrics import metrics
+from hrranker.run_journal import (
+    RunJournal,
+    RunStatus,
+    document_fingerprint,
+    document_source,
+    run_journal,
+    run_key,
+)
+
+from abc import ABC, abstractmethod
+
+import argparse
+import asyncio
+import csv
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+OUTPUT_FORMATS = ["jsonl", "csv", "parquet"]
+# Parquet rows are buffered and written in row groups of this size
+PARQUET_ROW_GROUP_SIZE = 100
+
+
+def load_job_profile(path: Path) -> JobProfile:
+    # e.g. {"name": "Web developer", "skills": ["Wordpress", "CSS"], "weights": [3, 1]}
+    return JobProfile.parse_file(path)
+
+
+def find_pdfs(inputs: List[str]) -> List[Path]:
+    # Folders, files and glob patterns like "cvs/**/*.pdf"
+    pdfs = set()
+    for input in inputs:
+        path = Path(input)
+        if path.is_dir():
+            pdfs.update(path.glob("*.pdf"))
+        elif path.is_file():
+            pdfs.add(path)
+        else:
+            pdfs.update(
+                Path(p)
+                for p in glob.glob(input, recursive=True)
+                if p.lower().endswith(".pdf")
+            )
+    return sorted(pdfs)
+
+
+def shard_pdfs(pdfs: List[Path], shard_count: int) -> List[List[Path]]:
+    # By content, so that copies of the same file end up in the same worker and are
+    # only ranked once. Edited versions in different workers are ranked by both
+    shards: List[List[Path]] = [[] for _ in range(shard_count)]
+    for pdf in pdfs:
+        digest = hashlib.sha256(pdf.read_bytes()).digest()
+        shards[int.from_bytes(digest[:8], "big") % shard_count].append(pdf)
+    return [shard for shard in shards if shard]
+
+
+def to_record(candidate_info: CandidateInfo) -> Dict[str, Any]:
+    name_of_candidate_response = candidate_info.name_of_candidate_response
+    skills = []
+    for number_of_years_response in candidate_info.number_of_years_responses:
+        nyr = number_of_years_response.number_of_years_response
+        weight = number_of_years_response.score_weight
+        skills.append(
+            {
+                "skill": nyr.skill,
+                "has_skill": nyr.has_skill,
+                "years": nyr.number_of_years_with_skill,
+                "weight": weight,
+                "points": nyr.number_of_years_with_skill * weight if nyr.has_skill else 0,
+            }
+        )
+    return {
+        "rank": None,
+        "score": candidate_info.score,
+        "name": name_of_candidate_response.name,
+        "email": name_of_candidate_response.email,
+        "years_of_experience": name_of_candidate_response.years_of_experience,
+        "source_file": str(candidate_info.source_file),
+        "duplicate_of": candidate_info.duplicate_of,
+        "prescreen_score": candidate_info.prescreen_score,
+        "screened_out": candidate_info.screened_out,
+        "skills": skills,
+    }
+
+
+def flat_columns(skills: List[str]) -> List[str]:
+    columns = [
+        "rank",
+        "score",
+        "name",
+        "email",
+        "years_of_experience",
+        "source_file",
+        "duplicate_of",
+        "prescreen_score",
+        "screened_out",
+    ]
+    for skill in skills:
+        columns += [f"{skill} has_skill", f"{skill} years", f"{skill} points"]
+    return columns
+
+
+def flatten_record(record: Dict[str, Any], skills: List[str]) -> Dict[str, Any]:
+    row = {key: value for key, value in record.items() if key != "skills"}
+    breakdown = {entry["skill"]: entry for entry in record["skills"]}
+    for skill in skills:
+        entry = breakdown.get(skill, {})
+        row[f"{skill} has_skill"] = entry.get("has_skill")
+        row[f"{skill} years"] = entry.get("years")
+        row[f"{skill} points"] = entry.get("points")
+    return row
+
+
+def row_ranking_key(row: Dict[str, Any]) -> Tuple[bool, float, float]:
+    # Descending, like ranking_key. Screened out candidates have no extracted years, they come
+    # last, ordered by their pre-screen score
+    return (
+        str(row.get("screened_out")).lower() != "true",
+        float(row["score"]),
+        float(row.get("prescreen_score") or 0),
+    )
+
+
+class OutputWriter(ABC):
+    # Appends each candidate as soon as it is finished. Ranking rewrites the file sorted by score
+
+    def __init__(self, path: Path, skills: List[str]):
+        self.path = path
+        self.skills = skills
+        self.open(path)
+
+    @abstractmethod
+    def open(self, path: Path):
+        ...
+
+    @abstractmethod
+    def write_row(self, row: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def close(self):
+        ...
+
+    @abstractmethod
+    def index(self) -> Iterator[Tuple[Tuple[bool, float, float], Any]]:
+        # The ranking key of each written row and its position in the file
+        ...
+
+    @abstractmethod
+    def read_rows(self, positions: List[Any]) -> Iterator[Dict[str, Any]]:
+        # The rows at these positions, in this order
+        ...
+
+    def to_row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return flatten_record(record, self.skills)
+
+    def write(self, record: Dict[str, Any]):
+        self.write_row(self.to_row(record))
+
+    def rank(self):
+        # Called after close. Only the keys and positions are sorted, the rows are read again
+        # one by one while the ranked file is written
+        entries = sorted(self.index(), key=lambda entry: entry[0], reverse=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        self.open(temp_path)
+        for rank, row in enumerate(
+            self.read_rows([position for _, position in entries]), start=1
+        ):
+            row["rank"] = rank
+            self.write_row(row)
+        self.close()
+        os.replace(temp_path, self.path)
+
+
+class JsonLinesWriter(OutputWriter):
+    def open(self, path: Path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def to_row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return record
+
+    def write_row(self, row: Dict[str, Any]):
+        self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def index(self) -> Iterator[Tuple[Tuple[bool, float, float], Any]]:
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if line.strip():
+                    yield row_ranking_key(json.loads(line)), offset
+
+    def read_rows(self, positions: List[Any]) -> Iterator[Dict[str, Any]]:
+        with open(self.path, "rb") as f:
+            for offset in positions:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+
+class CsvWriter(OutputWriter):
+    def open(self, path: Path):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=flat_columns(self.skills))
+        self.writer.writeheader()
+
+    def write_row(self, row: Dict[str, Any]):
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def index(self) -> Iterator[Tuple[Tuple[bool, float, float], Any]]:
+        with open(self.path, encoding="utf-8", newline="") as f:
+            # Read with readline, so that tell gives the start of each row, even quoted
+            # values over several lines
+            reader = csv.DictReader(iter(f.readline, ""))
+            reader.fieldnames
+            while True:
+                offset = f.tell()
+                row = next(reader, None)
+                if row is None:
+                    break
+                yield row_ranking_key(row), offset
+
+    def read_rows(self, positions: List[Any]) -> Iterator[Dict[str, Any]]:
+        with open(self.path, encoding="utf-8", newline="") as f:
+            fieldnames = next(csv.reader(iter(f.readline, "")))
+            for offset in positions:
+                f.seek(offset)
+                yield next(csv.DictReader(iter(f.readline, ""), fieldnames=fieldnames))
+
+
+class ParquetWriter(OutputWriter):
+    def open(self, path: Path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError(
+                "Parquet output needs pyarrow, install it with: pip install pyarrow"
+            ) from e
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        fields = [
+            ("rank", pyarrow.int64()),
+            ("score", pyarrow.int64()),
+            ("name", pyarrow.string()),
+            ("email", pyarrow.string()),
+            ("years_of_experience", pyarrow.int64()),
+            ("source_file", pyarrow.string()),
+            ("duplicate_of", pyarrow.string()),
+            ("prescreen_score", pyarrow.float64()),
+            ("screened_out", pyarrow.bool_()),
+        ]
+        for skill in self.skills:
+            fields += [
+                (f"{skill} has_skill", pyarrow.bool_()),
+                (f"{skill} years", pyarrow.int64()),
+                (f"{skill} points", pyarrow.int64()),
+            ]
+        self.schema = pyarrow.schema(fields)
+        self.writer = pyarrow.parquet.ParquetWriter(str(path), self.schema)
+        self.rows: List[Dict[str, Any]] = []
+
+    def write_row(self, row: Dict[str, Any]):
+        self.rows.append(row)
+        if len(self.rows) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(
+                self.pyarrow.Table.from_pylist(self.rows, schema=self.schema)
+            )
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def index(self) -> Iterator[Tuple[Tuple[bool, float, float], Any]]:
+        keys = self.parquet.read_table(
+            str(self.path), columns=["screened_out", "score", "prescreen_score"]
+        )
+        for position, row in enumerate(keys.to_pylist()):
+            yield row_ranking_key(row), position
+
+    def read_rows(self, positions: List[Any]) -> Iterator[Dict[str, Any]]:
+        # The columns stay in Arrow, only a row group at a time becomes Python rows
+        table = self.parquet.read_table(str(self.path), memory_map=True)
+        for start in range(0, len(positions), PARQUET_ROW_GROUP_SIZE):
+            yield from table.take(positions[start : start + PARQUET_ROW_GROUP_SIZE]).to_pylist()
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def output_format(path: Path, format: Optional[str] = None) -> str:
+    format = format or path.suffix.lstrip(".").lower()
+    if format == "json":
+        format = "jsonl"
+    if format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format {format}, use one of {', '.join(OUTPUT_FORMATS)}"
+        )
+    return format
+
+
+def create_writer(
+    path: Path, skills: List[str], format: Optional[str] = None
+) -> OutputWriter:
+    return WRITERS[output_format(path, format)](path, skills)
+
+
+async def arank_pdfs(
+    pdfs: List[Path], profile: JobProfile, run_id: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    # Imported here, so that --status does not wait for langchain
+    from hrranker.candidate_ranker_langchain import aiter_candidate_infos
+    from hrranker.extract_data import aiter_pdf_documents
+
+    # With the key of the run, the shards and continued runs keep their extractions together.
+    # The PDFs were pre-screened by run_batch over the whole input
+    with metrics.run(run_id) as run_id:
+        with metrics.span("ranking"):
+            async for candidate_info in aiter_candidate_infos(
+                aiter_pdf_documents(pdfs),
+                profile.skills,
+                profile.weights,
+                prescreen_top_k=0,
+                prescreen_threshold=0,
+            ):
+                yield to_record(candidate_info)
+        logger.info(metrics.summary(run_id))
+
+
+async def aprescreen_pdfs(
+    pdfs: List[Path], profile: JobProfile, top_k: int, threshold: float
+) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+    # The keyword scores are relative to the pool, so all PDFs are scored together
+    from hrranker.candidate_ranker_langchain import RankingContext, prescreen_docs
+    from hrranker.extract_data import aiter_pdf_documents
+    from hrranker.keyword_extractor import aextract_keywords
+
+    expression_pairs = await aextract_keywords(profile.skills)
+    context = RankingContext(profile.skills, profile.weights, expression_pairs)
+    _, screened_out_infos = await prescreen_docs(
+        aiter_pdf_documents(pdfs), context, top_k, threshold
+    )
+    return context.prescreen_scores, [to_record(info) for info in screened_out_infos]
+
+
+def prescreen_run(
+    pdfs: List[Path],
+    profile: JobProfile,
+    key: str,
+    fingerprints: Dict[str, str],
+    finished: Dict[str, Dict[str, Any]],
+    journal: Optional[RunJournal],
+    top_k: int,
+    threshold: float,
+) -> Tuple[Dict[str, float], Dict[str, Dict[str, Any]]]:
+    # Once over the whole input before it is sharded, so that neither the shards nor a continued
+    # run change the shortlist. Returns the scores and the finished candidates with the screened
+    # out ones
+    prescreen = None
+    if journal is not None:
+        prescreen = journal.prescreen(key, fingerprints, top_k, threshold)
+    if prescreen is not None:
+        scores, screened_out = prescreen
+        logger.info(
+            f"Pre-screen shortlist of run {key}: {len(fingerprints) - len(screened_out)} "
+            + f"of {len(fingerprints)} CVs"
+        )
+        return scores, finished
+    scores, screened_out_records = asyncio.run(
+        aprescreen_pdfs(pdfs, profile, top_k, threshold)
+    )
+    if journal is not None:
+        journal.record_prescreen(
+            key, fingerprints, scores, screened_out_records, top_k, threshold
+        )
+    screened_out: Set[str] = {record["source_file"] for record in screened_out_records}
+    # Candidates of an earlier shortlist are ranked again if they are on the new one
+    finished = {
+        source: record
+        for source, record in finished.items()
+        if source not in screened_out and not record.get("screened_out")
+    }
+    finished.update({record["source_file"]: record for record in screened_out_records})
+    return scores, finished
+
+
+def rank_shard(pdfs: List[Path], profile: JobProfile, key: str, results: Any):
+    # Runs in a worker process and sends each candidate to the writing process
+    async def send_records():
+        async for record in arank_pdfs(pdfs, profile, key):
+            results.put(("candidate", record))
+
+    try:
+        asyncio.run(send_records())
+    finally:
+        # Worker processes end without the atexit handlers, which write the queued metrics
+        metrics.close()
+        results.put(("done", None))
+
+
+def worker_environment(worker_count: int) -> Dict[str, str]:
+    # The workers share the provider limits and the CPUs for PDF parsing
+    environment = {
+        "INGESTION_WORKERS": str(max(1, cfg.ingestion_workers // worker_count)),
+    }
+    if cfg.requests_per_minute > 0:
+        environment["REQUESTS_PER_MINUTE"] = str(
+            max(1, cfg.requests_per_minute // worker_count)
+        )
+    if cfg.tokens_per_minute > 0:
+        environment["TOKENS_PER_MINUTE"] = str(
+            max(1, cfg.tokens_per_minute // worker_count)
+        )
+    return environment
+
+
+def run_in_process(
+    pdfs: List[Path],
+    profile: JobProfile,
+    key: str,
+    handle_record: Callable[[Dict[str, Any]], None],
+):
+    async def handle_records():
+        async for record in arank_pdfs(pdfs, profile, key):
+            handle_record(record)
+
+    asyncio.run(handle_records())
+
+
+def run_sharded(
+    pdfs: List[Path],
+    profile: JobProfile,
+    key: str,
+    handle_record: Callable[[Dict[str, Any]], None],
+    workers: int,
+):
+    from hrranker.keyword_extractor import aextract_keywords
+
+    # Expanded once here, the workers find the keywords in the keyword store
+    asyncio.run(aextract_keywords(profile.skills))
+    # Spawned workers open their own caches and stores instead of sharing forked connections
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=rank_shard, args=(shard, profile, key, results))
+        for shard in shard_pdfs(pdfs, workers)
+    ]
+    # The workers read their configuration from the environment when they start
+    environment = worker_environment(len(processes))
+    previous_environment = {key: os.environ.get(key) for key in environment}
+    os.environ.update(environment)
+    try:
+        for process in processes:
+            process.start()
+    finally:
+        for key, value in previous_environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    running = len(processes)
+    while running > 0:
+        try:
+            kind, record = results.get(timeout=1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                logger.error(f"{running} workers stopped without finishing their shard")
+                break
+            continue
+        if kind == "done":
+            running -= 1
+        else:
+            handle_record(record)
+    for process in processes:
+        process.join()
+
+
+def run_batch(
+    pdfs: List[Path],
+    profile: JobProfile,
+    output: Path,
+    format: Optional[str] = None,
+    workers: int = 1,
+    rank: bool = True,
+    journal: Optional[RunJournal] = run_journal,
+    prescreen_top_k: int = cfg.prescreen_top_k,
+    prescreen_threshold: float = cfg.prescreen_threshold,
+) -> int:
+    start = time.perf_counter()
+    writer = create_writer(output, profile.skills, format)
+    key = run_key(profile, pdfs)
+    fingerprints = {document_source(pdf): document_fingerprint(pdf) for pdf in pdfs}
+    finished: Dict[str, Dict[str, Any]] = {}
+    if journal is not None:
+        journal.start_run(key, profile, len(pdfs))
+        finished = journal.finished(key, fingerprints)
+    journaled = dict(finished)
+    prescreen_scores: Dict[str, float] = {}
+    if prescreen_top_k > 0 or prescreen_threshold > 0:
+        prescreen_scores, finished = prescreen_run(
+            pdfs,
+            profile,
+            key,
+            fingerprints,
+            finished,
+            journal,
+            prescreen_top_k,
+            prescreen_threshold,
+        )
+    else:
+        # Without the pre-screen the candidates screened out by an earlier run are ranked
+        finished = {
+            source: record
+            for source, record in finished.items()
+            if not record.get("screened_out")
+        }
+        if journal is not None:
+            journal.clear_prescreen(key)
+    finished_before = sum(
+        1 for source, record in finished.items() if journaled.get(source) is record
+    )
+    remaining = [pdf for pdf in pdfs if document_source(pdf) not in finished]
+    if finished_before:
+        logger.info(
+            f"Continuing run {key}: {finished_before} candidates finished before, "
+            + f"{len(remaining)} remaining"
+        )
+    ranked = set()
+
+    def handle_record(record: Dict[str, Any]):
+        source = record["source_file"]
+        if source in prescreen_scores:
+            record["prescreen_score"] = prescreen_scores[source]
+        writer.write(record)
+        ranked.add(source)
+        if journal is not None:
+            journal.record_done(key, source, fingerprints.get(source, ""), record)
+
+    try:
+        for record in finished.values():
+            writer.write(record)
+        if remaining and workers > 1:
+            run_sharded(remaining, profile, key, handle_record, workers)
+        elif remaining:
+            run_in_process(remaining, profile, key, handle_record)
+    finally:
+        writer.close()
+    # Not reached if the run was interrupted, then the rest stays pending
+    if journal is not None:
+        for pdf in remaining:
+            if document_source(pdf) not in ranked:
+                journal.record_failed(key, document_source(pdf), fingerprints[document_source(pdf)])
+    if rank:
+        writer.rank()
+    count = len(finished) + len(ranked)
+    logger.info(
+        f"Wrote {count} of {len(pdfs)} candidates to {output} "
+        + f"in {time.perf_counter() - start:.1f}s (run {key})"
+    )
+    return count
+
+
+def log_status(run_status: RunStatus):
+    logger.info(run_status.report())
+    for source in run_status.failed_sources:
+        logger.info(f"Failed: {source}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rank a folder or glob of CVs against a job profile and write the results"
+    )
+    parser.add_argument(
+        "inputs", nargs="*", help="folders, PDF files or glob patterns like 'cvs/*.pdf'"
+    )
+    parser.add_argument(
+        "--profile", type=Path, help="JSON file with skills and weights"
+    )
+    parser.add_argument(
+        "--output", type=Path, help="a .jsonl, .csv or .parquet file"
+    )
+    parser.add_argument(
+        "--format", choices=OUTPUT_FORMATS, help="default from the output extension"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument(
+        "--no-rank",
+        action="store_true",
+        help="keep the candidates in the order in which they finished",
+    )
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="show the progress of the run, or of all runs without inputs and profile",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="forget the finished candidates of the run and start again",
+    )
+    args = parser.parse_args()
+
+    if args.status and not args.inputs:
+        for key in run_journal.run_keys():
+            log_status(run_journal.status(key))
+        sys.exit(0)
+    if not args.inputs or args.profile is None:
+        parser.error("the inputs and --profile are required")
+    profile = load_job_profile(args.profile)
+    pdfs = find_pdfs(args.inputs)
+    key = run_key(profile, pdfs)
+    if args.status:
+        run_status = run_journal.status(key)
+        if run_status is None:
+            logger.info(f"Run {key} of {len(pdfs)} CVs has not been started")
+        else:
+            log_status(run_status)
+        sys.exit(0)
+    if args.output is None:
+        parser.error("--output is required")
+    if args.restart:
+        run_journal.clear(key)
+    logger.info(f"Ranking {len(pdfs)} CVs for {profile.name or args.profile}")
+    run_batch(pdfs, profile, args.output, args.format, args.workers, not args.no_rank)
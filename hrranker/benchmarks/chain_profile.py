@@ -0,0 +1,115 @@
+from hrranker.benchmarks.fake_llm import (
+    FakeTaggingChain,
+    setup_offline_env,
+    install_fake_llm,
+)
+
+import os
+
+setup_offline_env()
+# Cached answers would skip the chains
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from langchain import chains
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import argparse
+import asyncio
+import cProfile
+import logging
+import pstats
+import time
+import tracemalloc
+
+import hrranker.candidate_ranker_langchain as candidate_ranker_langchain
+import hrranker.chain_registry as chain_registry
+import hrranker.keyword_extractor as keyword_extractor
+import hrranker.name_extractor as name_extractor
+
+from hrranker.benchmarks.suite import create_documents
+from hrranker.benchmarks.synthetic_cv import TECHNOLOGIES
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.chain_registry import ChainRegistry
+from hrranker.log_init import logger
+
+
+class UncachedRegistry(ChainRegistry):
+    # Builds every chain and schema again, like the code before the registry
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        self.built += 1
+        return factory()
+
+
+def install_realistic_chains():
+    # The real LangChain chains are built, so that building them costs what it costs,
+    # but the answers come from the fake LLM
+    def create_tagging_chain_pydantic(pydantic_schema, llm, *args, **kwargs):
+        chains.create_tagging_chain_pydantic(pydantic_schema, llm)
+        return FakeTaggingChain(pydantic_schema.schema(), pydantic_schema)
+
+    def create_tagging_chain(schema, llm, *args, **kwargs):
+        chains.create_tagging_chain(schema, llm)
+        return FakeTaggingChain(schema)
+
+    install_fake_llm()
+    chain_registry.create_tagging_chain_pydantic = create_tagging_chain_pydantic
+    chain_registry.create_tagging_chain = create_tagging_chain
+
+
+def install_registry(registry: ChainRegistry):
+    for module in [candidate_ranker_langchain, keyword_extractor, name_extractor]:
+        module.chain_registry = registry
+
+
+def measure(
+    registry: ChainRegistry, doc_count: int, profiler: Optional[cProfile.Profile]
+) -> Tuple[float, int, int]:
+    install_registry(registry)
+    docs = create_documents(doc_count, 2, TECHNOLOGIES, 3)
+    # Warm up, so that both variants start with the imports and caches of a running server
+    asyncio.run(process_docs(docs[:1], SKILLS, WEIGHTS))
+    registry.built = 0
+
+    start = time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    asyncio.run(process_docs(docs, SKILLS, WEIGHTS))
+    if profiler is not None:
+        profiler.disable()
+    cpu_seconds = time.process_time() - start
+    built = registry.built
+
+    tracemalloc.start()
+    asyncio.run(process_docs(docs, SKILLS, WEIGHTS))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_seconds, built, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="CPU time and allocations per candidate with and without the chain registry"
+    )
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--cprofile", action="store_true", help="print the top functions")
+    args = parser.parse_args()
+
+    install_realistic_chains()
+    for name, registry in [
+        ("Chains built per call", UncachedRegistry()),
+        ("Chain registry", ChainRegistry()),
+    ]:
+        profiler = cProfile.Profile() if args.cprofile else None
+        # The per candidate log lines would dominate the timings
+        logger.setLevel(logging.WARNING)
+        try:
+            cpu_seconds, built, peak = measure(registry, args.docs, profiler)
+        finally:
+            logger.setLevel(logging.INFO)
+        logger.info(
+            f"{name}: {1000 * cpu_seconds / args.docs:.2f} ms CPU per candidate, "
+            + f"{built / args.docs:.1f} chains and schemas built per candidate, "
+            + f"{peak / 1024:.0f} KB peak traced memory"
+        )
+        if profiler is not None:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
@@ -0,0 +1,104 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env
+
+setup_offline_env()
+
+from pathlib import Path
+from typing import List
+
+import argparse
+import asyncio
+import random
+import resource
+import tempfile
+import time
+
+from hrranker.hr_model import CandidateInfo, NameOfCandidateResponse
+from hrranker.log_init import logger
+from hrranker.plot.hr_rank_plot import acreate_barchart
+
+
+def create_candidate_infos(count: int) -> List[CandidateInfo]:
+    rng = random.Random(42)
+    return [
+        CandidateInfo(
+            name_of_candidate_response=NameOfCandidateResponse(
+                name=f"Candidate {i}",
+                email=f"candidate{i}@example.com",
+                age=None,
+                gender="unknown",
+                years_of_experience=rng.randint(0, 20),
+            ),
+            number_of_years_responses=[],
+            source_file=f"candidate_{i:05d}.pdf",
+        )
+        for i in range(count)
+    ]
+
+
+def create_pyplot_barchart(candidate_infos: List[CandidateInfo], location: Path) -> Path:
+    # The renderer before, with the global pyplot state and without closing the figure
+    import matplotlib
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(18, 10), dpi=80)
+    fig.subplots_adjust(bottom=0.2)
+    matplotlib.rc("font", size=22)
+    plt.bar(
+        [ci.name_of_candidate_response.name for ci in candidate_infos],
+        [ci.score for ci in candidate_infos],
+    )
+    plt.title("Candidate Ranking")
+    plt.xticks(rotation=25)
+    ranking_plot = location / f"{round(time.time() * 1000)}_ranking.png"
+    plt.savefig(ranking_plot)
+    return ranking_plot
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag
+
+
+async def render(args: argparse.Namespace, location: Path):
+    candidate_infos = create_candidate_infos(args.candidates)
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop))
+    start = time.perf_counter()
+    for _ in range(args.charts):
+        if args.pyplot:
+            create_pyplot_barchart(candidate_infos, location)
+            # Lets the lag monitor see how long the loop was blocked
+            await asyncio.sleep(0)
+        else:
+            await acreate_barchart(candidate_infos, location=location)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    max_lag = await lag_task
+    open_figures = 0
+    if args.pyplot:
+        import matplotlib.pyplot as plt
+
+        open_figures = len(plt.get_fignums())
+    logger.info(
+        f"{'pyplot' if args.pyplot else 'Agg in a thread'}: {args.charts} charts of "
+        + f"{args.candidates} candidates in {elapsed:.2f}s, max event loop lag {1000 * max_lag:.0f} ms, "
+        + f"{open_figures} open figures, max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time, event loop lag and memory of rendering ranking charts"
+    )
+    parser.add_argument("--charts", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument(
+        "--pyplot", action="store_true", help="render like before, for comparison"
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        asyncio.run(render(args, Path(temp_dir)))
@@ -0,0 +1,77 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env, install_fake_llm
+
+import os
+
+setup_offline_env()
+# Cached answers would hide the effect of the concurrency limit
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from langchain.schema import Document
+from typing import List
+
+import argparse
+import asyncio
+import time
+
+from hrranker.candidate_ranker_langchain import (
+    process_docs,
+    chunk_skills,
+    skills_per_call,
+    EXTRACTION_MODE_PER_SKILL,
+    SKILLS,
+    WEIGHTS,
+)
+from hrranker.log_init import logger
+
+
+def create_docs(doc_count: int) -> List[Document]:
+    return [
+        Document(
+            page_content=f"Candidate {i}. Wordpress, PHP, Javascript and CSS developer.",
+            metadata={"source": f"candidate_{i}.pdf"},
+        )
+        for i in range(doc_count)
+    ]
+
+
+async def run_benchmark(
+    doc_count: int,
+    latency: float,
+    concurrency_levels: List[int],
+    extraction_mode: str = EXTRACTION_MODE_PER_SKILL,
+):
+    install_fake_llm(latency)
+    docs = create_docs(doc_count)
+    calls_per_doc = 1 + len(chunk_skills(SKILLS, skills_per_call(extraction_mode)))
+    logger.info(
+        f"{doc_count} documents, {calls_per_doc} calls per document, {latency}s per call"
+    )
+    logger.info(f"Sequential estimate: {doc_count * calls_per_doc * latency:.2f}s")
+    for max_concurrency in concurrency_levels:
+        start = time.perf_counter()
+        candidate_infos = await process_docs(
+            docs,
+            SKILLS,
+            WEIGHTS,
+            max_concurrency=max_concurrency,
+            extraction_mode=extraction_mode,
+        )
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"max_concurrency={max_concurrency:>3}: {elapsed:6.2f}s for {len(candidate_infos)} candidates"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="process_docs concurrency benchmark")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=str, default="1,2,5,10,20")
+    parser.add_argument("--extraction-mode", type=str, default=EXTRACTION_MODE_PER_SKILL)
+    args = parser.parse_args()
+    concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+    asyncio.run(
+        run_benchmark(
+            args.docs, args.latency, concurrency_levels, args.extraction_mode
+        )
+    )
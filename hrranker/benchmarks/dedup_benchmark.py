@@ -0,0 +1,107 @@
+from hrranker.benchmarks.fake_llm import (
+    FakeTaggingChain,
+    setup_offline_env,
+    install_fake_llm,
+)
+
+import os
+
+setup_offline_env()
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from typing import List, Set, Tuple
+
+from langchain.schema import Document
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from hrranker.benchmarks.suite import create_documents
+from hrranker.benchmarks.synthetic_cv import TECHNOLOGIES
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.dedup import DuplicateIndex
+from hrranker.log_init import logger
+
+
+def edit_text(text: str, rng: random.Random) -> str:
+    # A lightly edited version: one line changed and one added
+    lines = text.split("\n")
+    lines[rng.randrange(len(lines))] = "Updated phone number and address"
+    lines.append("References available on request")
+    return "\n".join(lines)
+
+
+def create_corpus(
+    count: int, duplicate_share: float, seed: int = 42
+) -> Tuple[List[Document], Set[str]]:
+    rng = random.Random(seed)
+    docs = create_documents(count, 2, TECHNOLOGIES, 3)
+    duplicate_sources = set()
+    for i in range(int(count * duplicate_share)):
+        original = rng.choice(docs[:count])
+        text = original.page_content
+        if i % 2 == 1:
+            text = edit_text(text, rng)
+        source = f"duplicate_{i:05d}.pdf"
+        docs.append(Document(page_content=text, metadata={"source": source}))
+        duplicate_sources.add(source)
+    rng.shuffle(docs)
+    return docs, duplicate_sources
+
+
+def measure_index(count: int, duplicate_share: float, threshold: float):
+    docs, duplicate_sources = create_corpus(count, duplicate_share)
+    duplicate_index = DuplicateIndex(threshold)
+    found = set()
+    start = time.perf_counter()
+    for doc in docs:
+        representative, _ = duplicate_index.add(doc.metadata["source"], doc.page_content)
+        if representative is not None:
+            found.add(doc.metadata["source"])
+            # The original may come after its copy, then the copy is the representative
+            if doc.metadata["source"] not in duplicate_sources:
+                found.add(representative)
+                found.discard(doc.metadata["source"])
+    elapsed = time.perf_counter() - start
+    true_positives = len(found & duplicate_sources)
+    logger.info(
+        f"{len(docs):>6} CVs: {1000 * elapsed / len(docs):.2f} ms and "
+        + f"{duplicate_index.comparisons / len(docs):.2f} comparisons per CV, "
+        + f"recall {100 * true_positives / max(len(duplicate_sources), 1):.1f}%, "
+        + f"precision {100 * true_positives / max(len(found), 1):.1f}%"
+    )
+
+
+def measure_extraction(count: int, duplicate_share: float):
+    install_fake_llm()
+    docs, _ = create_corpus(count, duplicate_share)
+    for deduplicate in [False, True]:
+        FakeTaggingChain.reset_counters()
+        logger.setLevel(logging.WARNING)
+        try:
+            candidate_infos = asyncio.run(
+                process_docs(docs, SKILLS, WEIGHTS, deduplicate=deduplicate)
+            )
+        finally:
+            logger.setLevel(logging.INFO)
+        logger.info(
+            f"Deduplication {'on' if deduplicate else 'off'}: {len(candidate_infos)} candidates ranked "
+            + f"with {FakeTaggingChain.calls} LLM calls and ~{FakeTaggingChain.prompt_tokens} prompt tokens"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Duplicate detection quality, cost per CV and saved LLM calls"
+    )
+    parser.add_argument("--sizes", type=str, default="1000,10000")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of copies")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--docs", type=int, default=100, help="CVs of the extraction run")
+    args = parser.parse_args()
+    for size in [int(s) for s in args.sizes.split(",")]:
+        measure_index(size, args.duplicates, args.threshold)
+    measure_extraction(args.docs, args.duplicates)
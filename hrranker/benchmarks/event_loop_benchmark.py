@@ -0,0 +1,119 @@
+from hrranker.benchmarks.fake_llm import (
+    FakeTaggingChain,
+    setup_offline_env,
+    install_fake_llm,
+)
+
+import os
+
+setup_offline_env()
+# Cached answers would not reach the fake LLM at all
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from langchain.schema import Document
+from typing import List
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from hrranker.benchmarks.synthetic_cv import create_cv_lines
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.log_init import logger
+
+
+def create_docs(session: int, doc_count: int) -> List[Document]:
+    rng = random.Random(session)
+    return [
+        Document(
+            page_content="\n".join(create_cv_lines(i, 2, rng)),
+            metadata={"source": f"session_{session}_candidate_{i}.pdf"},
+        )
+        for i in range(doc_count)
+    ]
+
+
+async def monitor_lag(interval: float, lags: List[float], stop: asyncio.Event):
+    # A healthy loop wakes up right after the interval, anything later is lag
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_session(session: int, doc_count: int, max_concurrency: int) -> int:
+    candidate_infos = await process_docs(
+        create_docs(session, doc_count),
+        SKILLS,
+        WEIGHTS,
+        max_concurrency=max_concurrency,
+    )
+    return len(candidate_infos)
+
+
+async def run_benchmark(
+    sessions: int,
+    doc_count: int,
+    latency: float,
+    max_concurrency: int,
+    interval: float,
+    blocking: bool,
+):
+    install_fake_llm(latency)
+    if blocking:
+        # What a synchronous client called on the event loop would do
+        FakeTaggingChain.arun = lambda self, input: asyncio.sleep(
+            0, self.run(input)
+        )
+    lags: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(interval, lags, stop))
+    start = time.perf_counter()
+    candidate_counts = await asyncio.gather(
+        *[run_session(s, doc_count, max_concurrency) for s in range(sessions)]
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    lags_ms = sorted(1000 * lag for lag in lags)
+    p95 = lags_ms[int(0.95 * (len(lags_ms) - 1))]
+    logger.info(
+        f"{sessions} sessions x {doc_count} documents, {latency}s per call, "
+        + f"{'blocking' if blocking else 'async'} chain calls"
+    )
+    logger.info(
+        f"{sum(candidate_counts)} candidates in {elapsed:.2f}s, {FakeTaggingChain.calls} LLM calls"
+    )
+    logger.info(
+        f"Event loop lag over {len(lags_ms)} ticks: mean {statistics.mean(lags_ms):.1f}ms, "
+        + f"p95 {p95:.1f}ms, max {lags_ms[-1]:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Event loop lag while several sessions rank concurrently"
+    )
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument(
+        "--blocking",
+        action="store_true",
+        help="call the fake chain synchronously on the event loop for comparison",
+    )
+    args = parser.parse_args()
+    asyncio.run(
+        run_benchmark(
+            args.sessions,
+            args.docs,
+            args.latency,
+            args.concurrency,
+            args.interval,
+            args.blocking,
+        )
+    )
@@ -0,0 +1,100 @@
+from hrranker.benchmarks.fake_llm import (
+    FakeTaggingChain,
+    setup_offline_env,
+    install_fake_llm,
+)
+
+import os
+
+setup_offline_env()
+# Answers of earlier runs must not hide differences, set CACHE_ENABLED=true to save live calls
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from pathlib import Path
+from typing import List
+
+from langchain.schema import Document
+
+import argparse
+import asyncio
+import logging
+import tempfile
+
+from hrranker.benchmarks.pruning_evaluation import compare
+from hrranker.benchmarks.synthetic_cv import write_cv_corpus
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.extract_data import extract_data
+from hrranker.hr_model import CandidateInfo
+from hrranker.log_init import logger
+
+
+async def run(docs: List[Document], local_experience: bool) -> List[CandidateInfo]:
+    FakeTaggingChain.reset_counters()
+    logger.setLevel(logging.WARNING)
+    try:
+        candidate_infos = await process_docs(
+            docs, SKILLS, WEIGHTS, local_experience=local_experience
+        )
+    finally:
+        logger.setLevel(logging.INFO)
+    logger.info(
+        f"{'Dates in the CV' if local_experience else 'LLM only'}: {FakeTaggingChain.calls} LLM calls, "
+        + f"~{FakeTaggingChain.prompt_tokens} prompt tokens"
+    )
+    return candidate_infos
+
+
+def compare_totals(baseline: List[CandidateInfo], local: List[CandidateInfo]):
+    # The fake LLM answers the total experience with arbitrary numbers, compare it with --live
+    baseline_totals = {
+        str(ci.source_file): ci.name_of_candidate_response.years_of_experience or 0
+        for ci in baseline
+    }
+    differences = [
+        abs(
+            baseline_totals.get(str(ci.source_file), 0)
+            - (ci.name_of_candidate_response.years_of_experience or 0)
+        )
+        for ci in local
+    ]
+    logger.info(
+        f"Total experience agrees for {sum(1 for d in differences if d == 0)} of {len(local)} candidates, "
+        + f"mean absolute years difference {sum(differences) / max(len(differences), 1):.2f}"
+    )
+
+
+async def evaluate(docs: List[Document], live: bool):
+    # Twice with the same input, the local years have to be the same both times
+    baseline = await run(docs, False)
+    local = await run(docs, True)
+    repeated = await run(docs, True)
+    compare(baseline, local)
+    compare_totals(baseline, local)
+    reproducible = [ci.score for ci in local] == [ci.score for ci in repeated]
+    logger.info(f"Reproducible: {reproducible}")
+    if not live:
+        logger.warning(
+            "The fake LLM reads the skill years from the same date ranges and answers the total "
+            + "experience arbitrarily. Only --live on real CVs validates the parser"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares the years taken from the dates in the CVs with the years of the LLM"
+    )
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--folder", type=str, help="folder with real CVs")
+    parser.add_argument(
+        "--live", action="store_true", help="use the configured LLM instead of the fake one"
+    )
+    args = parser.parse_args()
+    if not args.live:
+        install_fake_llm()
+    if args.folder:
+        asyncio.run(evaluate(extract_data(Path(args.folder)), args.live))
+    else:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_cv_corpus(Path(temp_dir), args.docs, args.pages)
+            asyncio.run(evaluate(extract_data(Path(temp_dir)), args.live))
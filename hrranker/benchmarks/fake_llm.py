@@ -0,0 +1,188 @@
+## Offline stand-in for the LangChain tagging chains. Do not import hrranker.config before setup_offline_env.
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from hrranker.token_count import estimate_tokens, estimate_schema_tokens
+
+from collections import deque
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+
+def setup_offline_env():
+    temp_dir = Path(tempfile.gettempdir()) / "hrranker_benchmark"
+    for name in ["DOC_LOCATION", "TEST_DOCS", "TEMP_DOC_LOCATION"]:
+        os.environ.setdefault(name, str(temp_dir / name.lower()))
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    # The fake LLM has no provider limits
+    os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+    os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+    # The synthetic CVs share a lot of text, every one of them has to be ranked
+    os.environ.setdefault("DEDUP_ENABLED", "false")
+    # The benchmarks measure the LLM calls, which the years from the dates in the CVs would avoid
+    os.environ.setdefault("LOCAL_EXPERIENCE", "false")
+
+
+class RateLimitError(Exception):
+    # Looks like openai.error.RateLimitError to the LLM scheduler
+    http_status = 429
+
+
+class FakeEndpoint:
+    # Stand-in for the provider, rejects what goes above its limits within a rolling second
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_second = requests_per_minute / 60
+        self.tokens_per_second = tokens_per_minute / 60
+        self.recent: deque = deque()
+        self.accepted = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def check(self, input: Any):
+        tokens = estimate_tokens(str(input))
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0][0] >= 1.0:
+                self.recent.popleft()
+            recent_tokens = sum(t for _, t in self.recent)
+            if self.recent and (
+                len(self.recent) + 1 > self.requests_per_second
+                or recent_tokens + tokens > self.tokens_per_second
+            ):
+                self.rejected += 1
+                raise RateLimitError("Rate limit reached")
+            self.recent.append((now, tokens))
+            self.accepted += 1
+
+
+class FakeTaggingChain:
+    # Deterministic answers and the tokens a real model would have been billed for
+    calls = 0
+    prompt_tokens = 0
+    completion_tokens = 0
+
+    @classmethod
+    def reset_counters(cls):
+        cls.calls = 0
+        cls.prompt_tokens = 0
+        cls.completion_tokens = 0
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        pydantic_schema: Optional[Type[BaseModel]] = None,
+        latency: float = 0.0,
+        endpoint: Optional[FakeEndpoint] = None,
+    ):
+        self.schema = schema
+        self.pydantic_schema = pydantic_schema
+        self.latency = latency
+        self.endpoint = endpoint
+
+    def answer(self, input: Any) -> Any:
+        FakeTaggingChain.calls += 1
+        # str() of a document escapes the line breaks, which the years count relies on
+        text = getattr(input, "page_content", None) or str(input)
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        values = {
+            field: fake_value(field, property_schema, text, digest[i % len(digest)])
+            for i, (field, property_schema) in enumerate(
+                self.schema["properties"].items()
+            )
+        }
+        FakeTaggingChain.prompt_tokens += estimate_tokens(text) + estimate_schema_tokens(
+            self.schema
+        )
+        FakeTaggingChain.completion_tokens += estimate_tokens(json.dumps(values))
+        if self.pydantic_schema is not None:
+            return self.pydantic_schema(**values)
+        return values
+
+    def run(self, input: Any) -> Any:
+        if self.endpoint is not None:
+            self.endpoint.check(input)
+        time.sleep(self.latency)
+        return self.answer(input)
+
+    async def arun(self, input: Any) -> Any:
+        if self.endpoint is not None:
+            self.endpoint.check(input)
+        await asyncio.sleep(self.latency)
+        return self.answer(input)
+
+
+def fake_value(field: str, property_schema: Dict[str, Any], text: str, seed: int) -> Any:
+    # Skill answers depend on the text, so that prompt variants can be compared
+    has_skill_match = re.fullmatch(r"document_mentions_(.+)_experience", field)
+    if has_skill_match:
+        return count_mentions(has_skill_match.group(1), text) > 0
+    number_of_years_match = re.fullmatch(r"number_of_years_with_(.+)", field)
+    if number_of_years_match:
+        return count_years(number_of_years_match.group(1), text)
+    if "enum" in property_schema:
+        return property_schema["enum"][0]
+    property_type = property_schema.get("type")
+    if property_type == "boolean":
+        return seed % 4 != 0
+    if property_type == "integer":
+        return seed % 10
+    if property_type == "array":
+        return [w.lower() for w in text.split()[-2:]]
+    return f"{field}-{seed}"
+
+
+def mentions_pattern(skill: str) -> str:
+    # "Programming_in_PHP" looks for "php"
+    technology = skill.replace("_", " ").split()[-1].lower()
+    return rf"(?<!\w){re.escape(technology)}(?!\w)"
+
+
+def count_mentions(skill: str, text: str) -> int:
+    return len(re.findall(mentions_pattern(skill), text.lower()))
+
+
+def count_years(skill: str, text: str) -> int:
+    # Adds up the date ranges on or right above the lines mentioning the skill
+    lines = text.lower().splitlines()
+    years = 0
+    mentioned = False
+    for i, line in enumerate(lines):
+        if not re.search(mentions_pattern(skill), line):
+            continue
+        mentioned = True
+        for candidate_line in [line, lines[i - 1] if i > 0 else ""]:
+            date_range = re.search(r"((?:19|20)\d\d)\s*-\s*((?:19|20)\d\d)", candidate_line)
+            if date_range:
+                years += int(date_range.group(2)) - int(date_range.group(1))
+                break
+    if mentioned and years == 0:
+        return 1
+    return years
+
+
+def install_fake_llm(latency: float = 0.0, endpoint: Optional[FakeEndpoint] = None):
+    import hrranker.chain_registry as chain_registry
+
+    def create_tagging_chain_pydantic(pydantic_schema, llm, *args, **kwargs):
+        return FakeTaggingChain(
+            pydantic_schema.schema(), pydantic_schema, latency, endpoint
+        )
+
+    def create_tagging_chain(schema, llm, *args, **kwargs):
+        return FakeTaggingChain(schema, None, latency, endpoint)
+
+    # All chains are built by the registry, the ones it already has would be real or outdated
+    chain_registry.create_tagging_chain_pydantic = create_tagging_chain_pydantic
+    chain_registry.create_tagging_chain = create_tagging_chain
+    chain_registry.chain_registry.clear()
@@ -0,0 +1,117 @@
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from hrranker.log_init import logger
+
+# Milliseconds for importing each module in a fresh interpreter
+BUDGETS = {
+    "hrranker.config": 50,
+    "hrranker.log_init": 20,
+    "hrranker.bm25": 20,
+    "hrranker.skill_check": 20,
+    "hrranker.token_count": 20,
+    "hrranker.passage_selector": 50,
+    "hrranker.prescreen": 50,
+    "hrranker.experience": 20,
+    "hrranker.hr_model": 150,
+    "hrranker.leaderboard": 150,
+    "hrranker.keyword_store": 150,
+    "hrranker.metrics": 150,
+    "hrranker.run_journal": 150,
+    "hrranker.llm_cache": 200,
+    "hrranker.rerank": 200,
+    # numpy alone takes about 100 ms
+    "hrranker.score_matrix": 400,
+    "hrranker.dedup": 400,
+    "hrranker.batch_ranker": 400,
+}
+# None of the modules above may import these
+HEAVY_MODULES = ["langchain", "openai", "matplotlib", "pypdfium2", "chainlit", "tiktoken"]
+# Importing must not need the locations of the documents, the stores or the metrics
+UNSET_VARIABLES = [
+    "DOC_LOCATION",
+    "TEST_DOCS",
+    "TEMP_DOC_LOCATION",
+    "CACHE_LOCATION",
+    "METRICS_LOCATION",
+    "EXTRACTION_LOCATION",
+    "KEYWORD_STORE_LOCATION",
+    "DOC_INDEX_LOCATION",
+    "JOURNAL_LOCATION",
+]
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"milliseconds": 1000 * elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module: str) -> Tuple[float, List[str], List[str]]:
+    environment = {k: v for k, v in os.environ.items() if k not in UNSET_VARIABLES}
+    # The package has to be found from the empty working directory
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [str(Path(__file__).parents[2])]
+        + ([environment["PYTHONPATH"]] if environment.get("PYTHONPATH") else [])
+    )
+    # Importing must not create files, e.g. by opening a store in the working directory
+    with tempfile.TemporaryDirectory() as working_directory:
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=environment,
+            cwd=working_directory,
+        ).stdout
+        created = sorted(p.name for p in Path(working_directory).iterdir())
+    result = json.loads(output.strip().splitlines()[-1])
+    heavy = sorted(
+        {m.split(".")[0] for m in result["modules"] if m.split(".")[0] in HEAVY_MODULES}
+    )
+    return result["milliseconds"], heavy, created
+
+
+def check_budgets(budgets: Dict[str, float], repeat: int) -> List[str]:
+    violations = []
+    for module, budget in budgets.items():
+        try:
+            # The fastest repetition is the least disturbed by other processes
+            measurements = [measure_import(module) for _ in range(repeat)]
+        except subprocess.CalledProcessError as e:
+            message = f"{module} cannot be imported: {e.stderr.strip().splitlines()[-1]}"
+            violations.append(message)
+            logger.warning(message)
+            continue
+        milliseconds = min(m for m, _, _ in measurements)
+        _, heavy, created = measurements[0]
+        message = f"{module:>28}: {milliseconds:7.1f} ms (budget {budget} ms)"
+        if heavy:
+            message += f", imports {', '.join(heavy)}"
+        if created:
+            message += f", creates {', '.join(created)}"
+        if milliseconds > budget or heavy or created:
+            violations.append(message)
+            logger.warning(f"Over budget {message}")
+        else:
+            logger.info(message)
+    return violations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that the scoring, keyword and command line modules import quickly"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module")
+    args = parser.parse_args()
+    if check_budgets(BUDGETS, args.repeat):
+        sys.exit(1)
@@ -0,0 +1,48 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env
+
+setup_offline_env()
+
+from pathlib import Path
+
+import argparse
+import tempfile
+import time
+
+from hrranker.benchmarks.synthetic_cv import write_cv_corpus
+from hrranker.doc_index import DocumentIndex
+from hrranker.extract_data import extract_data
+from hrranker.log_init import logger
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental indexing benchmark")
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "cvs"
+        pdfs = write_cv_corpus(path, args.docs, args.pages)
+        document_index = DocumentIndex(Path(temp_dir) / "doc_index.sqlite")
+
+        start = time.perf_counter()
+        extract_data(path)
+        logger.info(f"Full parse: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        document_index.refresh(path)
+        logger.info(f"First indexing: {time.perf_counter() - start:.2f}s")
+
+        # One removed, one changed and one new CV
+        new_pdfs = write_cv_corpus(Path(temp_dir) / "new", 2, args.pages, seed=7)
+        pdfs[0].unlink()
+        new_pdfs[0].replace(pdfs[1])
+        new_pdfs[1].replace(path / "new_candidate.pdf")
+        start = time.perf_counter()
+        delta = document_index.refresh(path)
+        elapsed = time.perf_counter() - start
+        documents = document_index.documents(path)
+        logger.info(
+            f"Incremental refresh: {elapsed:.2f}s ({repr(delta)}), {len(documents)} documents"
+        )
+        assert len(delta.added) == len(delta.changed) == len(delta.removed) == 1
+        assert len(documents) == args.docs
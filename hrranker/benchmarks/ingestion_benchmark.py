@@ -0,0 +1,66 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env
+
+setup_offline_env()
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import argparse
+import tempfile
+import time
+
+from langchain.schema import Document
+
+from hrranker.benchmarks.synthetic_cv import write_cv_corpus
+from hrranker.extract_data import (
+    convert_pdf_to_document,
+    iter_documents,
+    list_pdfs,
+    parsing_executor,
+)
+from hrranker.log_init import logger
+
+
+def iter_serial_list(path: Path) -> Iterator[Document]:
+    # Like the previous extract_data, nothing is available before every PDF is parsed
+    docs = [convert_pdf_to_document(pdf) for pdf in list_pdfs(path)]
+    yield from docs
+
+
+def measure(name: str, documents: Iterator[Document]):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in documents:
+        count += 1
+        if first is None:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    logger.info(
+        f"{name}: first document after {first:.3f}s, {count} documents after {total:.3f}s "
+        + f"({count / total:.1f} documents/s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF ingestion benchmark")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--workers", type=str, default="1,2,4")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir)
+        write_cv_corpus(path, args.docs, args.pages)
+        measure("serial list", iter_serial_list(path))
+        for workers in [int(w) for w in args.workers.split(",")]:
+            # With a single CPU every size parses in the same thread
+            if isinstance(parsing_executor(workers), ThreadPoolExecutor):
+                executor_name = "1 thread in the process"
+            else:
+                executor_name = f"{workers} spawned processes"
+            measure(
+                f"parsing pool for {workers} workers ({executor_name})",
+                iter_documents(path, max_workers=workers),
+            )
@@ -0,0 +1,104 @@
+from typing import Dict, List
+
+import argparse
+import random
+import re
+import time
+
+from hrranker.log_init import logger
+from hrranker.skill_check import KeywordIndex, skill_check
+
+SPECIAL_KEYWORDS = ["c++", "c#", ".net", "node.js", "asp.net", "objective-c"]
+FILLER_WORDS = (
+    "experience team project developed responsible for the and with using "
+    + "company client solution design implementation years worked senior junior"
+).split()
+
+
+def create_skill_keywords(skill_count: int, rng: random.Random) -> Dict[str, List[str]]:
+    skill_keywords: Dict[str, List[str]] = {}
+    for i in range(skill_count):
+        keywords = [f"tech{i}", f"framework{i}", f"tool{i} suite"]
+        if i < len(SPECIAL_KEYWORDS):
+            keywords.append(SPECIAL_KEYWORDS[i])
+        skill_keywords[f"Skill {i}"] = keywords
+    return skill_keywords
+
+
+def create_document(
+    skill_keywords: Dict[str, List[str]], word_count: int, rng: random.Random
+) -> str:
+    all_keywords = [k for keywords in skill_keywords.values() for k in keywords]
+    words = []
+    for _ in range(word_count):
+        if rng.random() < 0.02:
+            words.append(rng.choice(all_keywords).upper())
+        else:
+            words.append(rng.choice(FILLER_WORDS))
+    return " ".join(words)
+
+
+def per_keyword_check(doc: str, skill_keywords: Dict[str, List[str]]) -> Dict[str, bool]:
+    return {
+        skill: skill_check(doc, keywords) for skill, keywords in skill_keywords.items()
+    }
+
+
+def unescaped_check(doc: str, skill_keywords: Dict[str, List[str]]) -> Dict[str, bool]:
+    # The previous implementation: lower case copy per call and unescaped \b regexes per keyword
+    matches = {}
+    for skill, keywords in skill_keywords.items():
+        content = doc.lower()
+        matches[skill] = False
+        for keyword in keywords:
+            try:
+                if re.compile(r"\b({0})\b".format(keyword), re.IGNORECASE).search(
+                    content
+                ):
+                    matches[skill] = True
+                    break
+            except re.error:
+                continue
+    return matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keyword matching benchmark")
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--skills", type=int, default=50)
+    parser.add_argument("--words", type=int, default=600)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    skill_keywords = create_skill_keywords(args.skills, rng)
+    docs = [create_document(skill_keywords, args.words, rng) for _ in range(args.docs)]
+
+    start = time.perf_counter()
+    unescaped_results = [unescaped_check(doc, skill_keywords) for doc in docs]
+    unescaped_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_keyword_results = [per_keyword_check(doc, skill_keywords) for doc in docs]
+    per_keyword_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    keyword_index = KeywordIndex(skill_keywords)
+    index_results = [keyword_index.matching_skills(doc) for doc in docs]
+    index_elapsed = time.perf_counter() - start
+
+    assert index_results == per_keyword_results
+    special_misses = sum(
+        1
+        for unescaped, index in zip(unescaped_results, index_results)
+        for skill in list(skill_keywords.keys())[: len(SPECIAL_KEYWORDS)]
+        if index[skill] and not unescaped[skill]
+    )
+    logger.info(f"{args.docs} documents x {args.skills} skills")
+    logger.info(f"Previous unescaped per keyword regexes: {unescaped_elapsed:.2f}s")
+    logger.info(f"Escaped per keyword regexes: {per_keyword_elapsed:.2f}s")
+    logger.info(
+        f"Keyword index: {index_elapsed:.2f}s ({per_keyword_elapsed / index_elapsed:.1f}x faster)"
+    )
+    logger.info(
+        f"Skill matches with special characters missed by the previous implementation: {special_misses}"
+    )
@@ -0,0 +1,80 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env, install_fake_llm
+
+import os
+
+setup_offline_env()
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from pathlib import Path
+from typing import List
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+
+from hrranker.benchmarks.chart_benchmark import create_candidate_infos
+from hrranker.benchmarks.synthetic_cv import write_cv_corpus
+from hrranker.candidate_ranker_langchain import aiter_candidate_infos, SKILLS, WEIGHTS
+from hrranker.extract_data import extract_data
+from hrranker.hr_model import CandidateInfo, sort_candidate_infos
+from hrranker.leaderboard import Leaderboard
+from hrranker.log_init import logger
+
+
+def measure_inserts(candidate_infos: List[CandidateInfo], size: int):
+    # The top of the ranking after every finished candidate, once sorting all of them again
+    start = time.perf_counter()
+    finished: List[CandidateInfo] = []
+    for candidate_info in candidate_infos:
+        finished.append(candidate_info)
+        resorted_top = sort_candidate_infos(finished)[:size]
+    resort_time = time.perf_counter() - start
+    start = time.perf_counter()
+    leaderboard = Leaderboard()
+    for candidate_info in candidate_infos:
+        leaderboard.add(candidate_info)
+        top = leaderboard.top(size)
+    insert_time = time.perf_counter() - start
+    assert [ci.source_file for ci in top] == [ci.source_file for ci in resorted_top]
+    logger.info(
+        f"{len(candidate_infos)} candidates: sorting again {1000 * resort_time:.1f} ms, "
+        + f"inserting {1000 * insert_time:.1f} ms ({resort_time / insert_time:.0f}x)"
+    )
+
+
+async def measure_first_result(docs_count: int, pages: int):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_cv_corpus(Path(temp_dir), docs_count, pages)
+        docs = extract_data(Path(temp_dir))
+        start = time.perf_counter()
+        first_result = None
+        logger.setLevel(logging.WARNING)
+        try:
+            async for _ in aiter_candidate_infos(docs, SKILLS, WEIGHTS):
+                if first_result is None:
+                    first_result = time.perf_counter() - start
+        finally:
+            logger.setLevel(logging.INFO)
+        finished = time.perf_counter() - start
+    logger.info(
+        f"{docs_count} CVs: first candidate in the ranking after {first_result:.2f}s, "
+        + f"all of them after {finished:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cost of the live ranking and time to the first candidate in it"
+    )
+    parser.add_argument("--sizes", type=str, default="1000,10000")
+    parser.add_argument("--size", type=int, default=10, help="candidates shown")
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    for count in [int(s) for s in args.sizes.split(",")]:
+        measure_inserts(create_candidate_infos(count), args.size)
+    install_fake_llm(args.latency)
+    asyncio.run(measure_first_result(args.docs, args.pages))
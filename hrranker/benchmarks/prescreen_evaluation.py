@@ -0,0 +1,82 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env, install_fake_llm
+
+import os
+
+setup_offline_env()
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from pathlib import Path
+from typing import List
+
+from langchain.schema import Document
+
+import argparse
+import asyncio
+import logging
+import time
+
+from hrranker.benchmarks.suite import create_documents
+from hrranker.benchmarks.synthetic_cv import TECHNOLOGIES
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.extract_data import extract_data
+from hrranker.hr_model import sort_candidate_infos
+from hrranker.keyword_extractor import aextract_keywords
+from hrranker.log_init import logger
+from hrranker.prescreen import prescreen_scores, shortlist, shortlist_recall
+
+
+async def evaluate(docs: List[Document], top_ks: List[int], top_ns: List[int]):
+    logger.info(f"Full run of {len(docs)} CVs")
+    logger.setLevel(logging.WARNING)
+    try:
+        full_ranking = sort_candidate_infos(
+            await process_docs(docs, SKILLS, WEIGHTS, prescreen_top_k=0, prescreen_threshold=0)
+        )
+        expression_pairs = await aextract_keywords(SKILLS)
+    finally:
+        logger.setLevel(logging.INFO)
+    ranked_sources = [str(ci.source_file) for ci in full_ranking]
+    start = time.perf_counter()
+    scores = prescreen_scores([doc.page_content for doc in docs], expression_pairs, WEIGHTS)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Pre-screen of {len(docs)} CVs in {1000 * elapsed:.1f} ms")
+    # The shortlisted CVs get the same extraction as in the full run, so the recall follows from the scores
+    for top_k in top_ks:
+        shortlisted = {docs[i].metadata["source"] for i in shortlist(scores, top_k)}
+        recalls = ", ".join(
+            f"recall@{top_n} {100 * shortlist_recall(ranked_sources, shortlisted, top_n):.0f}%"
+            for top_n in top_ns
+        )
+        logger.info(
+            f"Top {top_k:>5} ({100 * len(shortlisted) / len(docs):.0f}% of the LLM calls): {recalls}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recall of the pre-screen shortlist against a full ranking"
+    )
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--top-k", type=str, default="25,50,100,200")
+    parser.add_argument(
+        "--top-n", type=str, default="10,25", help="best candidates of the full run to find"
+    )
+    parser.add_argument("--folder", type=str, help="folder with real CVs")
+    parser.add_argument(
+        "--live", action="store_true", help="use the configured LLM instead of the fake one"
+    )
+    args = parser.parse_args()
+    if not args.live:
+        install_fake_llm()
+    if args.folder:
+        docs = extract_data(Path(args.folder))
+    else:
+        docs = create_documents(args.docs, args.pages, TECHNOLOGIES, 3)
+    asyncio.run(
+        evaluate(
+            docs,
+            [int(k) for k in args.top_k.split(",")],
+            [int(n) for n in args.top_n.split(",")],
+        )
+    )
@@ -0,0 +1,91 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env, install_fake_llm
+
+import os
+
+setup_offline_env()
+# Answers of earlier runs must not hide differences, set CACHE_ENABLED=true to save live calls
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from pathlib import Path
+from typing import Dict, List
+
+import argparse
+import asyncio
+import tempfile
+
+from hrranker.benchmarks.synthetic_cv import write_cv_corpus
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.extract_data import extract_data
+from hrranker.hr_model import CandidateInfo, NumberOfYearsResponse
+from hrranker.log_init import logger
+
+
+def skill_responses(
+    candidate_infos: List[CandidateInfo],
+) -> Dict[str, Dict[str, NumberOfYearsResponse]]:
+    return {
+        str(ci.source_file): {
+            nyr.number_of_years_response.skill: nyr.number_of_years_response
+            for nyr in ci.number_of_years_responses
+        }
+        for ci in candidate_infos
+    }
+
+
+def compare(baseline: List[CandidateInfo], pruned: List[CandidateInfo]):
+    baseline_responses = skill_responses(baseline)
+    pruned_responses = skill_responses(pruned)
+    compared = 0
+    same_has_skill = 0
+    same_years = 0
+    years_difference = 0
+    for source_file, responses in baseline_responses.items():
+        for skill, response in responses.items():
+            pruned_response = pruned_responses.get(source_file, {}).get(skill)
+            if pruned_response is None:
+                continue
+            compared += 1
+            same_has_skill += response.has_skill == pruned_response.has_skill
+            difference = abs(
+                response.number_of_years_with_skill
+                - pruned_response.number_of_years_with_skill
+            )
+            same_years += difference == 0
+            years_difference += difference
+    logger.info(
+        f"Compared {compared} skill answers: has_skill agrees {100 * same_has_skill / max(compared, 1):.1f}%, "
+        + f"years agree {100 * same_years / max(compared, 1):.1f}%, "
+        + f"mean absolute years difference {years_difference / max(compared, 1):.2f}"
+    )
+
+
+async def evaluate(docs, budget: int):
+    logger.info("Baseline with the full CV text")
+    baseline = await process_docs(docs, SKILLS, WEIGHTS, prompt_token_budget=0)
+    logger.info(f"Pruned to {budget} tokens per prompt")
+    pruned = await process_docs(docs, SKILLS, WEIGHTS, prompt_token_budget=budget)
+    compare(baseline, pruned)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares the extracted years of pruned prompts with the full text"
+    )
+    parser.add_argument("--budget", type=int, default=300)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--folder", type=str, help="folder with real CVs")
+    parser.add_argument(
+        "--live", action="store_true", help="use the configured LLM instead of the fake one"
+    )
+    args = parser.parse_args()
+    if not args.live:
+        install_fake_llm()
+    if args.folder:
+        docs = extract_data(Path(args.folder))
+        asyncio.run(evaluate(docs, args.budget))
+    else:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_cv_corpus(Path(temp_dir), args.docs, args.pages)
+            docs = extract_data(Path(temp_dir))
+            asyncio.run(evaluate(docs, args.budget))
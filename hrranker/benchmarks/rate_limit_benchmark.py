@@ -0,0 +1,140 @@
+from hrranker.benchmarks.fake_llm import (
+    FakeEndpoint,
+    setup_offline_env,
+    install_fake_llm,
+)
+
+import os
+
+setup_offline_env()
+# Cached answers would not reach the endpoint at all
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from langchain.schema import Document
+from typing import List
+
+import argparse
+import asyncio
+import random
+import time
+
+import hrranker.candidate_ranker_langchain as candidate_ranker_langchain
+import hrranker.llm_cache as llm_cache
+
+from hrranker.benchmarks.synthetic_cv import create_cv_lines
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.llm_scheduler import LLMScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from hrranker.log_init import logger
+
+
+def create_docs(prefix: str, doc_count: int) -> List[Document]:
+    rng = random.Random(prefix)
+    return [
+        Document(
+            page_content="\n".join(create_cv_lines(i, 1, rng)),
+            metadata={"source": f"{prefix}_candidate_{i}.pdf"},
+        )
+        for i in range(doc_count)
+    ]
+
+
+def install_scheduler(requests_per_minute: float, tokens_per_minute: float) -> LLMScheduler:
+    # Short delays, so that the benchmark does not take minutes
+    scheduler = LLMScheduler(
+        requests_per_minute,
+        tokens_per_minute,
+        max_retries=10,
+        base_delay=0.05,
+        max_delay=2.0,
+    )
+    llm_cache.llm_scheduler = scheduler
+    candidate_ranker_langchain.llm_scheduler = scheduler
+    return scheduler
+
+
+async def run_limits(
+    doc_count: int,
+    latency: float,
+    endpoint_rpm: float,
+    endpoint_tpm: float,
+    scheduler_rpm: float,
+    scheduler_tpm: float,
+):
+    endpoint = FakeEndpoint(endpoint_rpm, endpoint_tpm)
+    install_fake_llm(latency, endpoint)
+    scheduler = install_scheduler(scheduler_rpm, scheduler_tpm)
+    start = time.perf_counter()
+    candidate_infos = await process_docs(create_docs("limits", doc_count), SKILLS, WEIGHTS)
+    elapsed = time.perf_counter() - start
+    achieved_rpm = 60 * endpoint.accepted / elapsed
+    logger.info(
+        f"Scheduler limits {scheduler_rpm or 'none'} RPM / {scheduler_tpm or 'none'} TPM: "
+        + f"{len(candidate_infos)}/{doc_count} candidates in {elapsed:.2f}s, "
+        + f"{endpoint.rejected} requests rejected by the endpoint, "
+        + f"{achieved_rpm:.0f} RPM achieved of {endpoint_rpm:.0f} ({100 * achieved_rpm / endpoint_rpm:.0f}%)"
+    )
+    logger.info(scheduler.report())
+
+
+async def run_session(
+    prefix: str, doc_count: int, priority: int, max_concurrency: int
+) -> float:
+    start = time.perf_counter()
+    await process_docs(
+        create_docs(prefix, doc_count),
+        SKILLS,
+        WEIGHTS,
+        max_concurrency=max_concurrency,
+        priority=priority,
+    )
+    return time.perf_counter() - start
+
+
+async def run_priorities(
+    doc_count: int, latency: float, endpoint_rpm: float, endpoint_tpm: float
+):
+    for interactive_priority in [PRIORITY_BATCH, PRIORITY_INTERACTIVE]:
+        install_fake_llm(latency, FakeEndpoint(endpoint_rpm, endpoint_tpm))
+        install_scheduler(0.9 * endpoint_rpm, 0.9 * endpoint_tpm)
+        batch = asyncio.create_task(
+            run_session("batch", 3 * doc_count, PRIORITY_BATCH, 20)
+        )
+        # The UI session arrives while the batch job already fills the queue
+        await asyncio.sleep(0.5)
+        interactive_elapsed = await run_session(
+            "interactive", max(doc_count // 4, 1), interactive_priority, 5
+        )
+        batch_elapsed = await batch
+        logger.info(
+            f"UI session with priority {interactive_priority}: finished in {interactive_elapsed:.2f}s, "
+            + f"batch job in {batch_elapsed:.2f}s"
+        )
+
+
+async def run_benchmark(
+    doc_count: int, latency: float, endpoint_rpm: float, endpoint_tpm: float
+):
+    # Without limits of its own the scheduler only learns about the limits from rate limit errors
+    await run_limits(doc_count, latency, endpoint_rpm, endpoint_tpm, 0, 0)
+    # Slightly below the provider limits, which are not enforced exactly like a token bucket
+    await run_limits(
+        doc_count,
+        latency,
+        endpoint_rpm,
+        endpoint_tpm,
+        0.9 * endpoint_rpm,
+        0.9 * endpoint_tpm,
+    )
+    await run_priorities(doc_count, latency, endpoint_rpm, endpoint_tpm)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="LLM scheduler against an endpoint with rate limits"
+    )
+    parser.add_argument("--docs", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rpm", type=float, default=1800)
+    parser.add_argument("--tpm", type=float, default=2000000)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.docs, args.latency, args.rpm, args.tpm))
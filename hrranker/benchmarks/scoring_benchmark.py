@@ -0,0 +1,108 @@
+from typing import List
+
+import argparse
+import time
+
+import numpy as np
+
+from hrranker.hr_model import (
+    CandidateInfo,
+    NameOfCandidateResponse,
+    NumberOfYearsResponse,
+    NumberOfYearsResponseWithWeight,
+    sort_candidate_infos,
+)
+from hrranker.log_init import logger
+from hrranker.score_matrix import ScoreMatrix
+
+
+def create_score_matrix(
+    candidate_count: int, skill_count: int, rng: np.random.Generator
+) -> ScoreMatrix:
+    years = rng.integers(0, 15, size=(candidate_count, skill_count))
+    has_skill = rng.random((candidate_count, skill_count)) < 0.3
+    total_experience = rng.integers(0, 30, size=candidate_count)
+    skills = [f"skill_{i}" for i in range(skill_count)]
+    return ScoreMatrix(skills, years, has_skill, total_experience)
+
+
+def create_candidate_infos(
+    score_matrix: ScoreMatrix, weights: np.ndarray
+) -> List[CandidateInfo]:
+    candidate_infos = []
+    for row in range(len(score_matrix)):
+        name_of_candidate_response = NameOfCandidateResponse(
+            name=f"Candidate {row}",
+            email="",
+            age=None,
+            gender="unknown",
+            years_of_experience=int(score_matrix.total_experience[row]),
+        )
+        number_of_years_responses = [
+            NumberOfYearsResponseWithWeight(
+                number_of_years_response=NumberOfYearsResponse(
+                    has_skill=bool(score_matrix.has_skill[row, column]),
+                    number_of_years_with_skill=int(score_matrix.years[row, column]),
+                    skill=skill,
+                ),
+                score_weight=int(weights[column]),
+            )
+            for column, skill in enumerate(score_matrix.skills)
+        ]
+        candidate_infos.append(
+            CandidateInfo(
+                name_of_candidate_response=name_of_candidate_response,
+                number_of_years_responses=number_of_years_responses,
+                source_file=f"candidate_{row}.pdf",
+            )
+        )
+    return candidate_infos
+
+
+def benchmark_python(score_matrix: ScoreMatrix, weights: np.ndarray, k: int) -> float:
+    candidate_infos = create_candidate_infos(score_matrix, weights)
+    start = time.perf_counter()
+    for candidate_info in candidate_infos:
+        candidate_info.calculate_score()
+    top_candidates = sort_candidate_infos(candidate_infos)[:k]
+    elapsed = time.perf_counter() - start
+    expected = score_matrix.scores(weights)[score_matrix.top_k(weights, k)]
+    assert [ci.score for ci in top_candidates] == expected.astype(int).tolist()
+    return elapsed
+
+
+def benchmark_matrix(score_matrix: ScoreMatrix, weight_matrix: np.ndarray, k: int) -> float:
+    start = time.perf_counter()
+    score_matrix.top_k(weight_matrix, k)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized scoring benchmark")
+    parser.add_argument("--sizes", type=str, default="1000,10000,100000")
+    parser.add_argument("--skills", type=int, default=20)
+    parser.add_argument("--profiles", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--python-limit", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    weight_matrix = rng.integers(0, 5, size=(args.profiles, args.skills))
+    for candidate_count in [int(s) for s in args.sizes.split(",")]:
+        score_matrix = create_score_matrix(candidate_count, args.skills, rng)
+        single = benchmark_matrix(score_matrix, weight_matrix[0], args.top_k)
+        multiple = benchmark_matrix(score_matrix, weight_matrix, args.top_k)
+        logger.info(
+            f"{candidate_count:>7} candidates: 1 profile {single * 1000:8.2f} ms "
+            + f"({candidate_count / single:,.0f} candidates/s), "
+            + f"{args.profiles} profiles {multiple * 1000:8.2f} ms "
+            + f"({candidate_count * args.profiles / multiple:,.0f} candidate profiles/s)"
+        )
+        if candidate_count <= args.python_limit:
+            python_elapsed = benchmark_python(
+                score_matrix, weight_matrix[0], args.top_k
+            )
+            logger.info(
+                f"{candidate_count:>7} candidates: CandidateInfo loop and sort {python_elapsed * 1000:8.2f} ms "
+                + f"({candidate_count / python_elapsed:,.0f} candidates/s)"
+            )
@@ -0,0 +1,253 @@
+from hrranker.benchmarks.fake_llm import (
+    FakeTaggingChain,
+    setup_offline_env,
+    install_fake_llm,
+)
+
+import os
+
+setup_offline_env()
+# Every run has to do the same work, so nothing may come from the cache
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.schema import Document
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from hrranker.benchmarks.scoring_benchmark import create_score_matrix
+from hrranker.benchmarks.synthetic_cv import (
+    TECHNOLOGIES,
+    create_cv_lines,
+    write_cv_corpus,
+)
+from hrranker.candidate_ranker_langchain import process_docs
+from hrranker.extract_data import iter_pdf_documents
+from hrranker.keyword_store import load_seed, normalize_skill
+from hrranker.log_init import logger
+from hrranker.skill_check import KeywordIndex
+
+RESULTS_LOCATION = Path("benchmark_results")
+SIZES = [10, 100, 10000]
+SKILLS = ["Wordpress", "PHP", "Javascript", "CSS", "Rust", "OCaml"]
+WEIGHTS = [3, 2, 1, 1, 1, 1]
+
+
+def create_documents(
+    count: int, page_count: int, technologies: List[str], skills_per_job: int
+) -> List[Document]:
+    rng = random.Random(42)
+    return [
+        Document(
+            page_content="\n".join(
+                create_cv_lines(i, page_count, rng, technologies, skills_per_job)
+            ),
+            metadata={"source": f"candidate_{i:05d}.pdf"},
+        )
+        for i in range(count)
+    ]
+
+
+def run_ingestion(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdfs = write_cv_corpus(
+            Path(temp_dir), size, args.pages, 42, args.technologies, args.skills_per_job
+        )
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_pdf_documents(pdfs))
+        elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "items": count}
+
+
+def run_keyword_matching(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    seed = load_seed()
+    skill_keywords = {
+        skill: seed.get(normalize_skill(skill), [normalize_skill(skill)])
+        for skill in args.technologies
+    }
+    docs = create_documents(size, args.pages, args.technologies, args.skills_per_job)
+    start = time.perf_counter()
+    keyword_index = KeywordIndex(skill_keywords)
+    matches = sum(len(keyword_index.matching_skills(doc.page_content)) for doc in docs)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "items": size, "matched_skills": matches}
+
+
+def run_extraction(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    install_fake_llm(args.latency)
+    FakeTaggingChain.reset_counters()
+    docs = create_documents(size, args.pages, args.technologies, args.skills_per_job)
+    start = time.perf_counter()
+    candidate_infos = asyncio.run(process_docs(docs, SKILLS, WEIGHTS))
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "items": len(candidate_infos),
+        "llm_calls": FakeTaggingChain.calls,
+        "prompt_tokens": FakeTaggingChain.prompt_tokens,
+        "completion_tokens": FakeTaggingChain.completion_tokens,
+    }
+
+
+def run_scoring(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    rng = np.random.default_rng(42)
+    score_matrix = create_score_matrix(size, len(args.technologies), rng)
+    weight_matrix = rng.integers(0, 5, size=(100, len(args.technologies)))
+    start = time.perf_counter()
+    score_matrix.top_k(weight_matrix, 20)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "items": size * len(weight_matrix)}
+
+
+SCENARIOS: Dict[str, Callable[[int, argparse.Namespace], Dict[str, Any]]] = {
+    "ingestion": run_ingestion,
+    "keyword_matching": run_keyword_matching,
+    "extraction": run_extraction,
+    "scoring": run_scoring,
+}
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results: Dict[str, Any], location: Path) -> Path:
+    location.mkdir(parents=True, exist_ok=True)
+    path = location / f"{results['started']}_{results['revision']}.json"
+    path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return path
+
+
+def previous_results(location: Path, current: Path) -> Optional[Path]:
+    # File names start with the time of the run
+    paths = sorted(p for p in location.glob("*.json") if p != current)
+    return paths[-1] if paths else None
+
+
+def compare_results(
+    results: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    regressions = []
+    baseline_seconds = {
+        (r["scenario"], r["size"]): r["seconds"] for r in baseline["results"]
+    }
+    for result in results["results"]:
+        key = (result["scenario"], result["size"])
+        if key not in baseline_seconds:
+            continue
+        ratio = result["seconds"] / max(baseline_seconds[key], 1e-9)
+        message = (
+            f"{result['scenario']:>16} {result['size']:>6}: {baseline_seconds[key]:8.3f}s -> "
+            + f"{result['seconds']:8.3f}s ({ratio:.2f}x)"
+        )
+        # Differences of a few milliseconds are noise
+        if ratio > 1 + threshold and result["seconds"] - baseline_seconds[key] > 0.01:
+            regressions.append(message)
+            logger.warning(f"Regression {message}")
+        else:
+            logger.info(message)
+    return regressions
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Any] = {
+        "started": datetime.now().strftime("%Y%m%d-%H%M%S"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "arguments": {
+            k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+        },
+        "results": [],
+    }
+    for scenario in args.scenarios:
+        for size in args.sizes:
+            # The per candidate log lines would dominate the timings
+            logger.setLevel(logging.WARNING)
+            try:
+                # The fastest repetition is the least disturbed by other processes
+                result = min(
+                    (SCENARIOS[scenario](size, args) for _ in range(args.repeat)),
+                    key=lambda r: r["seconds"],
+                )
+            finally:
+                logger.setLevel(logging.INFO)
+            result = {"scenario": scenario, "size": size, **result}
+            result["items_per_second"] = result["items"] / max(result["seconds"], 1e-9)
+            results["results"].append(result)
+            logger.info(
+                f"{scenario:>16} {size:>6}: {result['seconds']:8.3f}s "
+                + f"({result['items_per_second']:,.0f} items/s)"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks on a synthetic CV corpus with a fake LLM"
+    )
+    parser.add_argument(
+        "--scenarios", type=str, default=",".join(SCENARIOS), help="comma separated"
+    )
+    parser.add_argument("--sizes", type=str, default=",".join(str(s) for s in SIZES))
+    parser.add_argument("--pages", type=int, default=2, help="pages per CV")
+    parser.add_argument(
+        "--technologies",
+        type=str,
+        default=",".join(TECHNOLOGIES),
+        help="skill mix of the synthetic CVs",
+    )
+    parser.add_argument("--skills-per-job", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per LLM call")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario and size")
+    parser.add_argument("--results", type=Path, default=RESULTS_LOCATION)
+    parser.add_argument(
+        "--compare", type=Path, help="results file to compare with, default the previous run"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="slowdown reported as regression"
+    )
+    args = parser.parse_args()
+    args.scenarios = args.scenarios.split(",")
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    args.technologies = args.technologies.split(",")
+
+    results = run_suite(args)
+    results_path = save_results(results, args.results)
+    logger.info(f"Results saved to {results_path}")
+    baseline_path = args.compare or previous_results(args.results, results_path)
+    if baseline_path is not None:
+        logger.info(f"Compared with {baseline_path}")
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if compare_results(results, baseline, args.threshold):
+            sys.exit(1)
@@ -0,0 +1,70 @@
+from pathlib import Path
+from typing import List
+
+import random
+
+from hrranker.benchmarks.synthetic_pdf import write_pdf, LINES_PER_PAGE
+
+FIRST_NAMES = ["Ashwini", "Bharat", "Maria", "John", "Fatima", "Li", "Olga", "Pedro"]
+LAST_NAMES = ["Sadamate", "Kumar", "Silva", "Doe", "Hassan", "Wei", "Ivanova", "Costa"]
+TECHNOLOGIES = [
+    "Wordpress",
+    "PHP",
+    "Javascript",
+    "CSS",
+    "HTML",
+    "Rust",
+    "OCaml",
+    "Figma",
+    "Adobe XD",
+    "Python",
+    "SQL",
+    "React",
+]
+FILLER = (
+    "Responsible for the development and maintenance of customer facing applications. "
+    + "Worked closely with the product team on requirements and delivery. "
+    + "Improved the performance and reliability of existing services."
+)
+
+
+def create_cv_lines(
+    index: int,
+    page_count: int,
+    rng: random.Random,
+    technologies: List[str] = TECHNOLOGIES,
+    skills_per_job: int = 3,
+) -> List[str]:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [name, f"{name.lower().replace(' ', '.')}{index}@example.com", ""]
+    year = 2023
+    while len(lines) < page_count * LINES_PER_PAGE:
+        start = year - rng.randint(1, 4)
+        job_technologies = ", ".join(
+            rng.sample(technologies, min(skills_per_job, len(technologies)))
+        )
+        lines.append(f"{start} - {year} Software Developer at Company {rng.randint(1, 500)}")
+        lines.append(f"Technologies: {job_technologies}")
+        lines.extend(FILLER[i : i + 90] for i in range(0, len(FILLER), 90))
+        year = start
+    return lines
+
+
+def write_cv_corpus(
+    directory: Path,
+    count: int,
+    page_count: int = 2,
+    seed: int = 42,
+    technologies: List[str] = TECHNOLOGIES,
+    skills_per_job: int = 3,
+) -> List[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = directory / f"candidate_{i:05d}.pdf"
+        write_pdf(
+            path, create_cv_lines(i, page_count, rng, technologies, skills_per_job)
+        )
+        paths.append(path)
+    return paths
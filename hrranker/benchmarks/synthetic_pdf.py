@@ -0,0 +1,62 @@
+## Minimal PDF writer for synthetic CVs, so that the benchmarks need no PDF library
+
+from pathlib import Path
+from typing import List
+
+LINES_PER_PAGE = 50
+
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_stream(lines: List[str]) -> bytes:
+    commands = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+    for line in lines:
+        commands.append(f"({escape_pdf_text(line)}) Tj T*")
+    commands.append("ET")
+    return "\n".join(commands).encode("latin-1", errors="replace")
+
+
+def write_pdf(path: Path, lines: List[str], lines_per_page: int = LINES_PER_PAGE):
+    pages = [
+        lines[i : i + lines_per_page] for i in range(0, max(len(lines), 1), lines_per_page)
+    ]
+    page_count = len(pages)
+    # Object numbers: 1 catalog, 2 pages, 3 font, then a page and a content stream per page
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        (
+            "<< /Type /Pages /Kids ["
+            + " ".join(f"{4 + 2 * i} 0 R" for i in range(page_count))
+            + f"] /Count {page_count} >>"
+        ).encode("ascii"),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, page_lines in enumerate(pages):
+        stream = page_stream(page_lines)
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                + f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+            ).encode("ascii")
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode("ascii")
+            + stream
+            + b"\nendstream"
+        )
+    content = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref_offset = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    for offset in offsets:
+        content += f"{offset:010d} 00000 n \n".encode("ascii")
+    content += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        + f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("ascii")
+    path.write_bytes(bytes(content))
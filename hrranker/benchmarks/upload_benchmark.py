@@ -0,0 +1,99 @@
+from hrranker.benchmarks.fake_llm import setup_offline_env, install_fake_llm
+
+import os
+
+setup_offline_env()
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from pathlib import Path
+from typing import List, Tuple
+
+from langchain.schema import Document
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+
+from hrranker.benchmarks.synthetic_cv import write_cv_corpus
+from hrranker.candidate_ranker_langchain import process_docs, SKILLS, WEIGHTS
+from hrranker.extract_data import DocumentFeed, convert_pdf_to_document
+from hrranker.hr_model import CandidateInfo
+from hrranker.log_init import logger
+
+
+def create_batches(pdfs: List[Path], batch_size: int) -> List[List[Path]]:
+    return [pdfs[i : i + batch_size] for i in range(0, len(pdfs), batch_size)]
+
+
+async def upload_then_rank(
+    batches: List[List[Path]], target: Path, think_time: float
+) -> Tuple[List[CandidateInfo], float]:
+    # The flow before: blocking writes and parsing on the loop, ranking after the last upload
+    docs: List[Document] = []
+    for i, batch in enumerate(batches):
+        last_upload = time.perf_counter()
+        for pdf in batch:
+            new_path = target / pdf.name
+            with open(new_path, "wb") as f:
+                f.write(pdf.read_bytes())
+            docs.append(convert_pdf_to_document(new_path))
+        if i < len(batches) - 1:
+            await asyncio.sleep(think_time)
+    return await process_docs(docs, SKILLS, WEIGHTS), last_upload
+
+
+async def pipelined_upload(
+    batches: List[List[Path]], target: Path, think_time: float
+) -> Tuple[List[CandidateInfo], float]:
+    # Like the chat interface: every upload is ranked while the next one is chosen
+    document_feed = DocumentFeed()
+    ranking = None
+    for i, batch in enumerate(batches):
+        last_upload = time.perf_counter()
+        for pdf in batch:
+            new_path = target / pdf.name
+            await asyncio.to_thread(new_path.write_bytes, pdf.read_bytes())
+            document_feed.add(new_path)
+        if ranking is None:
+            ranking = asyncio.create_task(process_docs(document_feed, SKILLS, WEIGHTS))
+        if i < len(batches) - 1:
+            await asyncio.sleep(think_time)
+    document_feed.close()
+    return await ranking, last_upload
+
+
+async def measure(name: str, flow, batches: List[List[Path]], think_time: float):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = time.perf_counter()
+        logger.setLevel(logging.WARNING)
+        try:
+            candidate_infos, last_upload = await flow(batches, Path(temp_dir), think_time)
+        finally:
+            logger.setLevel(logging.INFO)
+        finished = time.perf_counter()
+    logger.info(
+        f"{name}: {len(candidate_infos)} candidates ranked {finished - last_upload:.2f}s "
+        + f"after the last upload, {finished - start:.2f}s in total"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time to the ranking after the last upload of a chat session"
+    )
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=5, help="CVs per upload")
+    parser.add_argument(
+        "--think-time", type=float, default=3.0, help="seconds between two uploads"
+    )
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    install_fake_llm(args.latency)
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        batches = create_batches(
+            write_cv_corpus(Path(corpus_dir), args.docs), args.batch_size
+        )
+        asyncio.run(measure("upload, then rank", upload_then_rank, batches, args.think_time))
+        asyncio.run(measure("pipelined", pipelined_upload, batches, args.think_time))
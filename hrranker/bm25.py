@@ -0,0 +1,54 @@
+from collections import Counter
+from typing import List
+
+import math
+import re
+
+
+def tokenize(text: str) -> List[str]:
+    # Keeps technology names like c++, c# or .net as single tokens
+    return [
+        t.rstrip(".")
+        for t in re.findall(r"\.?\w[\w+#.]*", text.lower())
+        if t.rstrip(".")
+    ]
+
+
+class BM25:
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokens) for tokens in documents]
+        self.lengths = [len(tokens) for tokens in documents]
+        self.average_length = (
+            sum(self.lengths) / len(self.lengths) if len(self.lengths) > 0 else 0
+        )
+        document_frequencies: Counter = Counter()
+        for term_frequency in self.term_frequencies:
+            document_frequencies.update(term_frequency.keys())
+        document_count = len(documents)
+        self.idf = {
+            term: math.log(1 + (document_count - df + 0.5) / (df + 0.5))
+            for term, df in document_frequencies.items()
+        }
+
+    def score(self, query: List[str], index: int) -> float:
+        term_frequency = self.term_frequencies[index]
+        length_norm = self.k1 * (
+            1 - self.b + self.b * self.lengths[index] / (self.average_length or 1)
+        )
+        score = 0.0
+        for term in set(query):
+            frequency = term_frequency.get(term, 0)
+            if frequency == 0:
+                continue
+            score += (
+                self.idf[term]
+                * frequency
+                * (self.k1 + 1)
+                / (frequency + length_norm)
+            )
+        return score
+
+    def scores(self, query: List[str]) -> List[float]:
+        return [self.score(query, i) for i in range(len(self.term_frequencies))]
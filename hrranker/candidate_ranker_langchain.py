@@ -1,32 +1,74 @@
-from hrranker.keyword_extractor import extract_keywords
-from hrranker.skill_check import skill_check
+from hrranker.keyword_extractor import aextract_keywords
+from hrranker.skill_check import KeywordIndex
 from langchain import PromptTemplate
 from langchain.schema import Document
-from langchain.chains import create_tagging_chain_pydantic, create_tagging_chain
-from typing import List, Any
+from typing import (
+    TYPE_CHECKING,
+    List,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from hrranker.extract_data import extract_data
+from hrranker.doc_index import DocumentIndex
+from hrranker.experience import ExperienceAnalysis, ExperienceStats
 from hrranker.config import cfg
+from hrranker.dedup import DuplicateIndex
 from hrranker.hr_model import (
+    CandidateExtraction,
     CandidateInfo,
+    ExtractionStats,
     NameOfCandidateResponse,
     NumberOfYearsResponse,
     NumberOfYearsResponseWithWeight,
-    create_skill_schema,
     sort_candidate_infos,
+    name_of_candidate_response_schema,
 )
-from hrranker.name_extractor import extract_name
+from hrranker.name_extractor import aresolve_name, resolve_name_locally, skill_vocabulary
+from hrranker.chain_registry import chain_registry
 from hrranker.log_init import logger
+from hrranker.llm_cache import arun_cached, cache_report
+from hrranker.llm_scheduler import PRIORITY_BATCH, llm_scheduler
+from hrranker.metrics import current_run_id, metrics, start_metrics_server
+from hrranker.rerank import (
+    extraction_path,
+    rescore,
+    run_extraction_location,
+    save_extraction,
+)
+from hrranker.token_count import estimate_tokens, estimate_schema_tokens
+from hrranker.passage_selector import PruningStats, select_header, select_passages
+from hrranker.prescreen import prescreen_scores, shortlist
 
+import argparse
 import asyncio
+import time
+import uuid
+
+from functools import cached_property
+from pathlib import Path
 
-import chainlit
+if TYPE_CHECKING:
+    # Only the chat interface passes a message, the command line does not need to import chainlit
+    import chainlit
 
 SKILL_TEMPLATE = PromptTemplate.from_template(
     "Based on the following text, how many years does this person have in {technology}.? "
     + "And tell whether this person has experience in {technology}."
     + "If a person has experience in {technology} but you cannot figure out the years reply with 1.\n\n"
 )
+MULTI_SKILL_TEMPLATE = PromptTemplate.from_template(
+    "Based on the following text, how many years does this person have in each of these technologies: {technologies}? "
+    + "And tell for each of these technologies whether this person has experience in it."
+    + "If a person has experience in a technology but you cannot figure out the years reply with 1.\n\n"
+)
+EXTRACTION_MODE_PER_SKILL = "per_skill"
+EXTRACTION_MODE_BATCHED = "batched"
 SKILLS = [
     "Wordpress",
     "Programming in PHP",
@@ -38,105 +80,717 @@ SKILLS = [
 WEIGHTS = [3, 2, 1, 1, 1, 1]
 
 
+class RankingContext:
+    # Settings and shared state of one process_docs run
+    skills: List[str]
+    weights: List[int]
+    expression_pairs: List[Any]
+    extraction_mode: str
+    prompt_token_budget: int
+    keyword_index: KeywordIndex
+    name_vocabulary: Set[str]
+    pruning_stats: PruningStats
+    cl_msg: Optional["chainlit.Message"]
+    priority: int
+    candidate_retries: int
+    failed_sources: List[str]
+    prescreen_scores: Dict[str, float]
+    local_experience: bool
+    experience_stats: ExperienceStats
+    run_id: str
+
+    def __init__(
+        self,
+        skills: List[str],
+        weights: List[int],
+        expression_pairs: List[Any],
+        extraction_mode: str = cfg.extraction_mode,
+        prompt_token_budget: int = cfg.prompt_token_budget,
+        cl_msg: Optional["chainlit.Message"] = None,
+        priority: int = PRIORITY_BATCH,
+        candidate_retries: int = cfg.candidate_retries,
+        local_experience: bool = cfg.local_experience,
+    ):
+        self.skills = skills
+        self.weights = weights
+        self.expression_pairs = expression_pairs
+        self.extraction_mode = extraction_mode
+        self.prompt_token_budget = prompt_token_budget
+        self.keyword_index = create_keyword_index(expression_pairs)
+        # Skill words are never taken for the name of the candidate
+        self.name_vocabulary = skill_vocabulary(skills, expression_pairs)
+        self.pruning_stats = PruningStats()
+        self.cl_msg = cl_msg
+        self.priority = priority
+        self.candidate_retries = candidate_retries
+        self.failed_sources = []
+        self.prescreen_scores = {}
+        self.local_experience = local_experience
+        self.experience_stats = ExperienceStats()
+        # The run of the metrics summary, so that the extractions can be found by it
+        self.run_id = current_run_id() or uuid.uuid4().hex[:8]
+
+    @cached_property
+    def extraction_location(self) -> Path:
+        return run_extraction_location(self.run_id)
+
+
 async def process_docs(
-    docs: List[Document],
+    docs: Union[List[Document], AsyncIterable[Document]],
     skills: List[str] = SKILLS,
     weights: List[int] = WEIGHTS,
-    cl_msg: chainlit.Message = None,
+    cl_msg: Optional["chainlit.Message"] = None,
+    max_concurrency: int = cfg.max_concurrency,
+    candidate_timeout: float = cfg.candidate_timeout,
+    extraction_mode: str = cfg.extraction_mode,
+    prompt_token_budget: int = cfg.prompt_token_budget,
+    priority: int = PRIORITY_BATCH,
+    deduplicate: bool = cfg.dedup_enabled,
+    prescreen_top_k: int = cfg.prescreen_top_k,
+    prescreen_threshold: float = cfg.prescreen_threshold,
+    local_experience: bool = cfg.local_experience,
 ) -> List[CandidateInfo]:
-    candidate_infos: List[CandidateInfo] = []
-    expression_pairs: List[Any] = extract_keywords(skills)
+    return [
+        candidate_info
+        async for candidate_info in aiter_candidate_infos(
+            docs,
+            skills,
+            weights,
+            cl_msg,
+            max_concurrency,
+            candidate_timeout,
+            extraction_mode,
+            prompt_token_budget,
+            priority,
+            deduplicate,
+            prescreen_top_k,
+            prescreen_threshold,
+            local_experience,
+        )
+    ]
+
+
+async def aiter_candidate_infos(
+    docs: Union[List[Document], AsyncIterable[Document]],
+    skills: List[str] = SKILLS,
+    weights: List[int] = WEIGHTS,
+    cl_msg: Optional["chainlit.Message"] = None,
+    max_concurrency: int = cfg.max_concurrency,
+    candidate_timeout: float = cfg.candidate_timeout,
+    extraction_mode: str = cfg.extraction_mode,
+    prompt_token_budget: int = cfg.prompt_token_budget,
+    priority: int = PRIORITY_BATCH,
+    deduplicate: bool = cfg.dedup_enabled,
+    prescreen_top_k: int = cfg.prescreen_top_k,
+    prescreen_threshold: float = cfg.prescreen_threshold,
+    local_experience: bool = cfg.local_experience,
+) -> AsyncIterator[CandidateInfo]:
+    # Yields the candidates in the order in which they finish
+    finished_count = 0
+    expression_pairs: List[Any] = await aextract_keywords(skills, priority)
     extracted_strs = ",".join([str(ep[1]) for ep in expression_pairs])
     logger.info("Keywords: %s", extracted_strs)
     if cl_msg:
         await cl_msg.stream_token(f"Extracted keywords: **{extracted_strs}**\n\n")
-    for doc in docs:
-        chain = create_tagging_chain_pydantic(NameOfCandidateResponse, cfg.llm)
-        try:
-            candidate_details = await chain.arun(doc)
-            logger.info(f"Response: {candidate_details}")
-            if candidate_details.name is None or candidate_details.name == "":
-                candidate_details.name = " ".join(extract_name(doc.metadata["source"]))
-            if cl_msg:
-                await cl_msg.stream_token(f"Processing {candidate_details.name}\n\n")
-            number_of_year_responses: List[NumberOfYearsResponseWithWeight] = []
-            process_skills(
-                doc, number_of_year_responses, expression_pairs, skills, weights
-            )
-            candidate_info = CandidateInfo(
-                name_of_candidate_response=candidate_details,
-                number_of_years_responses=number_of_year_responses,
-                source_file=doc.metadata["source"],
-            )
-            candidate_infos.append(candidate_info)
-        except Exception as e:
-            logger.error(f"Could not process {doc.metadata['source']} due to {e}")
-    return candidate_infos
+    semaphore = asyncio.Semaphore(max_concurrency)
+    context = RankingContext(
+        skills,
+        weights,
+        expression_pairs,
+        extraction_mode,
+        prompt_token_budget,
+        cl_msg,
+        priority,
+        local_experience=local_experience,
+    )
+    screened_out_infos: List[CandidateInfo] = []
+    if prescreen_top_k > 0 or prescreen_threshold > 0:
+        docs, screened_out_infos = await prescreen_docs(
+            docs, context, prescreen_top_k, prescreen_threshold
+        )
+    per_skill_stats = ExtractionStats()
+    extraction_stats = ExtractionStats()
+    duplicate_index = DuplicateIndex(cfg.dedup_threshold) if deduplicate else None
+    # Duplicates waiting for their representative, which is still being processed
+    waiting_duplicates: Dict[str, List[str]] = {}
+    duplicate_count = 0
+    doc_iterator = as_async_iterator(docs)
+    next_doc: Optional[asyncio.Future] = asyncio.ensure_future(anext(doc_iterator))
+    pending: Dict[asyncio.Task, str] = {}
+    received = 0
+    try:
+        while next_doc is not None or pending:
+            waiting = set(pending)
+            # Stop reading documents while enough are waiting to be processed
+            if next_doc is not None and len(pending) < cfg.max_pending_documents:
+                waiting.add(next_doc)
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
+                ranked_infos: List[CandidateInfo] = []
+                if finished is next_doc:
+                    try:
+                        doc = finished.result()
+                    except StopAsyncIteration:
+                        next_doc = None
+                        continue
+                    next_doc = asyncio.ensure_future(anext(doc_iterator))
+                    received += 1
+                    source = doc.metadata["source"]
+                    representative = None
+                    if duplicate_index is not None:
+                        representative, doc_similarity = duplicate_index.add(
+                            source, doc.page_content
+                        )
+                    if representative is not None:
+                        # Found before any LLM call, the result of the representative is reused
+                        duplicate_count += 1
+                        metrics.increment("duplicate_documents")
+                        logger.info(
+                            f"{source} is a duplicate of {representative} "
+                            + f"({100 * doc_similarity:.0f}% similar)"
+                        )
+                        if representative in waiting_duplicates:
+                            waiting_duplicates[representative].append(source)
+                            continue
+                        ranked_infos = load_duplicate(representative, [source], context)
+                    else:
+                        per_skill_stats.add(
+                            estimate_skill_extraction(
+                                doc.page_content, skills, EXTRACTION_MODE_PER_SKILL
+                            )
+                        )
+                        extraction_stats.add(
+                            estimate_skill_extraction(
+                                doc.page_content, skills, extraction_mode
+                            )
+                        )
+                        task = asyncio.create_task(
+                            process_doc_bounded(semaphore, candidate_timeout, doc, context)
+                        )
+                        pending[task] = source
+                        waiting_duplicates[source] = []
+                        continue
+                else:
+                    source = pending.pop(finished)
+                    candidate_info = finished.result()
+                    duplicate_sources = waiting_duplicates.pop(source)
+                    if candidate_info is None:
+                        context.failed_sources.extend(duplicate_sources)
+                        continue
+                    ranked_infos = [candidate_info] + [
+                        create_duplicate(candidate_info, duplicate_source, context)
+                        for duplicate_source in duplicate_sources
+                    ]
+                for candidate_info in ranked_infos:
+                    finished_count += 1
+                    if cl_msg:
+                        await cl_msg.stream_token(
+                            f"Finished {candidate_info.name_of_candidate_response.name} "
+                            + f"({finished_count}/{received})"
+                            + (
+                                f", duplicate of {Path(candidate_info.duplicate_of).name}"
+                                if candidate_info.duplicate_of
+                                else ""
+                            )
+                            + "\n\n"
+                        )
+                    yield candidate_info
+        # Ranked without the LLM, they have no extracted years
+        for candidate_info in screened_out_infos:
+            yield candidate_info
+    finally:
+        # Only has an effect if we were cancelled or failed before all tasks finished
+        if next_doc is not None:
+            next_doc.cancel()
+        for task in pending:
+            task.cancel()
+    if duplicate_count > 0:
+        duplicate_report = (
+            f"Found {duplicate_count} duplicates among {received} CVs, "
+            + "they got the result of the CV they duplicate without calling the LLM."
+        )
+        logger.info(duplicate_report)
+        if cl_msg:
+            await cl_msg.stream_token(f"{duplicate_report}\n\n")
+    extraction_report = report_skill_extraction(
+        per_skill_stats,
+        extraction_stats,
+        extraction_mode,
+        metrics.llm_usage(context.run_id, "skill_extraction"),
+    )
+    logger.info(extraction_report)
+    if cl_msg and extraction_mode != EXTRACTION_MODE_PER_SKILL:
+        await cl_msg.stream_token(f"{extraction_report}\n\n")
+    if context.failed_sources:
+        failed_report = f"Could not rank {len(context.failed_sources)} candidates: " + ", ".join(
+            context.failed_sources
+        )
+        logger.error(failed_report)
+        if cl_msg:
+            await cl_msg.stream_token(f"{failed_report}\n\n")
+    if prompt_token_budget > 0:
+        logger.info(context.pruning_stats.report())
+    if local_experience:
+        logger.info(context.experience_stats.report())
+    if finished_count > 0:
+        logger.info(
+            f"Extractions of run {context.run_id} in {context.extraction_location}, "
+            + f"re-rank them with python -m hrranker.rerank --run {context.run_id}"
+        )
+    logger.info(cache_report())
+    logger.info(llm_scheduler.report())
 
 
-def process_skills(
-    doc,
-    number_of_year_responses,
-    expression_pairs: List[Any],
-    skills: List[str] = SKILLS,
-    weights: List[int] = WEIGHTS,
-):
-    page_content = doc.page_content
-    for skill, weight, expression_pair in zip(skills, weights, expression_pairs):
-        _, extracted_keywords = expression_pair
-        # Create skill schema dynamically
-        schema, has_skill_field, number_of_years_field = create_skill_schema(skill)
-        chain = create_tagging_chain(schema, cfg.llm)
-        # Combine the CV with a question
-        doc.page_content = SKILL_TEMPLATE.format(technology=skill) + page_content
-        # Run the chain
-        number_of_years_response_json = chain.run(doc)
-        # Extract the results
-        number_of_years = (
-            0
-            if number_of_years_response_json[number_of_years_field] == None
-            else number_of_years_response_json[number_of_years_field]
-        )
-        has_skill = (
-            False
-            if not number_of_years_response_json[has_skill_field]
-            else number_of_years_response_json[has_skill_field]
+def create_duplicate(
+    candidate_info: CandidateInfo, source: str, context: RankingContext
+) -> CandidateInfo:
+    duplicate_info = CandidateInfo(
+        name_of_candidate_response=candidate_info.name_of_candidate_response,
+        number_of_years_responses=candidate_info.number_of_years_responses,
+        source_file=source,
+        duplicate_of=str(candidate_info.source_file),
+        prescreen_score=candidate_info.prescreen_score,
+    )
+    save_extraction(duplicate_info, context.extraction_location)
+    return duplicate_info
+
+
+def load_duplicate(
+    representative: str, sources: List[str], context: RankingContext
+) -> List[CandidateInfo]:
+    # The representative was finished before in this run, its extraction is on disk
+    if representative in context.failed_sources:
+        context.failed_sources.extend(sources)
+        return []
+    candidate_info = rescore(
+        CandidateExtraction.parse_file(
+            extraction_path(representative, context.extraction_location)
+        ),
+        context.skills,
+        context.weights,
+    )
+    return [create_duplicate(candidate_info, source, context) for source in sources]
+
+
+async def prescreen_docs(
+    docs: Union[List[Document], AsyncIterable[Document]],
+    context: RankingContext,
+    top_k: int,
+    threshold: float,
+) -> Tuple[List[Document], List[CandidateInfo]]:
+    # The keyword scores are relative to the whole pool, so all documents are read first
+    all_docs = [doc async for doc in as_async_iterator(docs)]
+    with metrics.span("prescreen"):
+        scores = prescreen_scores(
+            [doc.page_content for doc in all_docs],
+            context.expression_pairs,
+            context.weights,
         )
-        # Verify if keywords are present to prevent hallucinations
-        matches = skill_check(page_content, extracted_keywords)
-        if matches == False:
-            number_of_years = 0
-            has_skill = False
-            logger.info("Cannot find keywords: %s", extracted_keywords)
+        selected = shortlist(scores, top_k, threshold)
+    shortlisted_docs: List[Document] = []
+    screened_out_infos: List[CandidateInfo] = []
+    for i, (doc, score) in enumerate(zip(all_docs, scores)):
+        context.prescreen_scores[doc.metadata["source"]] = score
+        if i in selected:
+            shortlisted_docs.append(doc)
         else:
-            if number_of_years == 0:
-                number_of_years = 1  # Assume the skill is there at least for one year
-                has_skill = True
-        number_of_years_response = NumberOfYearsResponse(
-            has_skill=has_skill, number_of_years_with_skill=number_of_years, skill=skill
+            screened_out_infos.append(create_screened_out(doc, score, context))
+    metrics.increment("screened_out_documents", len(screened_out_infos))
+    prescreen_report = (
+        f"Pre-screen shortlisted {len(shortlisted_docs)} of {len(all_docs)} CVs "
+        + f"(top {top_k}, threshold {threshold}), the others are not sent to the LLM."
+    )
+    logger.info(prescreen_report)
+    if context.cl_msg:
+        await context.cl_msg.stream_token(f"{prescreen_report}\n\n")
+    return shortlisted_docs, screened_out_infos
+
+
+def create_screened_out(
+    doc: Document, prescreen_score: float, context: RankingContext
+) -> CandidateInfo:
+    # Only what is found locally: the name from the file name or the header and the skill keywords
+    source = doc.metadata["source"]
+    name, _, _ = resolve_name_locally(source, doc.page_content, context.name_vocabulary)
+    skill_matches = context.keyword_index.scan(doc.page_content)
+    number_of_years_responses = [
+        NumberOfYearsResponseWithWeight(
+            number_of_years_response=NumberOfYearsResponse(
+                has_skill=len(skill_matches[expression]) > 0,
+                number_of_years_with_skill=0,
+                skill=skill,
+            ),
+            score_weight=weight,
+        )
+        for skill, weight, (expression, _) in zip(
+            context.skills, context.weights, context.expression_pairs
+        )
+    ]
+    return CandidateInfo(
+        name_of_candidate_response=NameOfCandidateResponse(
+            name=name or Path(source).stem,
+            email="",
+            age=None,
+            gender="unknown",
+            years_of_experience=None,
+        ),
+        number_of_years_responses=number_of_years_responses,
+        source_file=source,
+        prescreen_score=prescreen_score,
+        screened_out=True,
+    )
+
+
+async def as_async_iterator(
+    docs: Union[List[Document], AsyncIterable[Document]]
+) -> AsyncIterator[Document]:
+    if hasattr(docs, "__aiter__"):
+        async for doc in docs:
+            yield doc
+    else:
+        for doc in docs:
+            yield doc
+
+
+async def process_doc_bounded(
+    semaphore: asyncio.Semaphore,
+    candidate_timeout: float,
+    doc: Document,
+    context: RankingContext,
+) -> Optional[CandidateInfo]:
+    queued = time.perf_counter()
+    async with semaphore:
+        metrics.observe("candidate_queue_wait", time.perf_counter() - queued)
+        # Rate limits are retried per call by the scheduler, this retries everything else
+        for attempt in range(1 + context.candidate_retries):
+            try:
+                return await asyncio.wait_for(
+                    process_doc(doc, context), candidate_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.error(
+                    f"Could not process {doc.metadata['source']} within {candidate_timeout} seconds "
+                    + f"(attempt {attempt + 1})"
+                )
+            except Exception as e:
+                logger.error(
+                    f"Could not process {doc.metadata['source']} due to {e} (attempt {attempt + 1})"
+                )
+    context.failed_sources.append(doc.metadata["source"])
+    return None
+
+
+async def process_doc(doc: Document, context: RankingContext) -> CandidateInfo:
+    with metrics.span("candidate", candidate=doc.metadata["source"]):
+        return await extract_candidate(doc, context)
+
+
+async def extract_candidate(doc: Document, context: RankingContext) -> CandidateInfo:
+    cl_msg = context.cl_msg
+    experience = None
+    if context.local_experience:
+        with metrics.span("experience_parsing"):
+            experience = ExperienceAnalysis(doc.page_content)
+    with metrics.span("name_extraction"):
+        candidate_details = await extract_candidate_name(doc, context)
+    total_years = experience.total_years() if experience is not None else None
+    if total_years is not None:
+        candidate_details.years_of_experience = total_years
+    if experience is not None:
+        context.experience_stats.add_total(total_years is not None)
+    if cl_msg:
+        await cl_msg.stream_token(f"Processing {candidate_details.name}\n\n")
+    with metrics.span("skill_extraction"):
+        number_of_year_responses = await process_skills(
+            doc,
+            context.expression_pairs,
+            context.skills,
+            context.weights,
+            context.extraction_mode,
+            context.keyword_index,
+            context.prompt_token_budget,
+            context.pruning_stats,
+            context.priority,
+            experience,
+            context.experience_stats,
         )
-        number_of_year_responses.append(
-            NumberOfYearsResponseWithWeight(
-                number_of_years_response=number_of_years_response,
-                score_weight=weight,
+    candidate_info = CandidateInfo(
+        name_of_candidate_response=candidate_details,
+        number_of_years_responses=number_of_year_responses,
+        source_file=doc.metadata["source"],
+        prescreen_score=context.prescreen_scores.get(doc.metadata["source"]),
+    )
+    save_extraction(candidate_info, context.extraction_location)
+    return candidate_info
+
+
+async def extract_candidate_name(
+    doc: Document, context: RankingContext
+) -> NameOfCandidateResponse:
+    chain = chain_registry.tagging_chain_pydantic(NameOfCandidateResponse, cfg.llm)
+    name_content = select_header(doc.page_content, context.prompt_token_budget)
+    context.pruning_stats.add(doc.page_content, name_content)
+    name_doc = Document(page_content=name_content, metadata=doc.metadata)
+    candidate_details = await arun_cached(
+        chain,
+        name_doc,
+        name_content,
+        name_of_candidate_response_schema,
+        NameOfCandidateResponse,
+        context.priority,
+    )
+    logger.info(f"Response: {candidate_details}")
+    if candidate_details.name is None or candidate_details.name == "":
+        candidate_details.name = await aresolve_name(
+            doc.metadata["source"],
+            doc.page_content,
+            priority=context.priority,
+            vocabulary=context.name_vocabulary,
+        )
+    return candidate_details
+
+
+async def process_skills(
+    doc: Document,
+    expression_pairs: List[Any],
+    skills: List[str] = SKILLS,
+    weights: List[int] = WEIGHTS,
+    extraction_mode: str = cfg.extraction_mode,
+    keyword_index: Optional[KeywordIndex] = None,
+    prompt_token_budget: int = cfg.prompt_token_budget,
+    pruning_stats: Optional[PruningStats] = None,
+    priority: int = PRIORITY_BATCH,
+    experience: Optional[ExperienceAnalysis] = None,
+    experience_stats: Optional[ExperienceStats] = None,
+) -> List[NumberOfYearsResponseWithWeight]:
+    skill_infos = list(zip(skills, weights, expression_pairs))
+    if keyword_index is None:
+        keyword_index = create_keyword_index(expression_pairs)
+    # Verify if keywords are present to prevent hallucinations
+    skill_matches = keyword_index.scan(doc.page_content)
+    # Skills whose years follow from the dates of the jobs mentioning them do not need the LLM
+    local_responses: Dict[str, NumberOfYearsResponseWithWeight] = {}
+    if experience is not None:
+        for skill, weight, (expression, _) in skill_infos:
+            years = experience.skill_years(
+                [position for _, position in skill_matches[expression]]
+            )
+            if years is not None:
+                local_responses[skill] = NumberOfYearsResponseWithWeight(
+                    number_of_years_response=NumberOfYearsResponse(
+                        has_skill=years > 0, number_of_years_with_skill=years, skill=skill
+                    ),
+                    score_weight=weight,
+                )
+        if experience_stats is not None:
+            experience_stats.add_skills(
+                len(local_responses), len(skill_infos) - len(local_responses)
             )
+    llm_skill_infos = [
+        skill_info for skill_info in skill_infos if skill_info[0] not in local_responses
+    ]
+    skill_chunks = chunk_skills(llm_skill_infos, skills_per_call(extraction_mode))
+    # The chunks are independent, so their calls run concurrently
+    chunk_responses = await asyncio.gather(
+        *[
+            process_skill_chunk(
+                doc, skill_chunk, prompt_token_budget, pruning_stats, priority
+            )
+            for skill_chunk in skill_chunks
+        ]
+    )
+    llm_responses: Dict[str, NumberOfYearsResponseWithWeight] = {}
+    for skill_chunk, (number_of_years_response_json, fields) in zip(
+        skill_chunks, chunk_responses
+    ):
+        for (skill, weight, expression_pair), (
+            has_skill_field,
+            number_of_years_field,
+        ) in zip(skill_chunk, fields):
+            expression, extracted_keywords = expression_pair
+            llm_responses[skill] = create_number_of_years_response(
+                number_of_years_response_json,
+                has_skill_field,
+                number_of_years_field,
+                len(skill_matches[expression]) > 0,
+                skill,
+                weight,
+                extracted_keywords,
+            )
+    return [
+        local_responses[skill] if skill in local_responses else llm_responses[skill]
+        for skill, _, _ in skill_infos
+    ]
+
+
+async def process_skill_chunk(
+    doc: Document,
+    skill_chunk: List[Any],
+    prompt_token_budget: int = cfg.prompt_token_budget,
+    pruning_stats: Optional[PruningStats] = None,
+    priority: int = PRIORITY_BATCH,
+) -> Tuple[Dict[str, Any], List[Any]]:
+    chunk_skill_names = [skill for skill, _, _ in skill_chunk]
+    # Built once per skill combination and shared by all candidates
+    chain, schema, fields = chain_registry.multi_skill_chain(chunk_skill_names, cfg.llm)
+    # Only the passages about these skills are sent, if there is a token budget
+    chunk_keywords = [k for _, _, (_, keywords) in skill_chunk for k in keywords]
+    selected_content = select_passages(
+        doc.page_content, chunk_keywords, prompt_token_budget
+    )
+    if pruning_stats is not None:
+        pruning_stats.add(doc.page_content, selected_content)
+    # Combine the CV with a question in a new document, the original one is shared
+    skill_doc = Document(
+        page_content=create_skill_prompt(chunk_skill_names) + selected_content,
+        metadata=doc.metadata,
+    )
+    number_of_years_response_json = await arun_cached(
+        chain, skill_doc, skill_doc.page_content, schema, priority=priority
+    )
+    return number_of_years_response_json, fields
+
+
+def create_number_of_years_response(
+    number_of_years_response_json: Dict[str, Any],
+    has_skill_field: str,
+    number_of_years_field: str,
+    matches: bool,
+    skill: str,
+    weight: int,
+    extracted_keywords: List[str],
+) -> NumberOfYearsResponseWithWeight:
+    # Extract the results
+    number_of_years = number_of_years_response_json.get(number_of_years_field)
+    if number_of_years is None:
+        number_of_years = 0
+    has_skill = bool(number_of_years_response_json.get(has_skill_field))
+    if matches == False:
+        number_of_years = 0
+        has_skill = False
+        logger.info("Cannot find keywords: %s", extracted_keywords)
+    else:
+        if number_of_years == 0:
+            number_of_years = 1  # Assume the skill is there at least for one year
+            has_skill = True
+    number_of_years_response = NumberOfYearsResponse(
+        has_skill=has_skill, number_of_years_with_skill=number_of_years, skill=skill
+    )
+    logger.info(f"Response: {number_of_years_response}")
+    return NumberOfYearsResponseWithWeight(
+        number_of_years_response=number_of_years_response,
+        score_weight=weight,
+    )
+
+
+def create_keyword_index(expression_pairs: List[Any]) -> KeywordIndex:
+    return KeywordIndex(dict(expression_pairs))
+
+
+def skills_per_call(extraction_mode: str) -> int:
+    if extraction_mode == EXTRACTION_MODE_PER_SKILL:
+        return 1
+    if extraction_mode == EXTRACTION_MODE_BATCHED:
+        return cfg.max_skills_per_call
+    raise ValueError(f"Unknown extraction mode: {extraction_mode}")
+
+
+def chunk_skills(skill_infos: List[Any], chunk_size: int) -> List[List[Any]]:
+    return [
+        skill_infos[i : i + chunk_size] for i in range(0, len(skill_infos), chunk_size)
+    ]
+
+
+def create_skill_prompt(skills: List[str]) -> str:
+    if len(skills) == 1:
+        return SKILL_TEMPLATE.format(technology=skills[0])
+    return MULTI_SKILL_TEMPLATE.format(technologies=", ".join(skills))
+
+
+def estimate_skill_extraction(
+    page_content: str, skills: List[str], extraction_mode: str
+) -> ExtractionStats:
+    extraction_stats = ExtractionStats()
+    for skill_chunk in chunk_skills(skills, skills_per_call(extraction_mode)):
+        schema, _ = chain_registry.multi_skill_schema(skill_chunk)
+        extraction_stats.round_trips += 1
+        extraction_stats.prompt_tokens += estimate_tokens(
+            create_skill_prompt(skill_chunk) + page_content
+        ) + estimate_schema_tokens(schema)
+    return extraction_stats
+
+
+def report_skill_extraction(
+    per_skill_stats: ExtractionStats,
+    extraction_stats: ExtractionStats,
+    extraction_mode: str,
+    llm_usage: Optional[Tuple[int, float, float]] = None,
+) -> str:
+    # The estimates assume the whole CV and every skill in each prompt. Skills answered from
+    # the dates in the CV, pruned passages and cache hits only make the real prompts smaller
+    saved_round_trips = per_skill_stats.round_trips - extraction_stats.round_trips
+    saved_tokens = per_skill_stats.prompt_tokens - extraction_stats.prompt_tokens
+    saved_percentage = (
+        100 * saved_tokens / per_skill_stats.prompt_tokens
+        if per_skill_stats.prompt_tokens > 0
+        else 0
+    )
+    if llm_usage is not None:
+        calls, prompt_tokens, completion_tokens = llm_usage
+        sent = (
+            f"{calls} LLM calls with ~{prompt_tokens:.0f} prompt and "
+            + f"~{completion_tokens:.0f} completion tokens sent"
         )
-        logger.info(f"Response: {number_of_years_response}")
+    else:
+        sent = "calls sent not recorded outside of a metrics run"
+    return (
+        f"Skill extraction ({extraction_mode}): {sent}. "
+        + f"Upper bound for whole CVs and all skills: {extraction_stats.round_trips} round trips, "
+        + f"~{extraction_stats.prompt_tokens} prompt tokens, {saved_round_trips} round trips "
+        + f"and ~{saved_tokens} prompt tokens ({saved_percentage:.0f}%) fewer than {EXTRACTION_MODE_PER_SKILL}."
+    )
 
 
-if __name__ == "__main__":
+def log_ranking(candidate_infos: List[CandidateInfo]):
+    logger.info("")
+    for candidate_info in sort_candidate_infos(candidate_infos):
+        logger.info(candidate_info)
 
-    async def main():
-        path = cfg.doc_location
-        docs = extract_data(path)
-        logger.info(f"Read {len(docs)} documents")
 
-        candidate_infos = await process_docs(docs)
-        candidate_infos = sort_candidate_infos(candidate_infos)
+if __name__ == "__main__":
 
-        logger.info("")
-        for candidate_info in candidate_infos:
-            logger.info(candidate_info)
+    async def main(watch: bool, interval: float):
+        path = cfg.doc_location
+        document_index = DocumentIndex()
+        start_metrics_server()
+        # The extractions of the whole watch end up in one run
+        watch_run_id = uuid.uuid4().hex[:8]
+        with metrics.run(watch_run_id) as run_id:
+            with metrics.span("ranking"):
+                # Only new or changed PDFs are parsed, the others come from the index
+                await asyncio.to_thread(document_index.refresh, path)
+                candidate_infos = await process_docs(document_index.documents(path))
+            log_ranking(candidate_infos)
+            logger.info(metrics.summary(run_id))
+        if not watch:
+            return
+        ranking = {str(ci.source_file): ci for ci in candidate_infos}
+        async for delta in document_index.awatch(path, interval):
+            for removed in delta.removed:
+                ranking.pop(removed, None)
+            with metrics.run(watch_run_id) as run_id:
+                with metrics.span("ranking"):
+                    delta_infos = await process_docs(delta.added + delta.changed)
+                for candidate_info in delta_infos:
+                    ranking[str(candidate_info.source_file)] = candidate_info
+                log_ranking(list(ranking.values()))
+                logger.info(metrics.summary(run_id))
 
+    parser = argparse.ArgumentParser(description="Rank the CVs in DOC_LOCATION")
+    parser.add_argument(
+        "--watch", action="store_true", help="keep ranking new or changed CVs"
+    )
+    parser.add_argument("--interval", type=float, default=5.0)
+    args = parser.parse_args()
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    loop.run_until_complete(main(args.watch, args.interval))
@@ -0,0 +1,88 @@
+from langchain.chains import create_tagging_chain, create_tagging_chain_pydantic
+
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+from hrranker.hr_model import create_keywords_schema, create_multi_skill_schema
+
+import threading
+
+
+class ChainRegistry:
+    # Chains and schemas are not changed after they are built, so one instance per schema
+    # and LLM client is shared by all candidates, tasks and sessions
+
+    def __init__(self):
+        # Reentrant, the factories get the parts they are built from, like the schema of a chain
+        self.lock = threading.RLock()
+        self.entries: Dict[Hashable, Any] = {}
+        self.built = 0
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is None:
+                    entry = factory()
+                    self.entries[key] = entry
+                    self.built += 1
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def tagging_chain_pydantic(self, pydantic_schema: Type[BaseModel], llm: Any) -> Any:
+        # The chain keeps a reference to the client, so its id is not reused
+        return self.get(
+            ("tagging_chain_pydantic", pydantic_schema, id(llm)),
+            lambda: create_tagging_chain_pydantic(pydantic_schema, llm),
+        )
+
+    def multi_skill_schema(
+        self, skills: Sequence[str]
+    ) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
+        return self.get(
+            ("multi_skill_schema", tuple(skills)),
+            lambda: create_multi_skill_schema(list(skills)),
+        )
+
+    def multi_skill_chain(
+        self, skills: Sequence[str], llm: Any
+    ) -> Tuple[Any, Dict[str, Any], List[Tuple[str, str]]]:
+        def build():
+            schema, fields = self.multi_skill_schema(skills)
+            return create_tagging_chain(schema, llm), schema, fields
+
+        return self.get(("multi_skill_chain", tuple(skills), id(llm)), build)
+
+    def keywords_chain(
+        self, expressions: Sequence[str], llm: Any
+    ) -> Tuple[Any, Dict[str, Any], List[str]]:
+        def build():
+            schema, fields = create_keywords_schema(list(expressions))
+            return create_tagging_chain(schema, llm), schema, fields
+
+        return self.get(("keywords_chain", tuple(expressions), id(llm)), build)
+
+
+chain_registry = ChainRegistry()
+
+
+if __name__ == "__main__":
+    from hrranker.config import cfg
+
+    # A chunk which was not built before, like the skills left after the local experience
+    built: List[Any] = []
+    thread = threading.Thread(
+        target=lambda: built.append(chain_registry.multi_skill_chain(["PHP", "CSS"], cfg.llm)),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(timeout=30)
+    assert built, "Building a chain with a schema which is not cached yet does not return"
+    chain, schema, fields = built[0]
+    assert chain_registry.multi_skill_chain(["PHP", "CSS"], cfg.llm)[0] is chain
+    assert chain_registry.multi_skill_schema(["PHP", "CSS"]) == (schema, fields)
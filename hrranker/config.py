@@ -1,29 +1,164 @@
-from langchain.chat_models import ChatOpenAI
+from functools import cached_property
 from pathlib import Path
+from typing import Any
 import os
 
 from dotenv import load_dotenv
 
-load_dotenv()
+
+def required_path(name: str) -> Path:
+    value = os.getenv(name)
+    if value is None:
+        raise ValueError(f"Please set the environment variable {name}.")
+    return Path(value)
 
 
 class Config:
+    # Plain settings are read when the configuration is created. The LLM client and the
+    # locations are only created when they are first used, so that importing stays cheap
     model = "gpt-3.5-turbo-0613"
     # model = 'gpt-4-0613'
-    llm = ChatOpenAI(model=model, temperature=0)
-    doc_location = Path(os.getenv("DOC_LOCATION"))
-    test_doc_location = Path(os.getenv("TEST_DOCS"))
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    temp_doc_location = Path(os.getenv("TEMP_DOC_LOCATION"))
 
-    if not temp_doc_location.exists():
-        temp_doc_location.mkdir(parents=True)
+    def __init__(self):
+        load_dotenv()
+        self.request_timeout = float(os.getenv("REQUEST_TIMEOUT", "60"))
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        # Number of candidates processed at the same time and the time budget for each one
+        self.max_concurrency = int(os.getenv("MAX_CONCURRENCY", "5"))
+        self.candidate_timeout = float(os.getenv("CANDIDATE_TIMEOUT", "300"))
+        # Below this confidence the name is not taken from the file name or CV header, but from the LLM
+        self.name_confidence_threshold = float(
+            os.getenv("NAME_CONFIDENCE_THRESHOLD", "0.7")
+        )
+        # PDF parsing processes and the maximum number of parsed documents waiting for extraction
+        self.ingestion_workers = int(
+            os.getenv("INGESTION_WORKERS", str(os.cpu_count() or 1))
+        )
+        self.max_pending_documents = int(os.getenv("MAX_PENDING_DOCUMENTS", "32"))
+        # "per_skill" sends one prompt per skill, "batched" asks for several skills in one prompt
+        self.extraction_mode = os.getenv("EXTRACTION_MODE", "per_skill")
+        self.max_skills_per_call = int(os.getenv("MAX_SKILLS_PER_CALL", "8"))
+        # Years per skill and the total experience from the dates of the jobs in the CV. The LLM
+        # is only asked where the dates do not tell, e.g. for skills only listed outside of the jobs
+        # Off by default until the totals are checked against real LLM answers or labelled CVs
+        self.local_experience = os.getenv("LOCAL_EXPERIENCE", "false").lower() == "true"
+        # Maximum estimated CV tokens per prompt. 0 sends the whole CV
+        self.prompt_token_budget = int(os.getenv("PROMPT_TOKEN_BUDGET", "0"))
+
+        # Provider limits shared by all sessions, in requests and estimated tokens per minute
+        self.requests_per_minute = int(os.getenv("REQUESTS_PER_MINUTE", "3500"))
+        self.tokens_per_minute = int(os.getenv("TOKENS_PER_MINUTE", "90000"))
+        # Retries of rate limited or failed LLM calls, with exponential backoff between them
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "6"))
+        self.retry_base_delay = float(os.getenv("RETRY_BASE_DELAY", "1"))
+        self.retry_max_delay = float(os.getenv("RETRY_MAX_DELAY", "60"))
+        # Attempts of a whole candidate after the first one failed
+        self.candidate_retries = int(os.getenv("CANDIDATE_RETRIES", "1"))
+
+        # Persistent cache of the LLM extraction results
+        self.cache_enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+        self.cache_max_bytes = int(os.getenv("CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+        # Timings, token counts and costs. The prices are in USD per 1000 tokens of the model
+        self.metrics_enabled = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+        self.metrics_max_bytes = int(os.getenv("METRICS_MAX_BYTES", str(100 * 1024 * 1024)))
+        self.metrics_port = int(os.getenv("METRICS_PORT", "0"))
+        self.metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+        self.prompt_token_price = float(os.getenv("PROMPT_TOKEN_PRICE", "0.0015"))
+        self.completion_token_price = float(os.getenv("COMPLETION_TOKEN_PRICE", "0.002"))
+
+        # CVs at least this similar (estimated Jaccard similarity of their word shingles) are
+        # ranked once and the result is reused for the others
+        self.dedup_enabled = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+        self.dedup_threshold = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+
+        # Only the best CVs by their skill keywords (BM25) are sent to the LLM. 0 disables a rule,
+        # the threshold is between 0 and 1, the score of the best CV in every skill
+        self.prescreen_top_k = int(os.getenv("PRESCREEN_TOP_K", "0"))
+        self.prescreen_threshold = float(os.getenv("PRESCREEN_THRESHOLD", "0"))
+
+        # Bars per ranking chart and the age after which charts are removed from TEMP_DOC_LOCATION
+        self.chart_max_bars = int(os.getenv("CHART_MAX_BARS", "30"))
+        self.chart_max_age_minutes = float(os.getenv("CHART_MAX_AGE_MINUTES", "60"))
+
+        # Candidates in the live ranking of the chat while the others are processed and the
+        # minimum seconds between two updates of it
+        self.leaderboard_size = int(os.getenv("LEADERBOARD_SIZE", "10"))
+        self.leaderboard_interval = float(os.getenv("LEADERBOARD_INTERVAL", "2"))
+
+        # 0 days means that the keywords of a skill never expire
+        self.keyword_ttl_days = float(os.getenv("KEYWORD_TTL_DAYS", "0"))
+
+    @cached_property
+    def llm(self) -> Any:
+        # Importing langchain takes seconds
+        from langchain.chat_models import ChatOpenAI
+
+        # Retries are done by the LLM scheduler, which knows about the other requests
+        return ChatOpenAI(
+            model=self.model,
+            temperature=0,
+            request_timeout=self.request_timeout,
+            max_retries=0,
+        )
+
+    @cached_property
+    def doc_location(self) -> Path:
+        return required_path("DOC_LOCATION")
+
+    @cached_property
+    def test_doc_location(self) -> Path:
+        return required_path("TEST_DOCS")
+
+    @cached_property
+    def temp_doc_location(self) -> Path:
+        location = required_path("TEMP_DOC_LOCATION")
+        location.mkdir(parents=True, exist_ok=True)
+        return location
+
+    def temp_path(self, name: str, default_file_name: str) -> Path:
+        value = os.getenv(name)
+        return Path(value) if value else self.temp_doc_location / default_file_name
+
+    @cached_property
+    def cache_location(self) -> Path:
+        return self.temp_path("CACHE_LOCATION", "llm_cache.sqlite")
+
+    @cached_property
+    def metrics_location(self) -> Path:
+        return self.temp_path("METRICS_LOCATION", "metrics.jsonl")
+
+    @cached_property
+    def extraction_location(self) -> Path:
+        # Extracted facts per candidate, used to re-rank without calling the LLM
+        location = self.temp_path("EXTRACTION_LOCATION", "extractions")
+        location.mkdir(parents=True, exist_ok=True)
+        return location
+
+    @cached_property
+    def keyword_store_location(self) -> Path:
+        # Keywords of each skill, consulted before asking the LLM
+        return self.temp_path("KEYWORD_STORE_LOCATION", "keywords.sqlite")
+
+    @cached_property
+    def doc_index_location(self) -> Path:
+        # Extracted text of the PDF folders, so that only new or changed files are parsed
+        return self.temp_path("DOC_INDEX_LOCATION", "doc_index.sqlite")
+
+    @cached_property
+    def journal_location(self) -> Path:
+        # Finished and failed candidates of batch runs, so that a restarted run continues
+        return self.temp_path("JOURNAL_LOCATION", "journal.sqlite")
 
     def __repr__(self) -> str:
         return f"""# Configuration
 
 doc_location: {self.doc_location}
 llm: {self.llm}
+max_concurrency: {self.max_concurrency}
+extraction_mode: {self.extraction_mode}
+requests_per_minute: {self.requests_per_minute}
+tokens_per_minute: {self.tokens_per_minute}
 """
 
 
@@ -0,0 +1,117 @@
+from typing import Dict, List, Optional, Tuple
+
+from hrranker.hr_model import CandidateInfo
+
+import hashlib
+import zlib
+
+import numpy as np
+
+# Words per shingle
+SHINGLE_SIZE = 5
+# (a * x + b) mod p with a, b and x below 2^32 does not overflow 64 bits
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_COEFFICIENT = 1 << 32
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    words = normalize_text(text).split()
+    shingles = {
+        " ".join(words[i : i + size]) for i in range(max(1, len(words) - size + 1))
+    }
+    return np.array(
+        [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64
+    )
+
+
+class MinHasher:
+    # Signatures whose share of equal values estimates the Jaccard similarity of the shingles
+
+    def __init__(self, num_perm: int = 128, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MAX_COEFFICIENT, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MAX_COEFFICIENT, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        return ((np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME).min(axis=0)
+
+
+def similarity(signature: np.ndarray, other: np.ndarray) -> float:
+    return float(np.mean(signature == other))
+
+
+class DuplicateIndex:
+    # Finds the representative of a CV among the ones seen before. Identical texts are found
+    # by their hash, edited versions through the LSH buckets of their MinHash signature, so
+    # that a new CV is only compared with a few similar ones and not with the whole archive
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 16):
+        assert num_perm % bands == 0, "The signature has to split into equal bands"
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.minhasher = MinHasher(num_perm)
+        self.hashes: Dict[str, str] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self.comparisons = 0
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[i * self.rows : (i + 1) * self.rows].tobytes()
+            for i in range(len(self.buckets))
+        ]
+
+    def find(self, text: str) -> Tuple[Optional[str], float, str, np.ndarray]:
+        text_hash = content_hash(text)
+        signature = self.minhasher.signature(shingle_hashes(text))
+        if text_hash in self.hashes:
+            return self.hashes[text_hash], 1.0, text_hash, signature
+        candidates = set()
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            candidates.update(bucket.get(key, []))
+        best_source, best_similarity = None, 0.0
+        for candidate in candidates:
+            self.comparisons += 1
+            candidate_similarity = similarity(signature, self.signatures[candidate])
+            if candidate_similarity > best_similarity:
+                best_source, best_similarity = candidate, candidate_similarity
+        if best_similarity >= self.threshold:
+            return best_source, best_similarity, text_hash, signature
+        return None, best_similarity, text_hash, signature
+
+    def add(self, source: str, text: str) -> Tuple[Optional[str], float]:
+        # Returns the representative and the similarity, or None if the CV is new.
+        # Only representatives are indexed, so every group has one of them
+        representative, text_similarity, text_hash, signature = self.find(text)
+        if representative is not None:
+            return representative, text_similarity
+        self.hashes[text_hash] = source
+        self.signatures[source] = signature
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            bucket.setdefault(key, []).append(source)
+        return None, text_similarity
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+
+def group_duplicates(
+    candidate_infos: List[CandidateInfo],
+) -> Tuple[List[CandidateInfo], Dict[str, List[str]]]:
+    # The representatives in their order and the sources of the duplicates of each of them
+    duplicates: Dict[str, List[str]] = {}
+    for candidate_info in candidate_infos:
+        if candidate_info.duplicate_of is not None:
+            duplicates.setdefault(candidate_info.duplicate_of, []).append(
+                str(candidate_info.source_file)
+            )
+    representatives = [ci for ci in candidate_infos if ci.duplicate_of is None]
+    return representatives, duplicates
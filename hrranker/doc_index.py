@@ -0,0 +1,169 @@
+from langchain.schema import Document
+from pydantic import BaseModel
+
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from hrranker.config import cfg
+from hrranker.extract_data import iter_pdf_documents, list_pdfs
+from hrranker.log_init import logger
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+
+
+class IndexDelta(BaseModel):
+    added: List[Document] = []
+    changed: List[Document] = []
+    removed: List[str] = []
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def __repr__(self) -> str:
+        return f"added: {len(self.added)}, changed: {len(self.changed)}, removed: {len(self.removed)}"
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentIndex:
+    # Extracted text of the PDFs in a folder, so that only new or changed files are parsed
+
+    def __init__(self, location: Optional[Path] = None):
+        self.location = location or cfg.doc_index_location
+        # awatch refreshes the index from a worker thread
+        self.connection = sqlite3.connect(str(self.location), check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS documents (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    page_content TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )"""
+            )
+
+    def refresh(self, path: Path, filter: Optional[str] = None) -> IndexDelta:
+        start = time.perf_counter()
+        indexed: Dict[str, Tuple[int, float, str]] = {
+            row[0]: (row[1], row[2], row[3])
+            for row in self.connection.execute(
+                "SELECT path, size, mtime, content_hash FROM documents"
+            )
+        }
+        delta = IndexDelta()
+        to_parse: Dict[str, str] = {}
+        current_paths = set()
+        for pdf in list_pdfs(path, filter):
+            pdf_path = str(pdf.absolute())
+            current_paths.add(pdf_path)
+            stat = pdf.stat()
+            previous = indexed.get(pdf_path)
+            if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime):
+                continue
+            content_hash = hash_file(pdf)
+            if previous is not None and previous[2] == content_hash:
+                # Touched, but not modified
+                self.update_stat(pdf_path, stat.st_size, stat.st_mtime)
+                continue
+            to_parse[pdf_path] = content_hash
+        for document in iter_pdf_documents([Path(p) for p in to_parse]):
+            pdf_path = str(Path(document.metadata["source"]).absolute())
+            stat = Path(pdf_path).stat()
+            self.store(pdf_path, stat.st_size, stat.st_mtime, to_parse[pdf_path], document)
+            if pdf_path in indexed:
+                delta.changed.append(document)
+            else:
+                delta.added.append(document)
+        for pdf_path in indexed:
+            if is_in_folder(pdf_path, path, filter) and pdf_path not in current_paths:
+                with self.connection:
+                    self.connection.execute(
+                        "DELETE FROM documents WHERE path = ?", (pdf_path,)
+                    )
+                delta.removed.append(pdf_path)
+        logger.info(
+            f"Indexed {path} in {time.perf_counter() - start:.2f}s, {repr(delta)}"
+        )
+        return delta
+
+    def store(
+        self,
+        pdf_path: str,
+        size: int,
+        mtime: float,
+        content_hash: str,
+        document: Document,
+    ):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents (path, size, mtime, content_hash, page_content, metadata) "
+                + "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    pdf_path,
+                    size,
+                    mtime,
+                    content_hash,
+                    document.page_content,
+                    json.dumps(document.metadata),
+                ),
+            )
+
+    def update_stat(self, pdf_path: str, size: int, mtime: float):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE documents SET size = ?, mtime = ? WHERE path = ?",
+                (size, mtime, pdf_path),
+            )
+
+    def documents(
+        self, path: Optional[Path] = None, filter: Optional[str] = None
+    ) -> List[Document]:
+        return [
+            Document(page_content=row[1], metadata=json.loads(row[2]))
+            for row in self.connection.execute(
+                "SELECT path, page_content, metadata FROM documents ORDER BY path"
+            )
+            if path is None or is_in_folder(row[0], path, filter)
+        ]
+
+    def watch(
+        self, path: Path, interval: float = 5.0, filter: Optional[str] = None
+    ) -> Iterator[IndexDelta]:
+        # Rescans forever and yields only the changes
+        while True:
+            delta = self.refresh(path, filter)
+            if not delta.is_empty():
+                yield delta
+            time.sleep(interval)
+
+    async def awatch(
+        self, path: Path, interval: float = 5.0, filter: Optional[str] = None
+    ) -> AsyncIterator[IndexDelta]:
+        while True:
+            delta = await asyncio.to_thread(self.refresh, path, filter)
+            if not delta.is_empty():
+                yield delta
+            await asyncio.sleep(interval)
+
+
+def is_in_folder(pdf_path: str, path: Path, filter: Optional[str] = None) -> bool:
+    pdf = Path(pdf_path)
+    return pdf.parent == path.absolute() and (filter is None or filter in pdf.stem)
+
+
+if __name__ == "__main__":
+    document_index = DocumentIndex()
+    delta = document_index.refresh(cfg.doc_location)
+    logger.info(f"{len(document_index.documents(cfg.doc_location))} documents indexed")
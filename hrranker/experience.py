@@ -0,0 +1,258 @@
+from datetime import date
+from typing import List, Optional, Tuple
+
+import re
+import threading
+
+MONTHS = {
+    "jan": 1,
+    "feb": 2,
+    "mar": 3,
+    "apr": 4,
+    "may": 5,
+    "jun": 6,
+    "jul": 7,
+    "aug": 8,
+    "sep": 9,
+    "oct": 10,
+    "nov": 11,
+    "dec": 12,
+}
+MONTH_NAME = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+PRESENT = r"present|current|now|today|ongoing|till\s+date|to\s+date"
+SEPARATOR = r"\s*(?:-|–|—|to|until|till)\s*"
+EARLIEST_YEAR = 1950
+# Ranges in these jobs are studies, not professional experience
+EDUCATION_WORDS = re.compile(
+    r"(?<!\w)(?:university|college|school|bachelor|master|degree|diploma|phd|b\.?sc|m\.?sc|education)(?!\w)",
+    re.IGNORECASE,
+)
+# Sections after the jobs, which are no experience: a heading alone on its line like
+# "TECHNICAL SKILLS" or "Technologies:", or a list like "Skills: PHP, CSS"
+SECTION_HEADING = re.compile(
+    r"^[ \t]*(?:(?:technical|key|core|it|other)[ \t]+)?(?:skills|technologies|tools|competencies|"
+    + r"education|certifications?|courses|trainings?|languages|projects|interests|hobbies|"
+    + r"references|publications|awards|summary|profile|contact|personal[ \t]+(?:details|information))"
+    + r"[ \t]*:?[ \t]*$"
+    + r"|^[ \t]*(?:(?:technical|key|core|it|other)[ \t]+)?skills[ \t]*:",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Explicit statements like "5+ years of PHP" on the line of a keyword
+YEARS_STATEMENT = re.compile(r"(?<!\d)(\d{1,2})\s*\+?\s*(?:years|yrs)(?!\w)", re.IGNORECASE)
+
+
+def date_pattern(prefix: str) -> str:
+    # "Mar 2018", "March 2018", "03/2018", "3.2018" or "2018"
+    return (
+        rf"(?:(?P<{prefix}_month_name>{MONTH_NAME})\s+"
+        + rf"|(?P<{prefix}_month>0?[1-9]|1[0-2])\s*[/.]\s*)?"
+        + rf"(?P<{prefix}_year>(?:19|20)\d\d)(?!\d)"
+    )
+
+
+RANGE_PATTERN = re.compile(
+    r"(?<![\w/.])"
+    + date_pattern("start")
+    + SEPARATOR
+    + rf"(?:{date_pattern('end')}|(?P<present>{PRESENT}))(?!\w)",
+    re.IGNORECASE,
+)
+SINCE_PATTERN = re.compile(r"(?<!\w)since\s+" + date_pattern("start"), re.IGNORECASE)
+
+
+def month_index(match: re.Match, prefix: str) -> Tuple[int, bool]:
+    # Months since year 0 and whether the month was given
+    year = int(match.group(f"{prefix}_year"))
+    month_name = match.group(f"{prefix}_month_name")
+    month = match.group(f"{prefix}_month")
+    if month_name:
+        return year * 12 + MONTHS[month_name[:3].lower()] - 1, True
+    if month:
+        return year * 12 + int(month) - 1, True
+    return year * 12, False
+
+
+class DateRange:
+    start: int
+    end: int
+    position: int
+
+    def __init__(self, start: int, end: int, position: int):
+        self.start = start
+        self.end = end
+        self.position = position
+
+    def __repr__(self) -> str:
+        return f"DateRange({self.start // 12}/{self.start % 12 + 1} - {self.end // 12}/{self.end % 12 + 1})"
+
+
+def find_date_ranges(text: str, today: Optional[date] = None) -> List[DateRange]:
+    # "2015-2019" are 4 years, "03/2018 - 05/2018" 3 months, "Mar 2018 - present" until this month
+    today = today or date.today()
+    current = today.year * 12 + today.month
+    ranges: List[DateRange] = []
+    for match in RANGE_PATTERN.finditer(text):
+        start, _ = month_index(match, "start")
+        if match.group("present"):
+            end = current
+        else:
+            end, has_month = month_index(match, "end")
+            if has_month:
+                # The end month is included
+                end += 1
+        ranges.append(DateRange(start, end, match.start()))
+    for match in SINCE_PATTERN.finditer(text):
+        start, _ = month_index(match, "start")
+        ranges.append(DateRange(start, current, match.start()))
+    return sorted(
+        [r for r in ranges if EARLIEST_YEAR * 12 <= r.start <= r.end <= current],
+        key=lambda r: r.position,
+    )
+
+
+def merged_months(ranges: List[DateRange]) -> int:
+    # Overlapping jobs count once
+    months = 0
+    covered_until = -1
+    for date_range in sorted(ranges, key=lambda r: r.start):
+        start = max(date_range.start, covered_until)
+        if date_range.end > start:
+            months += date_range.end - start
+        covered_until = max(covered_until, date_range.end)
+    return months
+
+
+def to_years(months: int) -> int:
+    return round(months / 12)
+
+
+class ExperienceAnalysis:
+    # Each date range starts a job, which lasts until the next date range or section heading.
+    # Skill keywords in a job count with its duration. Without the LLM, but only where the CV is clear
+
+    def __init__(self, text: str, today: Optional[date] = None):
+        self.text = text
+        ranges = find_date_ranges(text, today)
+        headings = [match.start() for match in SECTION_HEADING.finditer(text)]
+        self.jobs: List[Tuple[int, int, DateRange]] = []
+        for i, date_range in enumerate(ranges):
+            start = text.rfind("\n", 0, date_range.position) + 1
+            end = ranges[i + 1].position if i + 1 < len(ranges) else len(text)
+            end = max(text.rfind("\n", 0, end) + 1, date_range.position + 1)
+            line_end = text.find("\n", date_range.position)
+            line_end = line_end if line_end >= 0 else len(text)
+            # E.g. a list of skills after the last job
+            end = min([end] + [h for h in headings if line_end < h < end])
+            # The degree is on the line of the dates or on the one above
+            previous_start = text.rfind("\n", 0, max(start - 1, 0)) + 1
+            if EDUCATION_WORDS.search(text[previous_start:line_end]):
+                continue
+            self.jobs.append((start, end, date_range))
+
+    def total_years(self) -> Optional[int]:
+        # None if there is no job with dates
+        if not self.jobs:
+            return None
+        return to_years(merged_months([date_range for _, _, date_range in self.jobs]))
+
+    def skill_years(self, positions: List[int]) -> Optional[int]:
+        # Years for the positions of the keywords of a skill, 0 without any. None if they are
+        # only outside of the jobs, e.g. in a list of skills, and no years are stated next to them
+        if not positions:
+            return 0
+        ranges = [
+            date_range
+            for start, end, date_range in self.jobs
+            if any(start <= position < end for position in positions)
+        ]
+        stated_years = self.stated_years(positions)
+        if not ranges and stated_years is None:
+            return None
+        years = max(1, to_years(merged_months(ranges))) if ranges else 0
+        return max(years, stated_years or 0)
+
+    def stated_years(self, positions: List[int]) -> Optional[int]:
+        years = None
+        for position in positions:
+            line_start = self.text.rfind("\n", 0, position) + 1
+            line_end = self.text.find("\n", position)
+            line = self.text[line_start : line_end if line_end >= 0 else len(self.text)]
+            for match in YEARS_STATEMENT.finditer(line):
+                years = max(years or 0, int(match.group(1)))
+        return years
+
+
+class ExperienceStats:
+    def __init__(self):
+        self.local_skills = 0
+        self.llm_skills = 0
+        self.local_totals = 0
+        self.llm_totals = 0
+        self.lock = threading.Lock()
+
+    def add_skills(self, local_skills: int, llm_skills: int):
+        with self.lock:
+            self.local_skills += local_skills
+            self.llm_skills += llm_skills
+
+    def add_total(self, local_total: bool):
+        with self.lock:
+            self.local_totals += local_total
+            self.llm_totals += not local_total
+
+    def report(self) -> str:
+        skills = self.local_skills + self.llm_skills
+        candidates = self.local_totals + self.llm_totals
+        return (
+            f"Experience parser: years of {self.local_skills} of {skills} skills "
+            + f"and the total experience of {self.local_totals} of {candidates} candidates "
+            + "taken from the dates in the CVs, the rest from the LLM"
+        )
+
+
+if __name__ == "__main__":
+    today = date(2023, 6, 15)
+    ranges = find_date_ranges(
+        "03/2018 – present\n2015-2019\nJan 2010 to Dec 2010\nsince 2021\n2020 - 2018",
+        today,
+    )
+    assert [(r.start, r.end) for r in ranges] == [
+        (2018 * 12 + 2, 2023 * 12 + 6),
+        (2015 * 12, 2019 * 12),
+        (2010 * 12, 2011 * 12),
+        (2021 * 12, 2023 * 12 + 6),
+    ], ranges
+    cv = "\n".join(
+        [
+            "Skills: PHP, Rust",
+            "2019 - 2023 Developer at Company A",
+            "Technologies: PHP, CSS",
+            "2015 - 2020 Developer at Company B",
+            "Technologies: PHP",
+            "2010 - 2014 Bachelor of Computer Science, University of Pune",
+            "Rust projects",
+            "Over 3 years of OCaml",
+        ]
+    )
+    analysis = ExperienceAnalysis(cv, today)
+    assert analysis.total_years() == 8
+    assert analysis.skill_years([m.start() for m in re.finditer("PHP", cv)]) == 8
+    assert analysis.skill_years([m.start() for m in re.finditer("CSS", cv)]) == 4
+    assert analysis.skill_years([m.start() for m in re.finditer("Rust", cv)]) is None
+    assert analysis.skill_years([m.start() for m in re.finditer("OCaml", cv)]) == 3
+    assert analysis.skill_years([]) == 0
+    cv = "\n".join(
+        [
+            "2019 - 2023 Developer at Company A",
+            "Technologies: PHP",
+            "",
+            "TECHNICAL SKILLS",
+            "Rust, Go",
+            "Skills: OCaml",
+        ]
+    )
+    analysis = ExperienceAnalysis(cv, today)
+    assert analysis.skill_years([m.start() for m in re.finditer("PHP", cv)]) == 4
+    assert analysis.skill_years([m.start() for m in re.finditer("Rust", cv)]) is None
+    assert analysis.skill_years([m.start() for m in re.finditer("OCaml", cv)]) is None
+    assert ExperienceAnalysis("No dates here", today).total_years() is None
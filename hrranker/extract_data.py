@@ -1,32 +1,226 @@
 from langchain.schema import Document
-from langchain.document_loaders import PyPDFium2Loader
 
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
 
 from hrranker.log_init import logger
 from hrranker.config import cfg
+from hrranker.metrics import metrics
+
+
+# One pool per size, shared by all sessions and runs of the process
+parsing_executors: Dict[int, Executor] = {}
+parsing_executors_lock = threading.Lock()
+# Key of the single parsing thread, whatever number of workers was asked for
+IN_PROCESS = 0
+
+
+def parsing_executor(max_workers: int = cfg.ingestion_workers) -> Executor:
+    # Worker processes would only add their start up and the pickling on a single CPU
+    in_process = (os.cpu_count() or 1) == 1
+    key = IN_PROCESS if in_process else max_workers
+    with parsing_executors_lock:
+        executor = parsing_executors.get(key)
+        if executor is None:
+            if in_process:
+                # One thread, pdfium must not parse in several threads at once
+                executor = ThreadPoolExecutor(max_workers=1)
+            else:
+                # Spawned, the workers do not inherit the event loop, threads and SQLite
+                # connections of a forked server process
+                executor = ProcessPoolExecutor(
+                    max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            parsing_executors[key] = executor
+        return executor
 
 
 def extract_data(path: Path, filter: Optional[str] = None) -> List[Document]:
+    return list(iter_documents(path, filter))
+
+
+def list_pdfs(path: Path, filter: Optional[str] = None) -> List[Path]:
     assert path.exists(), f"Path {path} does not exist."
-    res: List[Document] = []
     pdfs = list(path.glob("*.pdf"))
     logger.info(f"There are {len(pdfs)} physical documents.")
-    for pdf in pdfs:
-        if filter is None or filter in pdf.stem:
-            new_document = convert_pdf_to_document(pdf)
-            res.append(new_document)
-    return res
+    return [pdf for pdf in pdfs if filter is None or filter in pdf.stem]
+
+
+def iter_documents(
+    path: Path,
+    filter: Optional[str] = None,
+    max_workers: int = cfg.ingestion_workers,
+    max_pending: int = cfg.max_pending_documents,
+) -> Iterator[Document]:
+    return iter_pdf_documents(list_pdfs(path, filter), max_workers, max_pending)
+
+
+def iter_pdf_documents(
+    pdfs: List[Path],
+    max_workers: int = cfg.ingestion_workers,
+    max_pending: int = cfg.max_pending_documents,
+) -> Iterator[Document]:
+    # Yields the documents in the order in which they finish parsing
+    pdf_iterator = iter(pdfs)
+    executor = parsing_executor(max_workers)
+    pending: Dict[Any, Path] = {}
+
+    def submit_next():
+        pdf = next(pdf_iterator, None)
+        if pdf is not None:
+            pending[executor.submit(parse_pdf, pdf)] = pdf
+
+    try:
+        for _ in range(max_pending):
+            submit_next()
+        while pending:
+            done, _ = wait(set(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf = pending.pop(future)
+                submit_next()
+                document = parsed_document(future, pdf)
+                if document is not None:
+                    yield document
+    finally:
+        # The executor is shared, only the PDFs of this iteration are cancelled
+        for future in pending:
+            future.cancel()
+
+
+async def aiter_documents(
+    path: Path,
+    filter: Optional[str] = None,
+    max_workers: int = cfg.ingestion_workers,
+    max_pending: int = cfg.max_pending_documents,
+) -> AsyncIterator[Document]:
+    async for document in aiter_pdf_documents(
+        list_pdfs(path, filter), max_workers, max_pending
+    ):
+        yield document
+
+
+async def aiter_pdf_documents(
+    pdfs: List[Path],
+    max_workers: int = cfg.ingestion_workers,
+    max_pending: int = cfg.max_pending_documents,
+) -> AsyncIterator[Document]:
+    # Parses in worker processes without blocking the event loop
+    loop = asyncio.get_running_loop()
+    pdf_iterator = iter(pdfs)
+    executor = parsing_executor(max_workers)
+    pending: Dict[Any, Path] = {}
+
+    def submit_next():
+        pdf = next(pdf_iterator, None)
+        if pdf is not None:
+            future = loop.run_in_executor(executor, parse_pdf, pdf)
+            pending[future] = pdf
+
+    try:
+        for _ in range(max_pending):
+            submit_next()
+        while pending:
+            done, _ = await asyncio.wait(
+                set(pending), return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                pdf = pending.pop(future)
+                submit_next()
+                document = parsed_document(future, pdf)
+                if document is not None:
+                    yield document
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class DocumentFeed:
+    # Documents of PDFs which arrive one after the other, like uploads. Each PDF is parsed
+    # in a worker process as soon as it is added and can be ranked before the last one arrives
+
+    def __init__(self, max_workers: int = cfg.ingestion_workers):
+        self.max_workers = max_workers
+        self.documents: "asyncio.Queue[Optional[Document]]" = asyncio.Queue()
+        self.parsing: Dict[Any, Path] = {}
+        self.added = 0
+        self.closed = False
+
+    def add(self, pdf: Path):
+        assert not self.closed, "No PDFs can be added after close"
+        future = asyncio.get_running_loop().run_in_executor(
+            parsing_executor(self.max_workers), parse_pdf, pdf
+        )
+        self.parsing[future] = pdf
+        future.add_done_callback(self.parsed)
+        self.added += 1
+
+    def parsed(self, future):
+        pdf = self.parsing.pop(future)
+        if future.cancelled():
+            return
+        document = parsed_document(future, pdf)
+        if document is not None:
+            self.documents.put_nowait(document)
+        if self.closed and not self.parsing:
+            self.documents.put_nowait(None)
+
+    def close(self):
+        # The iteration ends once the PDFs added before are parsed
+        self.closed = True
+        if not self.parsing:
+            self.documents.put_nowait(None)
+
+    async def __aiter__(self) -> AsyncIterator[Document]:
+        try:
+            while True:
+                document = await self.documents.get()
+                if document is None:
+                    break
+                yield document
+        finally:
+            # The executor is shared with the other sessions
+            for future in list(self.parsing):
+                future.cancel()
+
+
+def parsed_document(future, pdf: Path) -> Optional[Document]:
+    try:
+        document, seconds = future.result()
+    except Exception as e:
+        logger.error(f"Could not parse {pdf} due to {e}")
+        return None
+    # Timed in the worker process, which does not share the metrics
+    metrics.observe("pdf_parse", seconds)
+    return document
+
+
+def parse_pdf(pdf: Path) -> Tuple[Document, float]:
+    start = time.perf_counter()
+    document = convert_pdf_to_document(pdf)
+    return document, time.perf_counter() - start
 
 
 def convert_pdf_to_document(pdf: Path) -> Document:
+    # Only needed where PDFs are parsed, mostly in the worker processes
+    from langchain.document_loaders import PyPDFium2Loader
+
     loader = PyPDFium2Loader(str(pdf.absolute()))
     pages: List[Document] = loader.load()
     metadata = pages[0].metadata
-    pdf_content = ""
-    for p in pages:
-        pdf_content += p.page_content
+    pdf_content = "".join(p.page_content for p in pages)
     new_document = Document(page_content=pdf_content, metadata=metadata)
     return new_document
 
@@ -1,7 +1,7 @@
 from pathlib import Path
 from typing import List, Any, Dict, Tuple, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 
 from hrranker.log_init import logger
 
@@ -76,6 +76,47 @@ def create_skill_schema(skill: str) -> Tuple[Dict[str, Any], str, str]:
     return schema, has_skill_field, number_of_years_field
 
 
+def create_multi_skill_schema(
+    skills: List[str],
+) -> Tuple[Dict[str, Any], List[Tuple[str, str]]]:
+    schema = {"properties": {}, "required": []}
+    fields: List[Tuple[str, str]] = []
+    for skill in skills:
+        skill_schema, has_skill_field, number_of_years_field = create_skill_schema(
+            skill
+        )
+        schema["properties"].update(skill_schema["properties"])
+        schema["required"].extend(skill_schema["required"])
+        fields.append((has_skill_field, number_of_years_field))
+    return schema, fields
+
+
+def create_keywords_schema(
+    expressions: List[str],
+) -> Tuple[Dict[str, Any], List[str]]:
+    schema = {"properties": {}, "required": []}
+    fields: List[str] = []
+    for i, expression in enumerate(expressions):
+        field = f"keywords_{i + 1}"
+        schema["properties"][field] = {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": f"list of keywords which seem to be a technology or a skill in '{expression}'",
+        }
+        schema["required"].append(field)
+        fields.append(field)
+    return schema, fields
+
+
+class ExtractionStats(BaseModel):
+    round_trips: int = 0
+    prompt_tokens: int = 0
+
+    def add(self, other: "ExtractionStats"):
+        self.round_trips += other.round_trips
+        self.prompt_tokens += other.prompt_tokens
+
+
 class NumberOfYearsResponseWithWeight(BaseModel):
     number_of_years_response: NumberOfYearsResponse
     score_weight: int
@@ -86,16 +127,27 @@ class CandidateInfo:
     number_of_years_responses: List[NumberOfYearsResponseWithWeight]
     source_file: str
     score: int
+    # Source of the CV whose result was reused, if this CV is a copy or an edited version of it
+    duplicate_of: Optional[str]
+    # Keyword score of the local pre-screen, if there was one. Screened out CVs were not sent to the LLM
+    prescreen_score: Optional[float]
+    screened_out: bool
 
     def __init__(
         self,
         name_of_candidate_response: NameOfCandidateResponse,
         number_of_years_responses: List[NumberOfYearsResponseWithWeight],
         source_file: Path,
+        duplicate_of: Optional[str] = None,
+        prescreen_score: Optional[float] = None,
+        screened_out: bool = False,
     ):
         self.name_of_candidate_response = name_of_candidate_response
         self.number_of_years_responses = number_of_years_responses
         self.source_file = source_file
+        self.duplicate_of = duplicate_of
+        self.prescreen_score = prescreen_score
+        self.screened_out = screened_out
         self.calculate_score()
 
     def calculate_score(self):
@@ -116,12 +168,47 @@ class CandidateInfo:
         return f"Name: {self.name_of_candidate_response.name}, score: {self.score}, source_file: {self.source_file}"
 
 
+class CandidateExtraction(BaseModel):
+    name_of_candidate_response: NameOfCandidateResponse
+    number_of_years_responses: List[NumberOfYearsResponse]
+    source_file: str
+    duplicate_of: Optional[str] = None
+    prescreen_score: Optional[float] = None
+    screened_out: bool = False
+
+
+class JobProfile(BaseModel):
+    name: Optional[str] = None
+    skills: List[str]
+    weights: List[int]
+
+    @validator("weights")
+    def one_weight_per_skill(cls, weights: List[int], values: Dict[str, Any]) -> List[int]:
+        skills = values.get("skills", [])
+        if len(weights) != len(skills):
+            raise ValueError(
+                f"Expected {len(skills)} weights, but received {len(weights)}."
+            )
+        return weights
+
+
+def ranking_key(candidate_info: CandidateInfo) -> Tuple[bool, int, float]:
+    # Ascending, the best first. Screened out candidates have no extracted years, they come after the others
+    return (
+        candidate_info.screened_out,
+        -candidate_info.score,
+        -(candidate_info.prescreen_score or 0),
+    )
+
+
 def sort_candidate_infos(candidate_infos: List[CandidateInfo]) -> List[CandidateInfo]:
-    return sorted(candidate_infos, key=lambda x: x.score, reverse=True)
+    return sorted(candidate_infos, key=ranking_key)
 
 
 name_of_candidate_response_schema = NameOfCandidateResponse.schema()
 number_of_years_response_schema = NumberOfYearsResponse.schema()
+technical_keywords_schema = TechnicalKeywords.schema()
+name_extraction_schema = NameExtraction.schema()
 
 number_of_years_description = (
     "Get user answer or reply with 0 for the number of years and 'unknown' for skill"
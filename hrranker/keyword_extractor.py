@@ -1,20 +1,82 @@
-from langchain.chains import create_tagging_chain_pydantic
+from typing import Dict, List, Any, Tuple
 
-from typing import List, Any
-
-from hrranker.hr_model import TechnicalKeywords
+from hrranker.chain_registry import chain_registry
 from hrranker.config import cfg
 from hrranker.log_init import logger
+from hrranker.llm_cache import run_cached, arun_cached
+from hrranker.llm_scheduler import PRIORITY_BATCH
+from hrranker.metrics import metrics
+from hrranker.keyword_store import keyword_store, normalize_skill
+
+import asyncio
 
 
 def extract_keywords(expression_list: List[str]) -> List[Any]:
-    chain = create_tagging_chain_pydantic(TechnicalKeywords, cfg.llm)
-    expression_pairs = []
+    with metrics.span("keyword_expansion"):
+        known_keywords, missing = lookup_keywords(expression_list)
+        if missing:
+            chain, schema, fields, chain_input = create_keywords_request(missing)
+            response_json = run_cached(chain, chain_input, chain_input, schema)
+            store_keywords(known_keywords, missing, fields, response_json)
+    return [(expression, known_keywords[expression]) for expression in expression_list]
+
+
+async def aextract_keywords(
+    expression_list: List[str], priority: int = PRIORITY_BATCH
+) -> List[Any]:
+    with metrics.span("keyword_expansion"):
+        # SQLite blocks, the event loop keeps serving the other candidates and sessions
+        known_keywords, missing = await asyncio.to_thread(lookup_keywords, expression_list)
+        if missing:
+            chain, schema, fields, chain_input = create_keywords_request(missing)
+            response_json = await arun_cached(
+                chain, chain_input, chain_input, schema, priority=priority
+            )
+            await asyncio.to_thread(
+                store_keywords, known_keywords, missing, fields, response_json
+            )
+    return [(expression, known_keywords[expression]) for expression in expression_list]
+
+
+def lookup_keywords(
+    expression_list: List[str],
+) -> Tuple[Dict[str, List[str]], List[str]]:
+    known_keywords: Dict[str, List[str]] = {}
+    missing: List[str] = []
     for expression in expression_list:
-        technical_keywords: TechnicalKeywords = chain.run(expression)
-        technical_keywords.keywords = [k.lower() for k in technical_keywords.keywords]
-        expression_pairs.append((expression, technical_keywords.keywords))
-    return expression_pairs
+        keywords = keyword_store.get(expression)
+        if keywords is not None:
+            known_keywords[expression] = keywords
+        elif expression not in missing:
+            missing.append(expression)
+    metrics.increment("keyword_store_requests", len(known_keywords), result="hit")
+    metrics.increment("keyword_store_requests", len(missing), result="miss")
+    logger.info(
+        f"Keywords of {len(known_keywords)} skills found locally, {len(missing)} expanded with the LLM"
+    )
+    return known_keywords, missing
+
+
+def create_keywords_request(
+    expression_list: List[str],
+) -> Tuple[Any, Dict[str, Any], List[str], str]:
+    # One call for all the skills which are not known yet
+    chain, schema, fields = chain_registry.keywords_chain(expression_list, cfg.llm)
+    return chain, schema, fields, "\n".join(expression_list)
+
+
+def store_keywords(
+    known_keywords: Dict[str, List[str]],
+    expression_list: List[str],
+    fields: List[str],
+    response_json: Dict[str, Any],
+):
+    for expression, field in zip(expression_list, fields):
+        keywords = [k.lower() for k in response_json.get(field) or []]
+        if len(keywords) == 0:
+            keywords = [normalize_skill(expression)]
+        keyword_store.put(expression, keywords)
+        known_keywords[expression] = keywords
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from hrranker.config import cfg
+from hrranker.log_init import logger
+
+import json
+import re
+import sqlite3
+import threading
+import time
+
+SEED_LOCATION = Path(__file__).parent / "data" / "keyword_seed.json"
+# Phrases which do not change the keywords of a skill, e.g. "Programming in PHP" is "php"
+SKILL_PREFIXES = [
+    "programming in",
+    "programming with",
+    "experience in",
+    "experience with",
+    "knowledge of",
+    "development in",
+    "development with",
+    "developing in",
+    "working with",
+]
+
+
+def normalize_skill(skill: str) -> str:
+    normalized = " ".join(skill.lower().split())
+    for prefix in SKILL_PREFIXES:
+        if normalized.startswith(prefix + " "):
+            normalized = normalized[len(prefix) + 1 :]
+            break
+    # Keep characters like in c++, c# or .net, but drop trailing punctuation
+    return re.sub(r"[\s,;:!?]+$", "", normalized)
+
+
+def load_seed(location: Path = SEED_LOCATION) -> Dict[str, List[str]]:
+    if not location.exists():
+        return {}
+    seed = json.loads(location.read_text(encoding="utf-8"))
+    return {normalize_skill(skill): keywords for skill, keywords in seed.items()}
+
+
+class KeywordStore:
+    # Skill to keywords dictionary shared by all sessions, consulted before the LLM
+
+    def __init__(
+        self,
+        location: Optional[Path] = None,
+        ttl_seconds: Optional[float] = None,
+        seed: Optional[Dict[str, List[str]]] = None,
+    ):
+        # Without a location the configured one is used, once the store is first used
+        self.configured_location = location
+        self.ttl_seconds = ttl_seconds
+        self.seed = seed if seed is not None else {}
+        self.lock = threading.Lock()
+
+    @cached_property
+    def location(self) -> Path:
+        return self.configured_location or cfg.keyword_store_location
+
+    @cached_property
+    def connection(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.location), check_same_thread=False)
+        with connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS skill_keywords (
+                    skill TEXT PRIMARY KEY,
+                    keywords TEXT NOT NULL,
+                    created REAL NOT NULL
+                )"""
+            )
+        return connection
+
+    def get(self, skill: str) -> Optional[List[str]]:
+        normalized = normalize_skill(skill)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT keywords, created FROM skill_keywords WHERE skill = ?",
+                (normalized,),
+            ).fetchone()
+        if row is not None and not self.is_expired(row[1]):
+            return json.loads(row[0])
+        return self.seed.get(normalized)
+
+    def is_expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def put(self, skill: str, keywords: List[str]):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO skill_keywords (skill, keywords, created) VALUES (?, ?, ?)",
+                (normalize_skill(skill), json.dumps(keywords), time.time()),
+            )
+
+    def invalidate(self, skill: Optional[str] = None) -> int:
+        with self.lock, self.connection:
+            if skill is None:
+                cursor = self.connection.execute("DELETE FROM skill_keywords")
+            else:
+                cursor = self.connection.execute(
+                    "DELETE FROM skill_keywords WHERE skill = ?",
+                    (normalize_skill(skill),),
+                )
+            return cursor.rowcount
+
+
+keyword_store = KeywordStore(
+    None,
+    cfg.keyword_ttl_days * 24 * 3600 if cfg.keyword_ttl_days > 0 else None,
+    load_seed(),
+)
+
+
+if __name__ == "__main__":
+    for skill in ["Programming in PHP", "CSS", "Adobe XD", "Programming in Haskell"]:
+        logger.info(f"{skill} ({normalize_skill(skill)}): {keyword_store.get(skill)}")
@@ -0,0 +1,40 @@
+from typing import Dict, List, Tuple
+
+import bisect
+
+from hrranker.hr_model import CandidateInfo, ranking_key
+
+
+class Leaderboard:
+    # The ranking while the candidates finish. Each one is inserted at its place, so the
+    # best ones are available at any time without sorting all candidates again
+
+    def __init__(self):
+        self.keys: List[Tuple[bool, int, float]] = []
+        self.candidate_infos: List[CandidateInfo] = []
+        # Sources of the duplicates of each representative, like group_duplicates
+        self.duplicates: Dict[str, List[str]] = {}
+        self.count = 0
+
+    def add(self, candidate_info: CandidateInfo):
+        self.count += 1
+        if candidate_info.duplicate_of is not None:
+            self.duplicates.setdefault(candidate_info.duplicate_of, []).append(
+                str(candidate_info.source_file)
+            )
+            return
+        key = ranking_key(candidate_info)
+        # After the equal ones, so that candidates with the same score stay in finishing order
+        position = bisect.bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.candidate_infos.insert(position, candidate_info)
+
+    def top(self, size: int) -> List[CandidateInfo]:
+        return self.candidate_infos[:size]
+
+    def ranked(self) -> List[CandidateInfo]:
+        # Only the representatives, the duplicates are listed with them
+        return list(self.candidate_infos)
+
+    def __len__(self) -> int:
+        return len(self.candidate_infos)
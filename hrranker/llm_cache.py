@@ -0,0 +1,248 @@
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from hrranker.config import cfg
+from hrranker.log_init import logger
+from hrranker.metrics import metrics
+from hrranker.llm_scheduler import PRIORITY_BATCH, llm_scheduler
+from hrranker.token_count import estimate_tokens, estimate_schema_tokens
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Least recently used entries removed per statement while the cache is too large
+EVICTION_BATCH_SIZE = 100
+
+
+class LLMCache:
+    def __init__(self, location: Optional[Path] = None, max_bytes: Optional[int] = None):
+        # Without a location the configured one is used, once the cache is first used
+        self.configured_location = location
+        self.max_bytes = max_bytes if max_bytes is not None else cfg.cache_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @cached_property
+    def location(self) -> Path:
+        return self.configured_location or cfg.cache_location
+
+    @cached_property
+    def connection(self) -> sqlite3.Connection:
+        # The cache is shared by the sessions and by the threads of the command line tools
+        connection = sqlite3.connect(str(self.location), check_same_thread=False)
+        with connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)"
+            )
+            # The total size is kept up to date by put and the deletes instead of summing all
+            # entries. Summed once for caches created before
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total INTEGER NOT NULL
+                )"""
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO llm_cache_size (id, total) "
+                + "SELECT 0, COALESCE(SUM(size), 0) FROM llm_cache"
+            )
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.increment("llm_cache_requests", result="miss")
+                return None
+            self.hits += 1
+            metrics.increment("llm_cache_requests", result="hit")
+            self.connection.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            return json.loads(row[0])
+
+    async def aget(self, key: str) -> Optional[Any]:
+        # SQLite blocks, the event loop keeps serving the other candidates and sessions
+        return await asyncio.to_thread(self.get, key)
+
+    def put(self, key: str, model: str, value: Any):
+        serialized = json.dumps(value)
+        with self.lock, self.connection:
+            previous = self.connection.execute(
+                "SELECT size FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, serialized, len(serialized), time.time()),
+            )
+            self.add_size(len(serialized) - (previous[0] if previous else 0))
+            self.evict()
+
+    async def aput(self, key: str, model: str, value: Any):
+        await asyncio.to_thread(self.put, key, model, value)
+
+    def add_size(self, size: int):
+        self.connection.execute("UPDATE llm_cache_size SET total = total + ? WHERE id = 0", (size,))
+
+    def total_size(self) -> int:
+        return self.connection.execute(
+            "SELECT total FROM llm_cache_size WHERE id = 0"
+        ).fetchone()[0]
+
+    def evict(self):
+        # A batch of the least recently used entries at a time, by the index on last_access
+        evicted = 0
+        while self.total_size() > self.max_bytes:
+            size, count = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM "
+                + "(SELECT size FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (EVICTION_BATCH_SIZE,),
+            ).fetchone()
+            if count == 0:
+                break
+            self.connection.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                + "(SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (EVICTION_BATCH_SIZE,),
+            )
+            self.add_size(-size)
+            evicted += count
+        if evicted > 0:
+            logger.info(f"Evicted {evicted} entries from the LLM cache")
+
+    def invalidate(self, model: Optional[str] = None) -> int:
+        with self.lock, self.connection:
+            if model is None:
+                cursor = self.connection.execute("DELETE FROM llm_cache")
+            else:
+                cursor = self.connection.execute(
+                    "DELETE FROM llm_cache WHERE model = ?", (model,)
+                )
+            # Rare, the total is summed again
+            self.connection.execute(
+                "UPDATE llm_cache_size SET total = (SELECT COALESCE(SUM(size), 0) FROM llm_cache) "
+                + "WHERE id = 0"
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            size = self.total_size()
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests > 0 else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+def create_cache_key(text: str, schema: Dict[str, Any], model: str) -> str:
+    key_content = json.dumps([text, schema, model], sort_keys=True)
+    return hashlib.sha256(key_content.encode("utf-8")).hexdigest()
+
+
+def to_cache_value(result: Any) -> Any:
+    if isinstance(result, BaseModel):
+        return result.dict()
+    return result
+
+
+def from_cache_value(value: Any, pydantic_schema: Optional[Type[BaseModel]]) -> Any:
+    if pydantic_schema is not None:
+        return pydantic_schema.parse_obj(value)
+    return value
+
+
+def estimate_request_tokens(text: str, schema: Dict[str, Any]) -> int:
+    return estimate_tokens(text) + estimate_schema_tokens(schema)
+
+
+def run_cached(
+    chain: Any,
+    chain_input: Any,
+    text: str,
+    schema: Dict[str, Any],
+    pydantic_schema: Optional[Type[BaseModel]] = None,
+) -> Any:
+    tokens = estimate_request_tokens(text, schema)
+    if llm_cache is None:
+        return llm_scheduler.run_sync(chain, chain_input, tokens)
+    key = create_cache_key(text, schema, cfg.model)
+    value = llm_cache.get(key)
+    if value is not None:
+        return from_cache_value(value, pydantic_schema)
+    result = llm_scheduler.run_sync(chain, chain_input, tokens)
+    llm_cache.put(key, cfg.model, to_cache_value(result))
+    return result
+
+
+async def arun_cached(
+    chain: Any,
+    chain_input: Any,
+    text: str,
+    schema: Dict[str, Any],
+    pydantic_schema: Optional[Type[BaseModel]] = None,
+    priority: int = PRIORITY_BATCH,
+) -> Any:
+    tokens = estimate_request_tokens(text, schema)
+    if llm_cache is None:
+        return await llm_scheduler.run(chain, chain_input, tokens, priority)
+    key = create_cache_key(text, schema, cfg.model)
+    value = await llm_cache.aget(key)
+    if value is not None:
+        return from_cache_value(value, pydantic_schema)
+    result = await llm_scheduler.run(chain, chain_input, tokens, priority)
+    await llm_cache.aput(key, cfg.model, to_cache_value(result))
+    return result
+
+
+def cache_report() -> str:
+    if llm_cache is None:
+        return "LLM cache disabled"
+    stats = llm_cache.stats()
+    return (
+        f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+        + f"({100 * stats['hit_rate']:.0f}% hit rate), {stats['entries']} entries, {stats['bytes']} bytes"
+    )
+
+
+llm_cache = LLMCache() if cfg.cache_enabled else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM extraction cache")
+    parser.add_argument("--invalidate", action="store_true", help="remove entries")
+    parser.add_argument("--model", type=str, help="only remove entries of this model")
+    args = parser.parse_args()
+    if llm_cache is None:
+        logger.info("The LLM cache is disabled")
+    elif args.invalidate:
+        removed = llm_cache.invalidate(args.model)
+        logger.info(f"Removed {removed} entries from {llm_cache.location}")
+    else:
+        logger.info(f"{llm_cache.location}: {llm_cache.stats()}")
@@ -0,0 +1,245 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from hrranker.config import cfg
+from hrranker.log_init import logger
+from hrranker.metrics import metrics, estimate_completion_tokens
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# Lower values go first, so that interactive sessions do not wait behind batch jobs
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+# Errors after which the same request usually succeeds
+TRANSIENT_ERRORS = {
+    "Timeout",
+    "TimeoutError",
+    "APIError",
+    "APIConnectionError",
+    "ServiceUnavailableError",
+    "TryAgain",
+}
+
+
+class TokenBucket:
+    # Refills continuously at rate_per_minute. A rate of 0 means no limit
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        # A small burst, so that the provider does not see more than the rate in any second.
+        # Requests larger than the capacity go into debt
+        self.capacity = capacity if capacity is not None else max(self.rate / 10, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        if self.rate > 0:
+            self.level -= amount
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    return (
+        getattr(e, "http_status", None) == 429 or type(e).__name__ == "RateLimitError"
+    )
+
+
+def retry_after(e: Exception) -> float:
+    headers = getattr(e, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LLMScheduler:
+    # Every chain call goes through here, so that all sessions share the provider limits
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_retries: int = cfg.llm_max_retries,
+        base_delay: float = cfg.retry_base_delay,
+        max_delay: float = cfg.retry_max_delay,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Set after a rate limit response, nobody sends before this time
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.sequence = itertools.count()
+        self.waiting: List[Tuple[int, int]] = []
+        self.wakeups: Dict[Tuple[int, int], asyncio.Future] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.requests = 0
+        self.tokens = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failures = 0
+        self.queue_wait = 0.0
+        self.first_request: Optional[float] = None
+        self.last_request: Optional[float] = None
+
+    def try_acquire(self, tokens: int) -> float:
+        # Takes from both buckets and returns 0, or returns how long to wait
+        with self.lock:
+            now = time.monotonic()
+            delay = max(
+                self.paused_until - now,
+                self.request_bucket.wait_time(1, now),
+                self.token_bucket.wait_time(tokens, now),
+            )
+            if delay > 0:
+                return delay
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            self.requests += 1
+            self.tokens += tokens
+            if self.first_request is None:
+                self.first_request = now
+            self.last_request = now
+            return 0.0
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_BATCH):
+        # Only the waiter with the best priority takes from the buckets
+        entry = (priority, next(self.sequence))
+        heapq.heappush(self.waiting, entry)
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.waiting[0] == entry:
+                    delay = self.try_acquire(tokens)
+                    if delay == 0:
+                        return
+                    await asyncio.sleep(delay)
+                else:
+                    wakeup = asyncio.get_running_loop().create_future()
+                    self.wakeups[entry] = wakeup
+                    try:
+                        await wakeup
+                    finally:
+                        self.wakeups.pop(entry, None)
+        finally:
+            self.queue_wait += time.perf_counter() - start
+            metrics.observe("llm_queue_wait", time.perf_counter() - start)
+            self.waiting.remove(entry)
+            heapq.heapify(self.waiting)
+            self.wake_head()
+
+    def wake_head(self):
+        if self.waiting:
+            wakeup = self.wakeups.get(self.waiting[0])
+            if wakeup is not None and not wakeup.done():
+                wakeup.set_result(None)
+
+    def backoff(self, e: Exception, attempt: int) -> Optional[float]:
+        # Exponential backoff with full jitter, None if the call should not be retried
+        rate_limited = is_rate_limit_error(e)
+        if rate_limited:
+            self.rate_limited += 1
+        if attempt >= self.max_retries or not (
+            rate_limited or type(e).__name__ in TRANSIENT_ERRORS
+        ):
+            self.failures += 1
+            return None
+        self.retries += 1
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if rate_limited:
+            delay = max(delay, retry_after(e))
+            # The limit is shared, so everybody else backs off as well
+            with self.lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        logger.warning(f"LLM call failed with {type(e).__name__}, retrying in {delay:.2f}s")
+        return delay
+
+    async def run(
+        self,
+        chain: Any,
+        chain_input: Any,
+        tokens: int,
+        priority: int = PRIORITY_BATCH,
+    ) -> Any:
+        attempt = 0
+        while True:
+            await self.acquire(tokens, priority)
+            start = time.perf_counter()
+            try:
+                result = await chain.arun(chain_input)
+                metrics.record_llm_call(
+                    time.perf_counter() - start,
+                    tokens,
+                    estimate_completion_tokens(result),
+                )
+                return result
+            except Exception as e:
+                delay = self.backoff(e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def run_sync(self, chain: Any, chain_input: Any, tokens: int) -> Any:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            delay = self.try_acquire(tokens)
+            while delay > 0:
+                time.sleep(delay)
+                delay = self.try_acquire(tokens)
+            self.queue_wait += time.perf_counter() - start
+            metrics.observe("llm_queue_wait", time.perf_counter() - start)
+            start = time.perf_counter()
+            try:
+                result = chain.run(chain_input)
+                metrics.record_llm_call(
+                    time.perf_counter() - start,
+                    tokens,
+                    estimate_completion_tokens(result),
+                )
+                return result
+            except Exception as e:
+                delay = self.backoff(e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    def report(self) -> str:
+        elapsed = (
+            self.last_request - self.first_request
+            if self.first_request is not None and self.last_request is not None
+            else 0.0
+        )
+        minutes = max(elapsed, 1.0) / 60
+        return (
+            f"LLM scheduler: {self.requests} requests ({self.requests / minutes:.0f}/min, "
+            + f"limit {self.requests_per_minute or 'none'}), ~{self.tokens} tokens "
+            + f"({self.tokens / minutes:.0f}/min, limit {self.tokens_per_minute or 'none'}), "
+            + f"{self.rate_limited} rate limited, {self.retries} retries, {self.failures} failures, "
+            + f"{self.queue_wait:.1f}s queue wait"
+        )
+
+
+llm_scheduler = LLMScheduler(cfg.requests_per_minute, cfg.tokens_per_minute)
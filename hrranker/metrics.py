@@ -0,0 +1,328 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cached_property
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from hrranker.config import cfg
+from hrranker.log_init import logger
+from hrranker.token_count import estimate_tokens
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+# Labels of the enclosing spans, e.g. the run and the candidate an LLM call belongs to
+span_labels: ContextVar[Dict[str, str]] = ContextVar("span_labels", default={})
+
+# Only these labels are aggregated, per candidate values end up in the JSON lines file
+AGGREGATED_LABELS = ["stage", "result"]
+
+
+class Aggregate:
+    # Timers and counters of the whole process or of a single run
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timers: Dict[Tuple, List[float]] = {}
+        self.counters: Dict[Tuple, float] = {}
+
+    def observe(self, key: Tuple, seconds: float):
+        timer = self.timers.setdefault(key, [0, 0.0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+
+    def increment(self, key: Tuple, value: float):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels: str) -> float:
+        return sum(
+            value
+            for (counter_name, counter_labels), value in self.counters.items()
+            if counter_name == name
+            and all(dict(counter_labels).get(k) == v for k, v in labels.items())
+        )
+
+    def timer(self, name: str, **labels: str) -> Tuple[int, float]:
+        count = 0
+        total = 0.0
+        for (timer_name, timer_labels), timer in self.timers.items():
+            if timer_name == name and all(
+                dict(timer_labels).get(k) == v for k, v in labels.items()
+            ):
+                count += int(timer[0])
+                total += timer[1]
+        return count, total
+
+
+def aggregation_key(name: str, labels: Dict[str, str]) -> Tuple:
+    return (
+        name,
+        tuple((label, labels[label]) for label in AGGREGATED_LABELS if label in labels),
+    )
+
+
+def estimate_completion_tokens(result: Any) -> int:
+    if isinstance(result, BaseModel):
+        return estimate_tokens(result.json())
+    return estimate_tokens(json.dumps(result, default=str))
+
+
+class Metrics:
+    def __init__(
+        self,
+        export_location: Optional[Path] = None,
+        export_enabled: bool = cfg.metrics_enabled,
+        export_max_bytes: int = cfg.metrics_max_bytes,
+        prompt_token_price: float = cfg.prompt_token_price,
+        completion_token_price: float = cfg.completion_token_price,
+    ):
+        # Without a location the configured one is used, once the first event is recorded
+        self.configured_location = export_location
+        self.export_enabled = export_enabled
+        self.export_max_bytes = export_max_bytes
+        self.export_thread: Optional[threading.Thread] = None
+        self.prompt_token_price = prompt_token_price
+        self.completion_token_price = completion_token_price
+        self.lock = threading.Lock()
+        self.total = Aggregate()
+        self.runs: Dict[str, Aggregate] = {}
+
+    @cached_property
+    def export_location(self) -> Path:
+        return self.configured_location or cfg.metrics_location
+
+    @cached_property
+    def export_queue(self) -> "queue.SimpleQueue[Optional[str]]":
+        # Written by a thread, so that recording an event never waits for the disk
+        export_queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self.export_thread = threading.Thread(
+            target=self.write_events, args=(export_queue,), daemon=True
+        )
+        self.export_thread.start()
+        atexit.register(self.close)
+        return export_queue
+
+    def write_events(self, export_queue: "queue.SimpleQueue[Optional[str]]"):
+        location = self.export_location
+        export_file = open(location, "a", encoding="utf-8")
+        # json.dumps escapes everything outside of ASCII, so characters are bytes
+        written = export_file.tell()
+        while True:
+            line = export_queue.get()
+            if line is None:
+                break
+            if written > 0 and written + len(line) > self.export_max_bytes:
+                # One previous file is kept, older events are dropped
+                export_file.close()
+                os.replace(location, location.with_name(location.name + ".1"))
+                export_file = open(location, "a", encoding="utf-8")
+                written = 0
+            export_file.write(line)
+            written += len(line)
+            if export_queue.empty():
+                export_file.flush()
+        export_file.close()
+
+    def close(self):
+        # Writes the events which are still queued
+        if self.export_thread is not None and self.export_thread.is_alive():
+            self.export_queue.put(None)
+            self.export_thread.join(timeout=10)
+
+    def aggregates(self, labels: Dict[str, str]) -> List[Aggregate]:
+        run = self.runs.get(labels.get("run", ""))
+        return [self.total] if run is None else [self.total, run]
+
+    def export(self, event: Dict[str, Any]):
+        if self.export_enabled:
+            self.export_queue.put(json.dumps(event) + "\n")
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        labels = {**span_labels.get(), **labels}
+        key = aggregation_key(name, labels)
+        with self.lock:
+            for aggregate in self.aggregates(labels):
+                aggregate.observe(key, seconds)
+            self.export({"time": time.time(), "event": name, "seconds": seconds, **labels})
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        labels = {**span_labels.get(), **labels}
+        key = aggregation_key(name, labels)
+        with self.lock:
+            for aggregate in self.aggregates(labels):
+                aggregate.increment(key, value)
+            self.export({"time": time.time(), "event": name, "value": value, **labels})
+
+    def record_llm_call(
+        self, seconds: float, prompt_tokens: int, completion_tokens: int
+    ):
+        labels = span_labels.get()
+        cost = (
+            prompt_tokens * self.prompt_token_price
+            + completion_tokens * self.completion_token_price
+        ) / 1000
+        key = aggregation_key("llm_call", labels)
+        with self.lock:
+            for aggregate in self.aggregates(labels):
+                aggregate.observe(key, seconds)
+                aggregate.increment(aggregation_key("llm_prompt_tokens", labels), prompt_tokens)
+                aggregate.increment(
+                    aggregation_key("llm_completion_tokens", labels), completion_tokens
+                )
+                aggregate.increment(aggregation_key("llm_cost_usd", labels), cost)
+            self.export(
+                {
+                    "time": time.time(),
+                    "event": "llm_call",
+                    "seconds": seconds,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "cost_usd": cost,
+                    **labels,
+                }
+            )
+
+    @contextmanager
+    def span(self, name: str, **labels: str) -> Iterator[None]:
+        # Everything recorded inside, also in tasks started inside, is attributed to this stage
+        token = span_labels.set({**span_labels.get(), **labels, "stage": name})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            span_labels.reset(token)
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def run(self, run_id: Optional[str] = None) -> Iterator[str]:
+        # Collects a separate summary of everything recorded inside
+        run_id = run_id or uuid.uuid4().hex[:8]
+        with self.lock:
+            self.runs[run_id] = Aggregate()
+        token = span_labels.set({**span_labels.get(), "run": run_id})
+        try:
+            yield run_id
+        finally:
+            span_labels.reset(token)
+            with self.lock:
+                self.runs.pop(run_id, None)
+
+    def llm_usage(self, run_id: str, stage: str) -> Optional[Tuple[int, float, float]]:
+        # LLM calls, prompt and completion tokens of a stage of a run which is still open
+        with self.lock:
+            run = self.runs.get(run_id)
+            if run is None:
+                return None
+            calls, _ = run.timer("llm_call", stage=stage)
+            return (
+                calls,
+                run.counter("llm_prompt_tokens", stage=stage),
+                run.counter("llm_completion_tokens", stage=stage),
+            )
+
+    def summary(self, run_id: Optional[str] = None) -> str:
+        with self.lock:
+            aggregate = self.runs.get(run_id, self.total) if run_id else self.total
+            return format_summary(aggregate)
+
+    def prometheus_text(self) -> str:
+        lines: List[str] = []
+        with self.lock:
+            for (name, labels), (count, total, maximum) in sorted(
+                self.total.timers.items()
+            ):
+                label_text = format_labels(labels)
+                lines.append(f"hrranker_{name}_seconds_count{label_text} {int(count)}")
+                lines.append(f"hrranker_{name}_seconds_sum{label_text} {total:.6f}")
+                lines.append(f"hrranker_{name}_seconds_max{label_text} {maximum:.6f}")
+            for (name, labels), value in sorted(self.total.counters.items()):
+                lines.append(f"hrranker_{name}_total{format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{label}="{value}"' for label, value in labels) + "}"
+
+
+def format_summary(aggregate: Aggregate) -> str:
+    stage_times: Dict[str, List[float]] = {}
+    for (name, _), (count, total, _) in aggregate.timers.items():
+        if name in ["llm_call", "llm_queue_wait"]:
+            continue
+        stage_time = stage_times.setdefault(name, [0, 0.0])
+        stage_time[0] += count
+        stage_time[1] += total
+    llm_calls, llm_seconds = aggregate.timer("llm_call")
+    cache_hits = aggregate.counter("llm_cache_requests", result="hit")
+    cache_requests = aggregate.counter("llm_cache_requests")
+    queue_waits, queue_seconds = aggregate.timer("llm_queue_wait")
+    cost = aggregate.counter("llm_cost_usd")
+    candidate_count, _ = aggregate.timer("candidate")
+    stage_text = ", ".join(
+        f"{name} {int(count)}x {total:.2f}s" for name, (count, total) in sorted(stage_times.items())
+    )
+    return (
+        f"Performance: {time.perf_counter() - aggregate.started:.1f}s elapsed. "
+        + f"Stages (summed over candidates): {stage_text or 'none'}. "
+        + f"LLM: {llm_calls} calls, {llm_seconds:.1f}s, "
+        + f"~{aggregate.counter('llm_prompt_tokens'):.0f} prompt and "
+        + f"~{aggregate.counter('llm_completion_tokens'):.0f} completion tokens, "
+        + f"~${cost:.4f}"
+        + (f" (~${cost / candidate_count:.4f} per candidate)" if candidate_count else "")
+        + ". "
+        + f"Cache hit rate {100 * cache_hits / cache_requests if cache_requests else 0:.0f}% "
+        + f"of {cache_requests:.0f} lookups. "
+        + f"Queue wait {queue_seconds / queue_waits if queue_waits else 0:.2f}s per LLM call."
+    )
+
+
+def current_run_id() -> Optional[str]:
+    # The run of Metrics.run around the caller, if any
+    return span_labels.get().get("run")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+metrics_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(
+    port: int = cfg.metrics_port, host: str = cfg.metrics_host
+) -> Optional[ThreadingHTTPServer]:
+    # Prometheus text format on http://<host>:<port>/metrics, 0 disables it. Only local by
+    # default, the metrics show the runs and the LLM costs
+    global metrics_server
+    if port <= 0 or metrics_server is not None:
+        return metrics_server
+    metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return metrics_server
+
+
+metrics = Metrics()
@@ -1,19 +1,222 @@
-from langchain.chains import create_tagging_chain_pydantic
+from collections import Counter
+from pathlib import Path
+from typing import Any, Collection, List, Optional, Set, Tuple
 
-from hrranker.hr_model import NameExtraction
+import re
 
+from hrranker.hr_model import NameExtraction, name_extraction_schema
+
+from hrranker.chain_registry import chain_registry
 from hrranker.config import cfg
 from hrranker.log_init import logger
+from hrranker.llm_cache import run_cached, arun_cached
+from hrranker.llm_scheduler import PRIORITY_BATCH
+
+# Words in file names and CV headers which are never part of a name
+STOP_WORDS = {
+    "cv",
+    "resume",
+    "résumé",
+    "curriculum",
+    "vitae",
+    "cutshort",
+    "naukri",
+    "linkedin",
+    "profile",
+    "final",
+    "updated",
+    "latest",
+    "new",
+    "copy",
+    "pdf",
+    "doc",
+    "of",
+    "the",
+    "and",
+    "engineer",
+    "developer",
+    "designer",
+    "manager",
+    "consultant",
+    "analyst",
+    "architect",
+    "senior",
+    "junior",
+    "software",
+    "web",
+    "full",
+    "stack",
+    "frontend",
+    "backend",
+    "summary",
+    "contact",
+    "experience",
+    "education",
+    "skills",
+    "objective",
+    "personal",
+    "details",
+    "page",
+    "portfolio",
+    "expert",
+    "specialist",
+    "freelancer",
+    "intern",
+}
+HEADER_LINES = 8
+# A file name alone is below the default NAME_CONFIDENCE_THRESHOLD, it has to agree with the header
+FILE_NAME_CONFIDENCE = 0.6
+
+name_resolution_counts: Counter = Counter()
 
 
 def extract_name(file_name: str) -> str:
     logger.info("extract_name: %s %s", file_name, type(file_name))
-    chain = create_tagging_chain_pydantic(NameExtraction, cfg.llm)
-    name_extraction: NameExtraction = chain.run(file_name)
+    chain = chain_registry.tagging_chain_pydantic(NameExtraction, cfg.llm)
+    name_extraction: NameExtraction = run_cached(
+        chain, file_name, file_name, name_extraction_schema, NameExtraction
+    )
+    return " ".join(name_extraction.person_full_name)
+
+
+async def aextract_name(file_name: str, priority: int = PRIORITY_BATCH) -> str:
+    logger.info("aextract_name: %s", file_name)
+    chain = chain_registry.tagging_chain_pydantic(NameExtraction, cfg.llm)
+    name_extraction: NameExtraction = await arun_cached(
+        chain,
+        file_name,
+        file_name,
+        name_extraction_schema,
+        NameExtraction,
+        priority,
+    )
     return " ".join(name_extraction.person_full_name)
 
 
+def name_tokens(text: str) -> List[str]:
+    # Splits on separators and camel case, e.g. "JaneDoe_CV-2023" gives Jane, Doe, CV, 2023
+    tokens: List[str] = []
+    for token in re.split(r"[\s_\-.,;:|()\[\]]+", text):
+        if token.lower() in STOP_WORDS:
+            # Keeps words like CutShort together
+            tokens.append(token)
+        else:
+            tokens.extend(re.sub(r"(?<=[a-z])(?=[A-Z])", " ", token).split())
+    return tokens
+
+
+def skill_vocabulary(skills: List[str], expression_pairs: List[Any]) -> Set[str]:
+    # Words of the skills and their keywords, e.g. "Wordpress_Expert.pdf" is no name
+    words: Set[str] = set()
+    for text in skills + [
+        keyword for _, keywords in expression_pairs for keyword in keywords
+    ]:
+        words.update(token.lower() for token in name_tokens(str(text)))
+    return words
+
+
+def is_name_token(token: str, vocabulary: Collection[str] = ()) -> bool:
+    return (
+        len(token) > 1
+        and token.isalpha()
+        and token.lower() not in STOP_WORDS
+        and token.lower() not in vocabulary
+    )
+
+
+def name_from_file_name(
+    file_name: str, vocabulary: Collection[str] = ()
+) -> Tuple[Optional[str], float]:
+    tokens = name_tokens(Path(file_name).stem)
+    if any(t.lower() in vocabulary for t in tokens):
+        return None, 0.0
+    name_parts = [t for t in tokens if is_name_token(t)]
+    if len(name_parts) in [2, 3]:
+        return " ".join(t.capitalize() for t in name_parts), FILE_NAME_CONFIDENCE
+    if len(name_parts) == 1:
+        return name_parts[0].capitalize(), 0.4
+    return None, 0.0
+
+
+def name_from_header(
+    text: str, vocabulary: Collection[str] = ()
+) -> Tuple[Optional[str], float]:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for line in lines[:HEADER_LINES]:
+        tokens = name_tokens(line)
+        if len(tokens) not in [2, 3, 4]:
+            continue
+        capitalized = all(t[0].isupper() for t in tokens)
+        if capitalized and all(is_name_token(t, vocabulary) for t in tokens):
+            return " ".join(t.capitalize() for t in tokens), 0.7
+    return None, 0.0
+
+
+def resolve_name_locally(
+    file_name: str, text: str = "", vocabulary: Collection[str] = ()
+) -> Tuple[Optional[str], float, str]:
+    file_name_candidate, file_name_confidence = name_from_file_name(file_name, vocabulary)
+    header_candidate, header_confidence = name_from_header(text, vocabulary)
+    if file_name_candidate and header_candidate:
+        if set(file_name_candidate.lower().split()) & set(
+            header_candidate.lower().split()
+        ):
+            # Both sources agree, the header usually has the better spelling
+            return header_candidate, 0.95, "local_header"
+    if file_name_confidence >= header_confidence:
+        return file_name_candidate, file_name_confidence, "local_file_name"
+    return header_candidate, header_confidence, "local_header"
+
+
+async def aresolve_name(
+    file_name: str,
+    text: str = "",
+    confidence_threshold: float = cfg.name_confidence_threshold,
+    priority: int = PRIORITY_BATCH,
+    vocabulary: Collection[str] = (),
+) -> str:
+    # Only asks the LLM when the local heuristics are not confident enough
+    name, confidence, resolution = resolve_name_locally(file_name, text, vocabulary)
+    if name is None or confidence < confidence_threshold:
+        name = await aextract_name(Path(file_name).stem, priority)
+        resolution = "llm"
+    log_name_resolution(name, file_name, resolution)
+    return name
+
+
+def log_name_resolution(name: str, file_name: str, resolution: str):
+    name_resolution_counts[resolution] += 1
+    logger.info(
+        f"Resolved name {name} of {file_name} with {resolution}. Totals: {dict(name_resolution_counts)}"
+    )
+
+
 if __name__ == "__main__":
+    for file_name, expected in [
+        ("Ashwini_Sadamate.pdf", "Ashwini Sadamate"),
+        ("CutShort_Bharat_Kumar_Resume.pdf", "Bharat Kumar"),
+        ("John-Doe-CV-2023.pdf", "John Doe"),
+        ("JaneDoe_updated.pdf", "Jane Doe"),
+        ("MARIA_SILVA_CV.pdf", "Maria Silva"),
+        ("resume_final_2.pdf", None),
+    ]:
+        name, confidence = name_from_file_name(file_name)
+        assert name == expected, f"{file_name}: {name}"
+    name, confidence, resolution = resolve_name_locally(
+        "resume_final_2.pdf", "Curriculum Vitae\nMaria Silva\nSoftware Engineer"
+    )
+    assert name == "Maria Silva" and resolution == "local_header"
+    # Without the header a file name is not enough
+    name, confidence, _ = resolve_name_locally("Ashwini_Sadamate.pdf")
+    assert confidence < cfg.name_confidence_threshold
+    name, confidence, _ = resolve_name_locally(
+        "Ashwini_Sadamate.pdf", "Ashwini Sadamate\nWeb Developer"
+    )
+    assert name == "Ashwini Sadamate" and confidence >= cfg.name_confidence_threshold
+    vocabulary = skill_vocabulary(["Wordpress", "CSS"], [("Wordpress", ["wordpress", "woocommerce"])])
+    assert name_from_file_name("Wordpress_Expert_Portfolio.pdf", vocabulary) == (None, 0.0)
+    assert name_from_header("Wordpress Woocommerce\nJohn Doe", vocabulary)[0] == "John Doe"
+
     for pdf in cfg.test_doc_location.glob("*.pdf"):
         file_name = pdf.stem
         logger.info(f"Processing {file_name}")
@@ -0,0 +1,99 @@
+from typing import List
+
+import threading
+
+from hrranker.bm25 import BM25, tokenize
+from hrranker.experience import RANGE_PATTERN, SINCE_PATTERN
+from hrranker.token_count import estimate_tokens, truncate_to_tokens
+
+PASSAGE_CHARS = 600
+HEADER_LINES = 15
+# Terms which point to the passages with the total years of experience
+EXPERIENCE_QUERY = ["experience", "years", "year", "present", "current", "since"]
+
+
+def split_passages(text: str, passage_chars: int = PASSAGE_CHARS) -> List[str]:
+    # PDF text rarely has blank lines, so long runs of lines are cut into chunks as well
+    passages: List[str] = []
+    current: List[str] = []
+    current_chars = 0
+    for line in text.splitlines():
+        if line.strip() == "" or current_chars >= passage_chars:
+            if current:
+                passages.append("\n".join(current))
+            current = []
+            current_chars = 0
+        if line.strip() != "":
+            current.append(line)
+            current_chars += len(line)
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+def mentions_dates(passage: str) -> bool:
+    # Job entries carry the dates the years are counted from
+    return bool(RANGE_PATTERN.search(passage) or SINCE_PATTERN.search(passage))
+
+
+def select_passages(
+    text: str,
+    keywords: List[str],
+    token_budget: int,
+    always_include: int = 0,
+) -> str:
+    # Every passage with a keyword or a date range, in their original order. Leaving out some of
+    # them to fit the budget loses the dates of jobs, so then the whole CV is sent
+    if token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text
+    passages = split_passages(text)
+    query = [token for keyword in keywords for token in tokenize(keyword)]
+    bm25 = BM25([tokenize(p) for p in passages])
+    scores = bm25.scores(query)
+    selected = [
+        i
+        for i, passage in enumerate(passages)
+        if i < always_include or scores[i] > 0 or mentions_dates(passage)
+    ]
+    if len(selected) == 0:
+        # Nothing matches, so the beginning of the CV is as good as anything else
+        return truncate_to_tokens(passages[0], token_budget)
+    selected_text = "\n".join(passages[i] for i in selected)
+    if estimate_tokens(selected_text) > token_budget:
+        return text
+    return selected_text
+
+
+def select_header(text: str, token_budget: int) -> str:
+    # Name and contact details are at the top, the total experience is wherever it is mentioned
+    if token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text
+    lines = text.splitlines()
+    header = "\n".join(lines[:HEADER_LINES])
+    rest = "\n".join(lines[HEADER_LINES:])
+    remaining_budget = token_budget - estimate_tokens(header)
+    if remaining_budget <= 0:
+        return truncate_to_tokens(header, token_budget)
+    return header + "\n" + select_passages(rest, EXPERIENCE_QUERY, remaining_budget)
+
+
+class PruningStats:
+    def __init__(self):
+        self.full_tokens = 0
+        self.selected_tokens = 0
+        self.lock = threading.Lock()
+
+    def add(self, full_text: str, selected_text: str):
+        with self.lock:
+            self.full_tokens += estimate_tokens(full_text)
+            self.selected_tokens += estimate_tokens(selected_text)
+
+    def report(self) -> str:
+        saved_tokens = self.full_tokens - self.selected_tokens
+        saved_percentage = (
+            100 * saved_tokens / self.full_tokens if self.full_tokens > 0 else 0
+        )
+        return (
+            f"Prompt pruning: sent ~{self.selected_tokens} of ~{self.full_tokens} CV tokens, "
+            + f"saved ~{saved_tokens} ({saved_percentage:.0f}%)"
+        )
@@ -2,41 +2,93 @@ from hrranker.hr_model import (
     CandidateInfo,
     NameOfCandidateResponse,
     NumberOfYearsResponseWithWeight,
+    sort_candidate_infos,
 )
 from hrranker.config import cfg
+from hrranker.log_init import logger
 
-import matplotlib.pyplot as plt
-import matplotlib
-from matplotlib.pyplot import figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from pathlib import Path
-import numpy as np
 
+import asyncio
 import time
+import uuid
 
-from typing import List
+from typing import List, Optional
 
+FONT_SIZE = 22
 
-def create_barchart(candidate_infos: List[CandidateInfo]) -> Path:
-    x_axis = [ci.name_of_candidate_response.name for ci in candidate_infos]
-    y_axis = [ci.score for ci in candidate_infos]
-    fig = figure(figsize=(18, 10), dpi=80)
-    fig.subplots_adjust(bottom=0.2)
-    font = {"size": 22}
 
-    matplotlib.rc("font", **font)
-    plt.bar(x_axis, y_axis)
-    plt.title("Candidate Ranking")
-    plt.xlabel("Candidate name")
-    plt.ylabel("Score")
-    plt.xticks(rotation=25)
+def create_barchart(
+    candidate_infos: List[CandidateInfo],
+    page: int = 0,
+    page_size: int = cfg.chart_max_bars,
+    location: Optional[Path] = None,
+) -> Path:
+    # A figure of its own instead of the global pyplot state, so that concurrent
+    # sessions can render at the same time and nothing stays registered afterwards
+    location = location or cfg.temp_doc_location
+    ranked = sort_candidate_infos(candidate_infos)
+    first = page * page_size
+    shown = ranked[first : first + page_size]
+    x_axis = [ci.name_of_candidate_response.name or str(ci.source_file) for ci in shown]
+    y_axis = [ci.score for ci in shown]
+    fig = Figure(figsize=(18, 10), dpi=80)
+    FigureCanvasAgg(fig)
+    fig.subplots_adjust(bottom=0.2)
+    ax = fig.add_subplot()
+    ax.bar(range(len(shown)), y_axis)
+    ax.set_xticks(range(len(shown)))
+    ax.set_xticklabels(x_axis, rotation=25, ha="right", fontsize=FONT_SIZE)
+    ax.tick_params(axis="y", labelsize=FONT_SIZE)
+    title = "Candidate Ranking"
+    if len(ranked) > len(shown):
+        title += f" ({first + 1}-{first + len(shown)} of {len(ranked)})"
+    ax.set_title(title, fontsize=FONT_SIZE)
+    ax.set_xlabel("Candidate name", fontsize=FONT_SIZE)
+    ax.set_ylabel("Score", fontsize=FONT_SIZE)
 
     time_millis = round(time.time() * 1000)
-
-    ranking_plot = cfg.temp_doc_location / f"{time_millis}_ranking.png"
-    plt.savefig(ranking_plot)
+    ranking_plot = location / f"{time_millis}_{uuid.uuid4().hex[:8]}_ranking.png"
+    try:
+        fig.savefig(ranking_plot)
+    finally:
+        fig.clear()
+    remove_old_charts(location)
     return ranking_plot
 
 
+async def acreate_barchart(
+    candidate_infos: List[CandidateInfo],
+    page: int = 0,
+    page_size: int = cfg.chart_max_bars,
+    location: Optional[Path] = None,
+) -> Path:
+    # Rendering takes long enough to hold up the other sessions on the event loop
+    return await asyncio.to_thread(
+        create_barchart, candidate_infos, page, page_size, location
+    )
+
+
+def remove_old_charts(
+    location: Path, max_age_seconds: float = cfg.chart_max_age_minutes * 60
+) -> int:
+    removed = 0
+    oldest = time.time() - max_age_seconds
+    for chart in location.glob("*_ranking.png"):
+        try:
+            if chart.stat().st_mtime < oldest:
+                chart.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Removed by another session at the same time
+            continue
+    if removed > 0:
+        logger.info(f"Removed {removed} old ranking charts from {location}")
+    return removed
+
+
 if __name__ == "__main__":
     name_of_candidate_response_1 = NameOfCandidateResponse(
         name="John Doe", age=40, gender="male", email="john@gmail.com"
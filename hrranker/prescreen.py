@@ -0,0 +1,43 @@
+from typing import Any, List, Set
+
+import math
+
+from hrranker.bm25 import BM25, tokenize
+
+
+def prescreen_scores(
+    texts: List[str], expression_pairs: List[Any], weights: List[int]
+) -> List[float]:
+    # BM25 of the expanded keywords of each skill over the whole CVs. Each skill is scaled
+    # to the best CV, so the weighted average is between 0 and 1
+    bm25 = BM25([tokenize(text) for text in texts])
+    totals = [0.0] * len(texts)
+    for (_, keywords), weight in zip(expression_pairs, weights):
+        query = [token for keyword in keywords for token in tokenize(keyword)]
+        skill_scores = bm25.scores(query)
+        best_score = max(skill_scores, default=0.0)
+        if best_score <= 0:
+            continue
+        for i, skill_score in enumerate(skill_scores):
+            totals[i] += weight * skill_score / best_score
+    weight_sum = sum(weights) or 1
+    return [total / weight_sum for total in totals]
+
+
+def shortlist(scores: List[float], top_k: int = 0, threshold: float = 0.0) -> Set[int]:
+    # The best top_k and all at or above the threshold. 0 disables a rule, both keeps everyone.
+    # Ties with the last of the top_k are kept as well, so copies of a CV are not split up
+    if (top_k <= 0 and threshold <= 0) or top_k >= len(scores):
+        return set(range(len(scores)))
+    minimum_score = sorted(scores, reverse=True)[top_k - 1] if top_k > 0 else math.inf
+    if threshold > 0:
+        minimum_score = min(minimum_score, threshold)
+    return {i for i, score in enumerate(scores) if score >= minimum_score}
+
+
+def shortlist_recall(ranked_sources: List[str], shortlisted: Set[str], top_n: int) -> float:
+    # Share of the best top_n of a full ranking which made it into the shortlist
+    best_sources = ranked_sources[:top_n]
+    if not best_sources:
+        return 1.0
+    return sum(1 for source in best_sources if source in shortlisted) / len(best_sources)
@@ -0,0 +1,177 @@
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from hrranker.config import cfg
+from hrranker.hr_model import (
+    CandidateExtraction,
+    CandidateInfo,
+    NumberOfYearsResponseWithWeight,
+)
+from hrranker.log_init import logger
+from hrranker.score_matrix import ScoreMatrix
+
+import argparse
+import hashlib
+import time
+
+import numpy as np
+
+
+def to_candidate_extraction(candidate_info: CandidateInfo) -> CandidateExtraction:
+    return CandidateExtraction(
+        name_of_candidate_response=candidate_info.name_of_candidate_response,
+        number_of_years_responses=[
+            nyr.number_of_years_response
+            for nyr in candidate_info.number_of_years_responses
+        ],
+        source_file=str(candidate_info.source_file),
+        duplicate_of=candidate_info.duplicate_of,
+        prescreen_score=candidate_info.prescreen_score,
+        screened_out=candidate_info.screened_out,
+    )
+
+
+def extraction_path(source_file: str, location: Path) -> Path:
+    source_hash = hashlib.sha256(str(source_file).encode("utf-8")).hexdigest()[:16]
+    return location / f"{Path(source_file).stem}_{source_hash}.json"
+
+
+def run_extraction_location(run_id: str, location: Optional[Path] = None) -> Path:
+    # Each run has its own folder, so that sessions uploading CVs with the same file name
+    # and runs for other jobs do not overwrite or mix with each other's extractions
+    run_location = (location or cfg.extraction_location) / run_id
+    run_location.mkdir(parents=True, exist_ok=True)
+    return run_location
+
+
+def latest_run_id(location: Optional[Path] = None) -> Optional[str]:
+    location = location or cfg.extraction_location
+    runs = [path for path in location.iterdir() if path.is_dir()]
+    if not runs:
+        return None
+    return max(runs, key=lambda path: path.stat().st_mtime).name
+
+
+def save_extraction(candidate_info: CandidateInfo, location: Path) -> Path:
+    candidate_extraction = to_candidate_extraction(candidate_info)
+    path = extraction_path(candidate_extraction.source_file, location)
+    path.write_text(candidate_extraction.json(), encoding="utf-8")
+    return path
+
+
+def load_extractions(
+    run_id: Optional[str] = None,
+    location: Optional[Path] = None,
+) -> List[CandidateExtraction]:
+    # The extractions of a single run, by default the latest one
+    run_id = run_id or latest_run_id(location)
+    if run_id is None:
+        logger.warning("No extractions found")
+        return []
+    run_location = (location or cfg.extraction_location) / run_id
+    return [
+        CandidateExtraction.parse_file(path)
+        for path in sorted(run_location.glob("*.json"))
+    ]
+
+
+def rescore(
+    candidate_extraction: CandidateExtraction, skills: List[str], weights: List[int]
+) -> CandidateInfo:
+    extracted_skills = {
+        nyr.skill: nyr for nyr in candidate_extraction.number_of_years_responses
+    }
+    # Scoring a missing skill with 0 would silently rank the candidate lower
+    missing_skills = [skill for skill in skills if skill not in extracted_skills]
+    if missing_skills:
+        raise ValueError(
+            f"{', '.join(missing_skills)} not extracted for {candidate_extraction.source_file}. "
+            + "Rank the CVs again with these skills."
+        )
+    number_of_years_responses: List[NumberOfYearsResponseWithWeight] = []
+    for skill, weight in zip(skills, weights):
+        number_of_years_responses.append(
+            NumberOfYearsResponseWithWeight(
+                number_of_years_response=extracted_skills[skill], score_weight=weight
+            )
+        )
+    return CandidateInfo(
+        name_of_candidate_response=candidate_extraction.name_of_candidate_response,
+        number_of_years_responses=number_of_years_responses,
+        source_file=candidate_extraction.source_file,
+        duplicate_of=candidate_extraction.duplicate_of,
+        prescreen_score=candidate_extraction.prescreen_score,
+        screened_out=candidate_extraction.screened_out,
+    )
+
+
+def rerank(
+    candidate_extractions: List[CandidateExtraction],
+    skills: List[str],
+    weights: List[int],
+    top: Optional[int] = None,
+    score_matrix: Optional[ScoreMatrix] = None,
+) -> List[CandidateInfo]:
+    # The best top candidates, all of them by default. A score matrix of the extractions can be
+    # built once and re-ranked with the weights of any of its skills
+    start = time.perf_counter()
+    if score_matrix is None:
+        score_matrix = ScoreMatrix.from_extractions(candidate_extractions, skills)
+    skill_weights = dict(zip(skills, weights))
+    unknown_skills = [skill for skill in skills if skill not in score_matrix.skills]
+    if unknown_skills:
+        raise ValueError(f"Unknown skills: {', '.join(unknown_skills)}")
+    columns = [score_matrix.skills.index(skill) for skill in skills]
+    # Scoring a missing skill with 0 would silently rank the candidate lower
+    missing_rows = np.flatnonzero(~score_matrix.extracted[:, columns].all(axis=1))
+    if len(missing_rows) > 0:
+        # Raises the error naming the skills
+        rescore(candidate_extractions[missing_rows[0]], skills, weights)
+    rows = score_matrix.top_k(
+        [skill_weights.get(skill, 0) for skill in score_matrix.skills],
+        len(score_matrix) if top is None else top,
+    )
+    candidate_infos = [rescore(candidate_extractions[row], skills, weights) for row in rows]
+    elapsed_millis = (time.perf_counter() - start) * 1000
+    logger.info(
+        f"Re-ranked {len(score_matrix)} candidates in {elapsed_millis:.1f} ms"
+    )
+    return candidate_infos
+
+
+def parse_weights(text: str, skills: List[str]) -> Tuple[List[str], List[int]]:
+    items = [item.strip() for item in text.split(",") if item.strip()]
+    if len(items) > 0 and all("=" in item for item in items):
+        # A subset of skills like "CSS=2, Wordpress=1"
+        known_skills = {skill.lower(): skill for skill in skills}
+        selected_skills: List[str] = []
+        selected_weights: List[int] = []
+        for item in items:
+            skill, weight = [s.strip() for s in item.split("=", 1)]
+            if skill.lower() not in known_skills:
+                raise ValueError(f"Unknown skill: {skill}")
+            selected_skills.append(known_skills[skill.lower()])
+            selected_weights.append(int(weight))
+        return selected_skills, selected_weights
+    if len(items) != len(skills):
+        raise ValueError(
+            f"Expected {len(skills)} weights, but received {len(items)}."
+        )
+    return skills, [int(item) for item in items]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-rank the stored extractions with new weights"
+    )
+    parser.add_argument("--skills", type=str, required=True)
+    parser.add_argument("--weights", type=str, required=True)
+    parser.add_argument(
+        "--run", type=str, help="run whose extractions are re-ranked, default the latest"
+    )
+    parser.add_argument("--top", type=int, help="only the best candidates, default all")
+    args = parser.parse_args()
+    skills = [s.strip() for s in args.skills.split(",")]
+    skills, weights = parse_weights(args.weights, skills)
+    for candidate_info in rerank(load_extractions(args.run), skills, weights, args.top):
+        logger.info(candidate_info)
@@ -0,0 +1,300 @@
+from pydantic import BaseModel
+
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from hrranker.config import cfg
+from hrranker.hr_model import JobProfile
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+UPSERT_CANDIDATE = """INSERT INTO candidates (run_key, source, fingerprint, status, record, attempts, updated)
+    VALUES (?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT (run_key, source) DO UPDATE SET fingerprint = excluded.fingerprint,
+    status = excluded.status, record = excluded.record,
+    attempts = attempts + 1, updated = excluded.updated"""
+
+
+class RunStatus(BaseModel):
+    run_key: str
+    profile: str
+    document_count: int
+    done: int
+    failed: int
+    failed_sources: List[str]
+    created: float
+    updated: float
+
+    @property
+    def pending(self) -> int:
+        return max(0, self.document_count - self.done - self.failed)
+
+    def report(self) -> str:
+        elapsed = max(self.updated - self.created, 1e-9)
+        return (
+            f"Run {self.run_key} ({self.profile}): {self.done}/{self.document_count} done "
+            + f"({100 * self.done / max(self.document_count, 1):.0f}%), {self.failed} failed, "
+            + f"{self.pending} pending. Last update {time.ctime(self.updated)}, "
+            + f"{60 * self.done / elapsed:.1f} candidates/min"
+        )
+
+
+def document_source(pdf: Path) -> str:
+    # The same as the source in the metadata of the parsed document
+    return str(pdf.absolute())
+
+
+def document_fingerprint(pdf: Path) -> str:
+    stat = pdf.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def run_key(profile: JobProfile, pdfs: List[Path]) -> str:
+    # Runs with the same skills, weights and documents continue each other
+    key = json.dumps(
+        {
+            "skills": profile.skills,
+            "weights": profile.weights,
+            "documents": sorted(document_source(pdf) for pdf in pdfs),
+        }
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class RunJournal:
+    # Result of each candidate of a batch run, written as soon as the candidate is finished
+
+    def __init__(self, location: Optional[Path] = None):
+        # Without a location the configured one is used, once the journal is first used
+        self.configured_location = location
+        self.lock = threading.Lock()
+
+    @cached_property
+    def location(self) -> Path:
+        return self.configured_location or cfg.journal_location
+
+    @cached_property
+    def connection(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.location), check_same_thread=False)
+        with connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS runs (
+                    run_key TEXT PRIMARY KEY,
+                    profile TEXT NOT NULL,
+                    document_count INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )"""
+            )
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS candidates (
+                    run_key TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    record TEXT,
+                    attempts INTEGER NOT NULL,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (run_key, source)
+                )"""
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(shortlists)")}
+            if columns and "top_k" not in columns:
+                # Shortlists without their settings are screened again
+                connection.execute("DROP TABLE shortlists")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS shortlists (
+                    run_key TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    score REAL,
+                    shortlisted INTEGER NOT NULL,
+                    top_k INTEGER NOT NULL,
+                    threshold REAL NOT NULL,
+                    PRIMARY KEY (run_key, source)
+                )"""
+            )
+        return connection
+
+    def start_run(self, run_key: str, profile: JobProfile, document_count: int):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO runs (run_key, profile, document_count, created, updated) "
+                + "VALUES (?, ?, ?, ?, ?)",
+                (run_key, profile.name or ", ".join(profile.skills), document_count, now, now),
+            )
+
+    def finished(
+        self, run_key: str, fingerprints: Dict[str, str]
+    ) -> Dict[str, Dict[str, Any]]:
+        # Records of the candidates which are done and whose file did not change since
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT source, fingerprint, record FROM candidates WHERE run_key = ? AND status = ?",
+                (run_key, STATUS_DONE),
+            ).fetchall()
+        return {
+            source: json.loads(record)
+            for source, fingerprint, record in rows
+            if fingerprints.get(source) == fingerprint
+        }
+
+    def record_done(
+        self, run_key: str, source: str, fingerprint: str, record: Dict[str, Any]
+    ):
+        self.record(run_key, source, fingerprint, STATUS_DONE, json.dumps(record))
+
+    def record_failed(self, run_key: str, source: str, fingerprint: str):
+        self.record(run_key, source, fingerprint, STATUS_FAILED, None)
+
+    def record(
+        self,
+        run_key: str,
+        source: str,
+        fingerprint: str,
+        status: str,
+        record: Optional[str],
+    ):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                UPSERT_CANDIDATE, (run_key, source, fingerprint, status, record, now)
+            )
+            self.connection.execute(
+                "UPDATE runs SET updated = ? WHERE run_key = ?", (now, run_key)
+            )
+
+    def record_prescreen(
+        self,
+        run_key: str,
+        fingerprints: Dict[str, str],
+        scores: Dict[str, float],
+        screened_out_records: List[Dict[str, Any]],
+        top_k: int,
+        threshold: float,
+    ):
+        # The shortlist together with the screened out candidates, so that a continued run
+        # with the same settings ranks the same shortlist. Documents which could not be parsed
+        # count as shortlisted
+        now = time.time()
+        screened_out = {record["source_file"] for record in screened_out_records}
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM shortlists WHERE run_key = ?", (run_key,))
+            self.connection.executemany(
+                "INSERT INTO shortlists "
+                + "(run_key, source, fingerprint, score, shortlisted, top_k, threshold) "
+                + "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_key,
+                        source,
+                        fingerprint,
+                        scores.get(source),
+                        source not in screened_out,
+                        top_k,
+                        threshold,
+                    )
+                    for source, fingerprint in fingerprints.items()
+                ],
+            )
+            self.connection.executemany(
+                UPSERT_CANDIDATE,
+                [
+                    (
+                        run_key,
+                        record["source_file"],
+                        fingerprints.get(record["source_file"], ""),
+                        STATUS_DONE,
+                        json.dumps(record),
+                        now,
+                    )
+                    for record in screened_out_records
+                ],
+            )
+            self.connection.execute(
+                "UPDATE runs SET updated = ? WHERE run_key = ?", (now, run_key)
+            )
+
+    def prescreen(
+        self, run_key: str, fingerprints: Dict[str, str], top_k: int, threshold: float
+    ) -> Optional[Tuple[Dict[str, float], Set[str]]]:
+        # Scores and screened out sources of the journaled shortlist. None without one, if it was
+        # made with other settings or if any document changed since, then the scores of all of
+        # them are out of date
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT source, fingerprint, score, shortlisted, top_k, threshold "
+                + "FROM shortlists WHERE run_key = ?",
+                (run_key,),
+            ).fetchall()
+        journaled = {row[0]: row[1] for row in rows}
+        if journaled != fingerprints or any(
+            row[4] != top_k or row[5] != threshold for row in rows
+        ):
+            return None
+        scores = {source: score for source, _, score, _, _, _ in rows if score is not None}
+        screened_out = {source for source, _, _, shortlisted, _, _ in rows if not shortlisted}
+        return scores, screened_out
+
+    def clear_prescreen(self, run_key: str):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM shortlists WHERE run_key = ?", (run_key,))
+
+    def status(self, run_key: str) -> Optional[RunStatus]:
+        with self.lock:
+            run = self.connection.execute(
+                "SELECT profile, document_count, created, updated FROM runs WHERE run_key = ?",
+                (run_key,),
+            ).fetchone()
+            if run is None:
+                return None
+            counts = dict(
+                self.connection.execute(
+                    "SELECT status, COUNT(*) FROM candidates WHERE run_key = ? GROUP BY status",
+                    (run_key,),
+                ).fetchall()
+            )
+            failed_sources = [
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT source FROM candidates WHERE run_key = ? AND status = ? ORDER BY source",
+                    (run_key, STATUS_FAILED),
+                )
+            ]
+        profile, document_count, created, updated = run
+        return RunStatus(
+            run_key=run_key,
+            profile=profile,
+            document_count=document_count,
+            done=counts.get(STATUS_DONE, 0),
+            failed=counts.get(STATUS_FAILED, 0),
+            failed_sources=failed_sources,
+            created=created,
+            updated=updated,
+        )
+
+    def run_keys(self) -> List[str]:
+        with self.lock:
+            return [
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT run_key FROM runs ORDER BY updated DESC"
+                )
+            ]
+
+    def clear(self, run_key: str):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM candidates WHERE run_key = ?", (run_key,))
+            self.connection.execute("DELETE FROM shortlists WHERE run_key = ?", (run_key,))
+            self.connection.execute("DELETE FROM runs WHERE run_key = ?", (run_key,))
+
+
+run_journal = RunJournal()
@@ -0,0 +1,142 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from hrranker.hr_model import CandidateExtraction
+
+
+class ScoreMatrix:
+    # Columnar candidate x skill representation of the extracted facts
+
+    def __init__(
+        self,
+        skills: List[str],
+        years: np.ndarray,
+        has_skill: np.ndarray,
+        total_experience: np.ndarray,
+        source_files: Optional[List[str]] = None,
+        screened_out: Optional[np.ndarray] = None,
+        prescreen_scores: Optional[np.ndarray] = None,
+        extracted: Optional[np.ndarray] = None,
+    ):
+        assert years.shape == has_skill.shape == (len(total_experience), len(skills))
+        self.skills = skills
+        self.years = years.astype(np.float32)
+        self.has_skill = has_skill.astype(bool)
+        self.total_experience = total_experience.astype(np.float32)
+        self.source_files = source_files
+        # Ordered like ranking_key: screened out candidates last, ties by the pre-screen score
+        self.screened_out = (
+            np.zeros(len(total_experience), dtype=bool)
+            if screened_out is None
+            else screened_out.astype(bool)
+        )
+        self.prescreen_scores = (
+            np.zeros(len(total_experience), dtype=np.float32)
+            if prescreen_scores is None
+            else prescreen_scores.astype(np.float32)
+        )
+        # Whether the skill was extracted at all, a missing one is not the same as 0 years
+        self.extracted = (
+            np.ones(years.shape, dtype=bool) if extracted is None else extracted.astype(bool)
+        )
+        # Years only count when the candidate has the skill
+        self.effective_years = np.where(self.has_skill, self.years, 0).astype(
+            np.float32
+        )
+
+    @classmethod
+    def from_extractions(
+        cls, candidate_extractions: List[CandidateExtraction], skills: List[str]
+    ) -> "ScoreMatrix":
+        skill_index = {skill: i for i, skill in enumerate(skills)}
+        years = np.zeros((len(candidate_extractions), len(skills)), dtype=np.float32)
+        has_skill = np.zeros(years.shape, dtype=bool)
+        extracted = np.zeros(years.shape, dtype=bool)
+        total_experience = np.zeros(len(candidate_extractions), dtype=np.float32)
+        screened_out = np.zeros(len(candidate_extractions), dtype=bool)
+        prescreen_scores = np.zeros(len(candidate_extractions), dtype=np.float32)
+        for row, candidate_extraction in enumerate(candidate_extractions):
+            years_of_experience = (
+                candidate_extraction.name_of_candidate_response.years_of_experience
+            )
+            total_experience[row] = years_of_experience or 0
+            screened_out[row] = candidate_extraction.screened_out
+            prescreen_scores[row] = candidate_extraction.prescreen_score or 0
+            for nyr in candidate_extraction.number_of_years_responses:
+                column = skill_index.get(nyr.skill)
+                if column is not None:
+                    years[row, column] = nyr.number_of_years_with_skill
+                    has_skill[row, column] = nyr.has_skill
+                    extracted[row, column] = True
+        return cls(
+            skills,
+            years,
+            has_skill,
+            total_experience,
+            [ce.source_file for ce in candidate_extractions],
+            screened_out,
+            prescreen_scores,
+            extracted,
+        )
+
+    def __len__(self) -> int:
+        return len(self.total_experience)
+
+    def weight_matrix(self, weights: Sequence) -> np.ndarray:
+        weight_matrix = np.asarray(weights, dtype=np.float32)
+        if weight_matrix.ndim == 1:
+            weight_matrix = weight_matrix[np.newaxis, :]
+        assert weight_matrix.shape[1] == len(
+            self.skills
+        ), f"Expected {len(self.skills)} weights per profile"
+        return weight_matrix
+
+    def scores(self, weights: Sequence) -> np.ndarray:
+        # One row of weights per job profile gives one row of scores per profile
+        weight_matrix = self.weight_matrix(weights)
+        scores = weight_matrix @ self.effective_years.T
+        scores += self.total_experience[np.newaxis, :]
+        if np.asarray(weights).ndim == 1:
+            return scores[0]
+        return scores
+
+    def ranking_values(self, scores: np.ndarray) -> np.ndarray:
+        # The scores with the screened out candidates moved below all others of their profile
+        if not self.screened_out.any() or scores.shape[1] == 0:
+            return scores
+        span = scores.max(axis=1, keepdims=True) - scores.min(axis=1, keepdims=True) + 1
+        return scores - self.screened_out[np.newaxis, :] * span
+
+    def order(self, values: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        # Best first, equal values by the pre-screen score and then in the order of the rows
+        return np.lexsort(
+            (candidates, -self.prescreen_scores[candidates], -values[candidates])
+        )
+
+    def top_k(self, weights: Sequence, k: int) -> np.ndarray:
+        # Row indices of the k best candidates per profile, best first, in the order of ranking_key
+        scores = self.scores(weights)
+        single_profile = scores.ndim == 1
+        if single_profile:
+            scores = scores[np.newaxis, :]
+        values = self.ranking_values(scores)
+        k = min(k, len(self))
+        if k < len(self):
+            candidates = np.argpartition(-values, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(len(self)), scores.shape)
+        top_candidates = np.empty(candidates.shape, dtype=np.int64)
+        for profile, profile_candidates in enumerate(candidates):
+            profile_values = values[profile]
+            if k < len(self):
+                # Candidates tied with the last one may be missing from the partition
+                last_value = profile_values[profile_candidates].min()
+                tied = np.flatnonzero(profile_values >= last_value)
+                if len(tied) > k:
+                    profile_candidates = tied
+            ordered = profile_candidates[self.order(profile_values, profile_candidates)]
+            top_candidates[profile] = ordered[:k]
+        if single_profile:
+            return top_candidates[0]
+        return top_candidates
@@ -1,23 +1,141 @@
-from typing import List
+from typing import Dict, List, Tuple
 
 import re
 
+# Keywords like c++, c# or .net neither start nor end with a word character, so \b does not work for them
+WORD_START = r"(?<!\w)"
+WORD_END = r"(?!\w)"
+
 
 def find_whole_word(w):
-    return re.compile(r"\b({0})\b".format(w), flags=re.IGNORECASE).search
+    return re.compile(
+        WORD_START + keyword_pattern(w) + WORD_END, flags=re.IGNORECASE
+    ).search
 
 
 def skill_check(doc: str, keywords: List[str]) -> bool:
-    content = doc.lower()
     matches = False
     for keyword in keywords:
-        if find_whole_word(keyword)(content):
+        if find_whole_word(keyword)(doc):
             matches = True
             break
     return matches
 
 
+def normalize_keyword(keyword: str) -> str:
+    return " ".join(keyword.lower().split())
+
+
+def keyword_pattern(keyword: str) -> str:
+    # Words can be separated by any white space, e.g. a line break in the PDF text
+    return r"\s+".join(re.escape(word) for word in keyword.split())
+
+
+def trie_pattern(keywords: List[str]) -> str:
+    # Alternation with shared prefixes, which the regex engine matches much faster than a flat one
+    trie: Dict[str, Dict] = {}
+    for keyword in keywords:
+        node = trie
+        for word_char in keyword:
+            node = node.setdefault(word_char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Dict]) -> str:
+        alternatives = [
+            (r"\s+" if word_char == " " else re.escape(word_char)) + build(child)
+            for word_char, child in sorted(node.items())
+            if word_char != ""
+        ]
+        if len(alternatives) == 0:
+            return ""
+        pattern = (
+            alternatives[0]
+            if len(alternatives) == 1
+            else "(?:" + "|".join(alternatives) + ")"
+        )
+        if "" in node:
+            # Greedy, so the longest keyword wins
+            return f"(?:{pattern})?"
+        return pattern
+
+    return build(trie)
+
+
+def contained_keywords(keyword: str, keywords: List[str]) -> List[Tuple[str, int]]:
+    contained: List[Tuple[str, int]] = []
+    for other in keywords:
+        if other == keyword:
+            continue
+        start = keyword.find(other)
+        while start >= 0:
+            end = start + len(other)
+            before_ok = start == 0 or not re.match(r"\w", keyword[start - 1])
+            after_ok = end == len(keyword) or not re.match(r"\w", keyword[end])
+            if before_ok and after_ok:
+                contained.append((other, start))
+            start = keyword.find(other, start + 1)
+    return contained
+
+
+class KeywordIndex:
+    # Compiles the keywords of all skills once and finds them with a single scan per document
+
+    def __init__(self, skill_keywords: Dict[str, List[str]]):
+        self.skills = list(skill_keywords.keys())
+        self.keyword_skills: Dict[str, List[str]] = {}
+        for skill, keywords in skill_keywords.items():
+            for keyword in keywords:
+                normalized = normalize_keyword(keyword)
+                if normalized == "":
+                    continue
+                self.keyword_skills.setdefault(normalized, [])
+                if skill not in self.keyword_skills[normalized]:
+                    self.keyword_skills[normalized].append(skill)
+        keywords = list(self.keyword_skills.keys())
+        # A match consumes the text, so keywords inside longer keywords (e.g. "xd" in "adobe xd") are added separately
+        self.contained = {k: contained_keywords(k, keywords) for k in keywords}
+        self.pattern = (
+            re.compile(WORD_START + trie_pattern(keywords) + WORD_END, re.IGNORECASE)
+            if len(keywords) > 0
+            else None
+        )
+
+    def scan(self, doc: str) -> Dict[str, List[Tuple[str, int]]]:
+        skill_matches: Dict[str, List[Tuple[str, int]]] = {s: [] for s in self.skills}
+        if self.pattern is None:
+            return skill_matches
+        for match in self.pattern.finditer(doc):
+            keyword = normalize_keyword(match.group(0))
+            found = [(keyword, match.start())] + [
+                (other, match.start() + offset)
+                for other, offset in self.contained[keyword]
+            ]
+            for found_keyword, position in found:
+                for skill in self.keyword_skills[found_keyword]:
+                    skill_matches[skill].append((found_keyword, position))
+        return skill_matches
+
+    def matching_skills(self, doc: str) -> Dict[str, bool]:
+        return {
+            skill: len(matches) > 0 for skill, matches in self.scan(doc).items()
+        }
+
+
 if __name__ == "__main__":
+    keyword_index = KeywordIndex(
+        {
+            "C++": ["c++"],
+            "C#": ["c#", ".net"],
+            "Design": ["adobe xd", "xd", "figma"],
+            "Java": ["java"],
+        }
+    )
+    matches = keyword_index.matching_skills("C++ and C# / .NET with Adobe\nXD, JavaScript")
+    assert matches == {"C++": True, "C#": True, "Design": True, "Java": False}
+    assert len(keyword_index.scan("Adobe XD")["Design"]) == 2
+    assert skill_check("Developer in c++.", ["c++"])
+    assert not skill_check("Developer in c++x.", ["c++"])
+
     from hrranker.config import cfg
     from hrranker.extract_data import extract_data
 
@@ -0,0 +1,17 @@
+from typing import Any, Dict
+
+import json
+
+
+def estimate_tokens(text: str) -> int:
+    # The OpenAI tokenizers produce roughly one token per four characters of English text
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, token_budget: int) -> str:
+    # The longest beginning of the text whose estimate stays within the budget
+    return text[: max(token_budget, 0) * 4]
+
+
+def estimate_schema_tokens(schema: Dict[str, Any]) -> int:
+    return estimate_tokens(json.dumps(schema))
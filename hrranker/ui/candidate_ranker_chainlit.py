@@ -1,21 +1,33 @@
-from hrranker.plot.hr_rank_plot import create_barchart
-from langchain.schema import Document
 import chainlit as cl
 
 
-from hrranker.candidate_ranker_langchain import process_docs, sort_candidate_infos
+from hrranker.candidate_ranker_langchain import (
+    aiter_candidate_infos,
+    sort_candidate_infos,
+)
 from hrranker.log_init import logger
-from hrranker.extract_data import convert_pdf_to_document
+from hrranker.llm_scheduler import PRIORITY_INTERACTIVE
+from hrranker.metrics import metrics, start_metrics_server
+from hrranker.extract_data import DocumentFeed
 from hrranker.config import cfg
+from hrranker.dedup import group_duplicates
 from hrranker.hr_model import CandidateInfo
+from hrranker.leaderboard import Leaderboard
+from hrranker.rerank import rerank, parse_weights, to_candidate_extraction
+from hrranker.score_matrix import ScoreMatrix
 
-from typing import List, Any, Optional
+from typing import List, Any, Dict, Optional
 
 from pathlib import Path
 
+import asyncio
+import time
+
 MAX_FILES = 20
 TiMEOUT = 600
 
+start_metrics_server()
+
 
 @cl.on_chat_start
 async def init():
@@ -71,48 +83,193 @@ async def gather_elements(content: str, item_name: str, previous_elements: List[
 
 
 async def handle_rankings(skills: List[str], weights: List[int]):
-    files = []
-    docs = []
-    file_names = ""
-
-    # Wait for the user to upload a file
-    while not files:
-        files = await cl.AskFileMessage(
-            content="Please upload multiple pdf files with the CV of a candidate!",
-            accept=["application/pdf"],
-            max_files=MAX_FILES,
-            timeout=TiMEOUT,
-        ).send()
-
-        if files is not None:
-            file_names += "\n- ".join([f"{f.name}" for f in files])
+    with metrics.run() as run_id:
+        candidate_infos = await upload_and_rank(skills, weights, run_id)
+    await tune_weights(skills, candidate_infos)
 
-            docs.extend([write_temp_file(file) for file in files])
 
-            res = await cl.AskUserMessage(
-                content=f"You have uploaded {len(docs)} documents. Any more documents? (y/n)",
+async def upload_and_rank(
+    skills: List[str], weights: List[int], run_id: str
+) -> List[CandidateInfo]:
+    files = []
+    # Every uploaded CV is parsed and ranked while the recruiter uploads the next ones
+    document_feed = DocumentFeed()
+    msg = cl.Message(content="")
+    ranking: Optional[asyncio.Task] = None
+
+    try:
+        # Wait for the user to upload a file
+        while not files:
+            files = await cl.AskFileMessage(
+                content="Please upload multiple pdf files with the CV of a candidate!",
+                accept=["application/pdf"],
+                max_files=MAX_FILES,
                 timeout=TiMEOUT,
-                raise_on_timeout=False,
             ).send()
 
-            if res["content"].lower() in ["n", "no", "nope"]:
-                break
-            else:
-                files = None
-
-    await process_ranking_with_files(skills, weights, file_names, docs)
-
-
-async def process_ranking_with_files(skills, weights, file_names, docs):
-    msg = cl.Message(content="")
-    await msg.stream_token(
-        f"### Processing \n\n- {file_names}. \n\nYou have currently **{len(docs)}** files.\n\n"
-    )
+            if files is not None:
+                file_names = "\n- ".join([f"{f.name}" for f in files])
+                for file in files:
+                    document_feed.add(await write_temp_file(file, run_id))
+                heading = "### Processing \n\n" if ranking is None else ""
+                await msg.stream_token(
+                    f"{heading}- {file_names}. \n\nYou have currently **{document_feed.added}** files.\n\n"
+                )
+                if ranking is None:
+                    ranking = asyncio.create_task(
+                        rank_documents(skills, weights, document_feed, msg)
+                    )
+
+                res = await cl.AskUserMessage(
+                    content=f"You have uploaded {document_feed.added} documents. Any more documents? (y/n)",
+                    timeout=TiMEOUT,
+                    raise_on_timeout=False,
+                ).send()
 
-    candidate_infos = await process_docs(docs, skills, weights, msg)
+                if not res or res["content"].lower() in ["n", "no", "nope"]:
+                    break
+                else:
+                    files = None
+
+        document_feed.close()
+        last_upload = time.perf_counter()
+        candidate_infos = await ranking
+        # How long the recruiter waits for the ranking after the last upload
+        metrics.observe("time_to_ranking", time.perf_counter() - last_upload)
+    finally:
+        if ranking is not None and not ranking.done():
+            ranking.cancel()
     candidate_infos: List[CandidateInfo] = sort_candidate_infos(candidate_infos)
 
-    barchart_image = create_barchart(candidate_infos)
+    # The ranking and its chart were already updated while the candidates finished
+    await execute_candidates(candidate_infos)
+
+    await cl.Message(content=metrics.summary(run_id)).send()
+    return candidate_infos
+
+
+async def rank_documents(
+    skills: List[str],
+    weights: List[int],
+    document_feed: DocumentFeed,
+    msg: cl.Message,
+) -> List[CandidateInfo]:
+    candidate_infos: List[CandidateInfo] = []
+    live_ranking = LiveRanking(document_feed)
+    with metrics.span("ranking"):
+        async for candidate_info in aiter_candidate_infos(
+            document_feed, skills, weights, msg, priority=PRIORITY_INTERACTIVE
+        ):
+            candidate_infos.append(candidate_info)
+            await live_ranking.add(candidate_info)
+        await live_ranking.update(final=True)
+    return candidate_infos
+
+
+class LiveRanking:
+    # The best candidates so far in a single message, which is updated while the others
+    # are processed. At most every LEADERBOARD_INTERVAL seconds, except for the first one
+
+    def __init__(
+        self,
+        document_feed: DocumentFeed,
+        size: int = cfg.leaderboard_size,
+        interval: float = cfg.leaderboard_interval,
+    ):
+        self.document_feed = document_feed
+        self.size = size
+        self.interval = interval
+        self.leaderboard = Leaderboard()
+        self.message: Optional[cl.Message] = None
+        self.chart: Optional[cl.Image] = None
+        self.start = time.perf_counter()
+        self.last_update = 0.0
+
+    async def add(self, candidate_info: CandidateInfo):
+        self.leaderboard.add(candidate_info)
+        if self.message is None:
+            metrics.observe("time_to_first_result", time.perf_counter() - self.start)
+            await self.update()
+        elif time.perf_counter() - self.last_update >= self.interval:
+            await self.update()
+
+    async def update(self, final: bool = False):
+        # matplotlib is only imported once the first ranking is shown
+        from hrranker.plot.hr_rank_plot import acreate_barchart
+
+        leaderboard = self.leaderboard
+        if final:
+            heading = "## Ranking"
+            shown = leaderboard.ranked()
+            chart_infos = shown
+        else:
+            heading = (
+                f"## Ranking so far\n\nBest {min(self.size, len(leaderboard))} of "
+                + f"{leaderboard.count} finished candidates, {self.document_feed.added} uploaded"
+            )
+            shown = leaderboard.top(self.size)
+            chart_infos = leaderboard.top(cfg.chart_max_bars)
+        if not shown:
+            return
+        barchart_image = await acreate_barchart(chart_infos)
+        chart = cl.Image(
+            name="image1",
+            display="inline",
+            path=str(barchart_image.absolute()),
+            size="large",
+        )
+        content = format_ranking(heading, shown, leaderboard.duplicates)
+        if self.message is None:
+            self.message = cl.Message(content=content, elements=[chart])
+            await self.message.send()
+        else:
+            await self.chart.remove()
+            self.message.content = content
+            self.message.elements = [chart]
+            await self.message.update()
+        self.chart = chart
+        self.last_update = time.perf_counter()
+
+
+async def tune_weights(skills: List[str], candidate_infos: List[CandidateInfo]):
+    # Re-score the already extracted facts, so that no file is processed again
+    candidate_extractions = [to_candidate_extraction(ci) for ci in candidate_infos]
+    score_matrix = ScoreMatrix.from_extractions(candidate_extractions, skills)
+    while True:
+        res = await cl.AskUserMessage(
+            content=f"Would you like to try other weights? Enter ({len(skills)}) weights as a comma separated list, "
+            + "a subset of skills like `CSS=2, Wordpress=1` or `n` to finish.",
+            timeout=TiMEOUT,
+            raise_on_timeout=False,
+        ).send()
+        if not res or res["content"].strip().lower() in ["n", "no", "nope"]:
+            break
+        try:
+            rerank_skills, rerank_weights = parse_weights(res["content"], skills)
+        except ValueError as e:
+            await cl.Message(content=f"Could not read the weights: {e}").send()
+            continue
+        try:
+            candidate_infos = rerank(
+                candidate_extractions,
+                rerank_skills,
+                rerank_weights,
+                score_matrix=score_matrix,
+            )
+        except ValueError as e:
+            await cl.Message(content=f"Could not re-rank the candidates: {e}").send()
+            continue
+        await send_barchart(candidate_infos)
+        await send_ranking(candidate_infos)
+
+
+async def send_barchart(candidate_infos: List[CandidateInfo]):
+    # matplotlib is only imported once the first ranking is shown
+    from hrranker.plot.hr_rank_plot import acreate_barchart
+
+    # One bar per group of duplicates
+    representatives, _ = group_duplicates(candidate_infos)
+    barchart_image = await acreate_barchart(representatives)
     elements = [
         cl.Image(
             name="image1",
@@ -125,17 +282,15 @@ async def process_ranking_with_files(skills, weights, file_names, docs):
     barchart_message = cl.Message(content="## Results", elements=elements)
     await barchart_message.send()
 
-    await execute_candidates(candidate_infos)
-
-
 
-def write_temp_file(file) -> Document:
-    temp_doc_location = cfg.temp_doc_location
-    new_path = temp_doc_location / (file.name)
+async def write_temp_file(file, run_id: str) -> Path:
+    # A folder per run, so that sessions uploading CVs with the same name do not overwrite them
+    upload_location = cfg.temp_doc_location / "uploads" / run_id
+    new_path = upload_location / (file.name)
     logger.info(f"new path: {new_path}")
-    with open(new_path, "wb") as f:
-        f.write(file.content)
-    return convert_pdf_to_document(new_path)
+    await asyncio.to_thread(upload_location.mkdir, parents=True, exist_ok=True)
+    await asyncio.to_thread(new_path.write_bytes, file.content)
+    return new_path
 
 
 def ranking_generator(candidate_infos: List[CandidateInfo]):
@@ -147,31 +302,61 @@ def ranking_generator(candidate_infos: List[CandidateInfo]):
 
 async def execute_candidates(candidate_infos: List[CandidateInfo]):
 
-    ranking_text = "## Ranking\n\n"
-    for i, condidate_info, personal_data, source_file in ranking_generator(candidate_infos):
-        personal_data = condidate_info.name_of_candidate_response
-        source_file = Path(condidate_info.source_file)
-        ranking_text += f"{i + 1}. Name: **{personal_data.name}**"
-        ranking_text += f"* {source_file.name}*\n\n"
-
-    randking_message = cl.Message(content=ranking_text)
-    await randking_message.send()
-
     await cl.Message(content="## Breakdown\n\n").send()
 
-    for i, condidate_info, personal_data, source_file in ranking_generator(candidate_infos):
+    representatives, duplicates = group_duplicates(candidate_infos)
+    for i, condidate_info, personal_data, source_file in ranking_generator(representatives):
         pdf_element = create_pdf(source_file)
         personal_data = condidate_info.name_of_candidate_response
         source_file = Path(condidate_info.source_file)
         ranking_text = ""
         ranking_text += f"{i + 1}. Name: **{personal_data.name}**, Email: {personal_data.email}, Experience: {personal_data.years_of_experience}, points: {condidate_info.score}\n\n"
         ranking_text += f"*{source_file}*\n\n"
+        ranking_text += format_screened_out(condidate_info)
+        ranking_text += format_duplicates(duplicates.get(str(condidate_info.source_file), []))
         for nyr in condidate_info.number_of_years_responses:
             number_of_years_response = nyr.number_of_years_response
             ranking_text += f"  - Skill: {number_of_years_response.skill}, years: {number_of_years_response.number_of_years_with_skill}\n"
         await cl.Message(content=ranking_text, elements=[pdf_element]).send()
 
 
+async def send_ranking(candidate_infos: List[CandidateInfo]):
+
+    representatives, duplicates = group_duplicates(candidate_infos)
+    randking_message = cl.Message(
+        content=format_ranking("## Ranking", representatives, duplicates)
+    )
+    await randking_message.send()
+
+
+def format_ranking(
+    heading: str, representatives: List[CandidateInfo], duplicates: Dict[str, List[str]]
+) -> str:
+
+    ranking_text = f"{heading}\n\n"
+    for i, condidate_info, personal_data, source_file in ranking_generator(representatives):
+        personal_data = condidate_info.name_of_candidate_response
+        source_file = Path(condidate_info.source_file)
+        ranking_text += f"{i + 1}. Name: **{personal_data.name}**"
+        ranking_text += f"* {source_file.name}*\n\n"
+        ranking_text += format_screened_out(condidate_info)
+        ranking_text += format_duplicates(duplicates.get(str(condidate_info.source_file), []))
+    return ranking_text
+
+
+
+def format_duplicates(duplicate_sources: List[str]) -> str:
+    if not duplicate_sources:
+        return ""
+    names = ", ".join(Path(source).name for source in duplicate_sources)
+    return f"   Also uploaded as (same or nearly the same CV): *{names}*\n\n"
+
+
+def format_screened_out(candidate_info: CandidateInfo) -> str:
+    if not candidate_info.screened_out:
+        return ""
+    return f"   Screened out before the LLM, keyword score: {candidate_info.prescreen_score:.2f}\n\n"
+
 
 def create_pdf(source_file: Path) -> Optional[cl.File]:
     return cl.File(
@@ -1,3 +1,8 @@
 from setuptools import setup, find_packages
 
-setup(name="hrranker", version="1.0", packages=find_packages())
+setup(
+    name="hrranker",
+    version="1.0",
+    packages=find_packages(),
+    package_data={"hrranker": ["data/*.json"]},
+)